@@ -0,0 +1,30 @@
+from app import database
+from sqlalchemy import text
+
+# Indeksy ai_analysis_cache pod odczyt, unieważnianie i kompaktowanie (services/cache_compaction.py).
+# Nowe bazy dostają je z create_all - skrypt jest dla istniejących tabel.
+
+def migrate():
+    print("Migrating: Adding indexes to ai_analysis_cache...")
+    if database.engine.dialect.name == "postgresql":
+        lookup_index = "CREATE INDEX IF NOT EXISTS ix_ai_analysis_cache_key_created ON ai_analysis_cache (cache_key, created_at) INCLUDE (ai_suggestion)"
+    else:
+        # SQLite: bez INCLUDE indeks tylko dublowałby unikalny indeks cache_key (i kosztował przy zapisie)
+        lookup_index = "DROP INDEX IF EXISTS ix_ai_analysis_cache_key_created"
+    commands = [
+        lookup_index,
+        "CREATE INDEX IF NOT EXISTS ix_ai_analysis_cache_user_range ON ai_analysis_cache (user_id, start_date, end_date)",
+        "CREATE INDEX IF NOT EXISTS ix_ai_analysis_cache_created_at ON ai_analysis_cache (created_at)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Index might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,29 @@
+from app import database
+from sqlalchemy import text
+
+# Kolumny klucza cache podsumowań AI (services/summary_cache.py).
+# Stare wiersze zostają z cache_key = NULL - nie są już trafiane i wygasną same.
+
+def migrate():
+    print("Migrating: Adding cache key columns to ai_analysis_cache...")
+    timestamp_type = "TIMESTAMP WITH TIME ZONE" if database.engine.dialect.name == "postgresql" else "DATETIME"
+    commands = [
+        "ALTER TABLE ai_analysis_cache ADD COLUMN cache_key VARCHAR",
+        f"ALTER TABLE ai_analysis_cache ADD COLUMN start_date {timestamp_type}",
+        f"ALTER TABLE ai_analysis_cache ADD COLUMN end_date {timestamp_type}",
+        "ALTER TABLE ai_analysis_cache ADD COLUMN lang VARCHAR DEFAULT 'pl'",
+        "ALTER TABLE ai_analysis_cache ADD COLUMN stats_fingerprint VARCHAR",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ai_analysis_cache_cache_key ON ai_analysis_cache (cache_key)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
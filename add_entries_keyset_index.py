@@ -0,0 +1,23 @@
+from app import database
+from sqlalchemy import text
+
+# Indeks pod stronicowanie keyset listy wpisów (GET /entries/{user_id}?cursor=...).
+# Nowe bazy dostają go z create_all - skrypt jest dla istniejących tabel.
+
+def migrate():
+    print("Migrating: Adding keyset index to mood_entries...")
+    commands = [
+        "CREATE INDEX IF NOT EXISTS ix_mood_entries_owner_date_id ON mood_entries (owner_id, date DESC, id DESC)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Index might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
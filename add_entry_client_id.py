@@ -0,0 +1,23 @@
+from app import database
+from sqlalchemy import text
+
+# Klucz idempotencji wpisów (POST /entries/{user_id}/bulk).
+
+def migrate():
+    print("Migrating: Adding client_id to mood_entries...")
+    commands = [
+        "ALTER TABLE mood_entries ADD COLUMN client_id VARCHAR",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_mood_entries_owner_client_id ON mood_entries (owner_id, client_id)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,46 @@
+from app import database, models
+from sqlalchemy import text
+
+# Odcisk treści wpisu dla /entries/delete_by_content + uzupełnienie istniejących wierszy.
+# Można uruchomić ponownie - uzupełnia tylko wiersze z content_hash = NULL.
+
+BATCH_SIZE = 1000
+
+def backfill():
+    total = 0
+    with database.engine.connect() as conn:
+        while True:
+            rows = conn.execute(text(
+                "SELECT id, text FROM mood_entries WHERE content_hash IS NULL AND text IS NOT NULL "
+                "ORDER BY id LIMIT :limit"
+            ), {"limit": BATCH_SIZE}).all()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE mood_entries SET content_hash = :hash WHERE id = :id"),
+                [{"id": row[0], "hash": models.content_hash(row[1])} for row in rows]
+            )
+            conn.commit()
+            total += len(rows)
+            print(f"Backfilled {total} entries...")
+    print(f"Backfill done: {total} entries")
+
+def migrate():
+    print("Migrating: Adding content_hash to mood_entries...")
+    commands = [
+        "ALTER TABLE mood_entries ADD COLUMN content_hash VARCHAR(64)",
+        "CREATE INDEX IF NOT EXISTS ix_mood_entries_owner_content_hash_date ON mood_entries (owner_id, content_hash, date)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+    backfill()
+
+if __name__ == "__main__":
+    migrate()
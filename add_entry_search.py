@@ -0,0 +1,39 @@
+from app import database
+from app.services import entry_search
+from sqlalchemy import text
+
+# Wyszukiwanie pełnotekstowe wpisów (GET /entries/{user_id}/search).
+# Kolumna search_text + indeks GIN (Postgres). Tabelę FTS5 (SQLite) i search_text istniejących
+# wpisów uzupełnia też start aplikacji; skrypt dodatkowo przebudowuje FTS5 od zera
+# (np. po wpisach dodanych z pominięciem routera).
+
+def migrate():
+    print("Migrating: Adding search_text to mood_entries...")
+    commands = ["ALTER TABLE mood_entries ADD COLUMN search_text VARCHAR"]
+    if database.engine.dialect.name == "postgresql":
+        commands.append(
+            "CREATE INDEX IF NOT EXISTS ix_mood_entries_search_text ON mood_entries "
+            "USING gin (to_tsvector('simple', coalesce(search_text, '')))"
+        )
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+    db = database.SessionLocal()
+    try:
+        entry_search.ensure_index(db)
+        if database.engine.dialect.name == "sqlite":
+            db.execute(text(f"INSERT INTO {entry_search.FTS_TABLE}({entry_search.FTS_TABLE}) VALUES ('rebuild')"))
+            db.commit()
+            print(f"Rebuilt {entry_search.FTS_TABLE}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
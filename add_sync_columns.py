@@ -0,0 +1,30 @@
+from app import database
+from sqlalchemy import text
+
+# Synchronizacja przyrostowa (GET /sync/{user_id}): updated_at + indeksy.
+# Tabela sync_tombstones powstaje przez create_all przy starcie aplikacji.
+
+def migrate():
+    print("Migrating: Adding updated_at to mood_entries and sobriety_clocks...")
+    timestamp_type = "TIMESTAMP WITH TIME ZONE" if database.engine.dialect.name == "postgresql" else "DATETIME"
+    commands = [
+        f"ALTER TABLE mood_entries ADD COLUMN updated_at {timestamp_type}",
+        f"ALTER TABLE sobriety_clocks ADD COLUMN updated_at {timestamp_type}",
+        # Istniejące wiersze: czas utworzenia jako pierwsza zmiana (pierwsza synchronizacja i tak jest pełna)
+        "UPDATE mood_entries SET updated_at = COALESCE(date, CURRENT_TIMESTAMP) WHERE updated_at IS NULL",
+        "UPDATE sobriety_clocks SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_mood_entries_owner_updated_at ON mood_entries (owner_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_sobriety_clocks_user_updated_at ON sobriety_clocks (user_id, updated_at)",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,39 @@
+from app import database
+from sqlalchemy import text
+
+# ON DELETE dla kluczy obcych tabel pochodnych - DELETE /users/{user_id} nie może się wywrócić
+# na agregatach, śladach synchronizacji, zadaniach AI ani zdjęciach usera.
+# Nowe bazy dostają to z create_all - skrypt jest dla istniejących tabel (tylko Postgres:
+# SQLite nie zmienia ograniczeń bez przebudowy tabeli, a router usuwa te wiersze sam).
+
+FOREIGN_KEYS = [
+    # (tabela, kolumna, tabela docelowa, ON DELETE)
+    ("daily_mood_rollup", "user_id", "users", "CASCADE"),
+    ("sync_tombstones", "user_id", "users", "CASCADE"),
+    ("ai_jobs", "user_id", "users", "CASCADE"),
+    ("images", "owner_id", "users", "SET NULL"),
+    ("entry_images", "entry_id", "mood_entries", "CASCADE"),
+]
+
+def migrate():
+    print("Migrating: Adding ON DELETE to foreign keys of derived tables...")
+    if database.engine.dialect.name != "postgresql":
+        print("SQLite: skipping, foreign keys are not enforced")
+        return
+    commands = [
+        f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_{column}_fkey, "
+        f"ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {target} (id) ON DELETE {action}"
+        for table, column, target, action in FOREIGN_KEYS
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Table might not exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
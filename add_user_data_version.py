@@ -0,0 +1,22 @@
+from app import database
+from sqlalchemy import text
+
+# Wersja danych usera dla ETag / If-None-Match (GET /entries, /users, /sobriety/clocks).
+
+def migrate():
+    print("Migrating: Adding data_version to users...")
+    commands = [
+        "ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0",
+    ]
+    with database.engine.connect() as conn:
+        for cmd in commands:
+            try:
+                conn.execute(text(cmd))
+                conn.commit()
+                print(f"OK: {cmd}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Column might already exist or error: {e}")
+
+if __name__ == "__main__":
+    migrate()
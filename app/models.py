@@ -1,15 +1,82 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.dialects.postgresql import UUID
+import base64
+import hashlib
+import os
 import uuid
+import zlib
+from datetime import datetime, timezone
 from .database import Base
+from .services.search_text import search_text
+
+class GUID(TypeDecorator):
+    # UUID, który przyjmuje też stringi (user_id z path params).
+    # Postgres rzutuje je sam, ale na SQLite bez tego filtr po user_id rzuca błąd.
+    impl = UUID(as_uuid=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and not isinstance(value, uuid.UUID):
+            return uuid.UUID(str(value))
+        return value
+
+# Długie teksty (rozmowa z asystentem, analiza AI) trzymamy skompresowane: znacznik + base64(zlib).
+# Kolumna zostaje tekstowa, więc stare wiersze bez znacznika czytają się jak dotąd,
+# a krótkie wartości (< COMPRESSED_TEXT_MIN_CHARS) nie są kompresowane wcale.
+COMPRESSED_TEXT_MARKER = "~z1:"
+COMPRESSED_TEXT_MIN_CHARS = int(os.getenv("COMPRESSED_TEXT_MIN_CHARS", "256"))
+
+class CompressedText(TypeDecorator):
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        # Tekst zaczynający się od znacznika kompresujemy zawsze - inaczej odczyt by go rozpakowywał
+        if len(value) < COMPRESSED_TEXT_MIN_CHARS and not value.startswith(COMPRESSED_TEXT_MARKER):
+            return value
+        packed = COMPRESSED_TEXT_MARKER + base64.b64encode(zlib.compress(value.encode("utf-8"), 6)).decode("ascii")
+        # Nieściśliwy tekst (np. krótki, losowy) zostaje jawny
+        return packed if len(packed) < len(value) or value.startswith(COMPRESSED_TEXT_MARKER) else value
+
+    def process_result_value(self, value, dialect):
+        if value is None or not value.startswith(COMPRESSED_TEXT_MARKER):
+            return value
+        try:
+            return zlib.decompress(base64.b64decode(value[len(COMPRESSED_TEXT_MARKER):])).decode("utf-8")
+        except (ValueError, zlib.error):
+            # Jawny tekst, który przypadkiem zaczyna się od znacznika (zapisany przed kompresją)
+            return value
+
+def utcnow():
+    # Znacznik zmian dla synchronizacji (routers/sync.py) - po stronie aplikacji,
+    # bo CURRENT_TIMESTAMP w SQLite ma rozdzielczość sekundy
+    return datetime.now(timezone.utc)
+
+def content_hash(text):
+    # Odcisk treści wpisu - indeksowane wyszukiwanie w /entries/delete_by_content
+    # bez indeksu na pełnym (dowolnie długim) tekście
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _entry_content_hash(context):
+    # Domyślna wartość liczona przy każdym INSERT (także wielowierszowym w /bulk)
+    return content_hash(context.get_current_parameters().get("text"))
+
+def _entry_search_text(context):
+    value = context.get_current_parameters().get("text")
+    return search_text(value) if value is not None else None
 
 class User(Base):
     __tablename__ = "users"
 
     # User ID is now a UUID matching auth.users
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     email = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
@@ -22,44 +89,173 @@ class User(Base):
     profile_image_path = Column(String, default="")
     is_dark_mode = Column(Boolean, default=False)
     custom_assistant_name = Column(String, default="") # New field for custom AI name
+    # Wersja danych usera (wpisy, profil, liczniki) - ETag w GET, services/user_version.py
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     entries = relationship("MoodEntry", back_populates="owner")
 
 class MoodEntry(Base):
     __tablename__ = "mood_entries"
+    __table_args__ = (
+        # Wyszukiwanie pełnotekstowe w Postgres (SQLite ma osobną tabelę FTS5)
+        Index(
+            "ix_mood_entries_search_text",
+            text("to_tsvector('simple', coalesce(search_text, ''))"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
     # We use owner_id pointing to public.users (which shares ID with auth.users)
-    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id")) 
+    owner_id = Column(GUID(), ForeignKey("users.id")) 
     
     text = Column(String)
     mood_rating = Column(Float)
     category = Column(String)
     
-    ai_analysis = Column(String, default="")
-    conversation = Column(String, default="")
+    ai_analysis = Column(CompressedText, default="")
+    conversation = Column(CompressedText, default="")
     image_paths = Column(String, default="")
     
     date = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Klucz idempotencji nadany przez aplikację (synchronizacja offline, POST /entries/{user_id}/bulk)
+    client_id = Column(String, nullable=True)
+    # Ostatnia zmiana wiersza - znacznik dla GET /sync/{user_id}?since=...
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    # sha256(text) - liczony przy INSERT, przy edycji tekstu odświeżany w routers/entries.py
+    content_hash = Column(String(64), default=_entry_content_hash)
+    # Rdzenie słów z text (services/search_text.py) - indeks wyszukiwania:
+    # FTS5 mood_entries_fts w SQLite, GIN na to_tsvector w Postgres (services/entry_search.py)
+    search_text = Column(String, default=_entry_search_text)
     
     owner = relationship("User", back_populates="entries")
 
+# Lista wpisów usera: filtr po owner_id, kolejność (date desc, id desc), kursor (date, id)
+Index("ix_mood_entries_owner_date_id", MoodEntry.owner_id, MoodEntry.date.desc(), MoodEntry.id.desc())
+# Powtórzona paczka nie tworzy duplikatów (NULL = wpis bez klucza, nie koliduje)
+Index("uq_mood_entries_owner_client_id", MoodEntry.owner_id, MoodEntry.client_id, unique=True)
+Index("ix_mood_entries_owner_updated_at", MoodEntry.owner_id, MoodEntry.updated_at)
+# Usuwanie po treści: dokładny odcisk + okno czasowe na date
+Index("ix_mood_entries_owner_content_hash_date", MoodEntry.owner_id, MoodEntry.content_hash, MoodEntry.date)
+
 class AiAnalysisCache(Base):
     __tablename__ = "ai_analysis_cache"
+    __table_args__ = (
+        # Odczyt w SummaryCache.get: cache_key + świeżość, zwraca ai_suggestion.
+        # Tylko Postgres: treść jest w indeksie (INCLUDE) - odczyt bez sięgania do tabeli.
+        # SQLite nie ma INCLUDE, a (cache_key, created_at) dublowałby unikalny indeks cache_key.
+        Index(
+            "ix_ai_analysis_cache_key_created", "cache_key", "created_at",
+            postgresql_include=["ai_suggestion"]
+        ).ddl_if(dialect="postgresql"),
+        # Unieważnianie po zmianie wpisu i kompaktowanie (user + zakres dat)
+        Index("ix_ai_analysis_cache_user_range", "user_id", "start_date", "end_date"),
+        # Usuwanie wierszy po TTL
+        Index("ix_ai_analysis_cache_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    range_type = Column(String)
+    user_id = Column(GUID(), ForeignKey("users.id"))
+    range_type = Column(String) # Etykieta do podglądu ("Tydzień", "Miesiąc"...), nie jest kluczem
+    # Klucz: user + zakres dat + język + odcisk statystyk (patrz services/summary_cache.py)
+    cache_key = Column(String, unique=True, index=True)
+    start_date = Column(DateTime(timezone=True))
+    end_date = Column(DateTime(timezone=True))
+    lang = Column(String, default="pl")
+    stats_fingerprint = Column(String)
     ai_suggestion = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class SobrietyClock(Base):
     __tablename__ = "sobriety_clocks"
+    __table_args__ = (
+        Index("ix_sobriety_clocks_user_updated_at", "user_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    user_id = Column(GUID(), ForeignKey("users.id"))
     addiction_type = Column(String)
     custom_name = Column(String, default="")
     start_date = Column(DateTime(timezone=True))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+class DailyMoodRollup(Base):
+    # Dzienne agregaty wpisów usera, utrzymywane przy każdym zapisie w routers/entries.py
+    # (services/mood_rollup.py). Jeden wiersz na (user, dzień, kategoria):
+    # suma po kategoriach daje dzienną liczbę wpisów i sumę ocen.
+    __tablename__ = "daily_mood_rollup"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "category", name="uq_daily_mood_rollup_user_day_category"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    day = Column(Date)
+    category = Column(String)
+    entry_count = Column(Integer, default=0)
+    rating_sum = Column(Float, default=0.0)
+
+class AiJob(Base):
+    # Trwała kolejka zadań AI (services/job_queue.py). Klient dostaje id od razu,
+    # worker zapisuje wynik do MoodEntry.ai_analysis / ai_analysis_cache i tutaj.
+    __tablename__ = "ai_jobs"
+    __table_args__ = (
+        # Worker szuka najstarszego zadania gotowego do uruchomienia
+        Index("ix_ai_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: uuid.uuid4().hex)
+    kind = Column(String) # "analyze_mood" / "weekly_summary"
+    status = Column(String, default="queued") # queued -> running -> done / failed
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    entry_id = Column(Integer, nullable=True)
+    payload = Column(String, default="{}") # JSON z parametrami zadania
+    result = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime(timezone=True)) # następna próba nie wcześniej niż...
+    locked_at = Column(DateTime(timezone=True), nullable=True) # kiedy worker wziął zadanie
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class SyncTombstone(Base):
+    # Ślad po usuniętym wpisie / liczniku - klient synchronizujący przyrostowo
+    # dowiaduje się z niego, co skasować u siebie (routers/sync.py)
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_deleted_at", "user_id", "deleted_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"))
+    entity = Column(String) # "entry" / "clock"
+    entity_id = Column(Integer)
+    deleted_at = Column(DateTime(timezone=True), default=utcnow, index=True)
+
+class Image(Base):
+    # Zdjęcie zapisane przez POST /images/{user_id}. Klucz = SHA-256 treści, więc to samo zdjęcie
+    # dodane do kilku wpisów (albo przez kilka osób) jest na dysku raz (services/image_store.py)
+    __tablename__ = "images"
+
+    id = Column(String(64), primary_key=True) # sha256 hex
+    # Kto wysłał pierwszy; zdjęcie jest współdzielone, więc usunięcie konta zostawia je bez właściciela
+    owner_id = Column(GUID(), ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    content_type = Column(String)
+    size_bytes = Column(Integer)
+    width = Column(Integer)
+    height = Column(Integer)
+    status = Column(String, default="pending") # pending -> ready / failed (miniatury)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EntryImage(Base):
+    # Zdjęcia wpisu w kolejności - zamiast id w MoodEntry.image_paths ("a|b");
+    # image_paths zostaje dla starych ścieżek z telefonu
+    __tablename__ = "entry_images"
+
+    entry_id = Column(Integer, ForeignKey("mood_entries.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    image_id = Column(String(64), ForeignKey("images.id"), index=True)
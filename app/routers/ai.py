@@ -1,15 +1,32 @@
-import requests
-import os
 import json
+import os
+import time
 
 # ... (other imports remain, but making sure they are cleaner)
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from .. import models, database
+from ..services.llm_client import llm_client, LLMError
+from ..services.model_fallback import latency_tracker
+from ..services.model_registry import model_registry
+from ..services.similarity_cache import analysis_cache
+from ..services.mood_analysis import (
+    analysis_system_prompt, build_analysis_messages, analyze_text, save_entry_analysis
+)
+from ..services.summary_cache import summary_cache
+from ..services.job_queue import enqueue, job_view, job_pool
+from ..services.cache_compaction import cache_compactor
+from ..services.mood_trends import mood_trends, trends_cache
+from ..services.summary_scheduler import summary_scheduler
+from ..services.weekly_summary import (
+    MODELS_TO_TRY, summary_flight, range_label_for, build_summary_stats,
+    summary_key, generate_summary_advice, summary_response
+)
 
 router = APIRouter(
     prefix="/ai",
@@ -20,6 +37,8 @@ class AnalysisRequest(BaseModel):
     text: str
     previous_context: str = ""
     lang: str = "pl"  # Default to Polish
+    entry_id: Optional[int] = None # Wpis, do którego zapisujemy gotową analizę
+    stream: bool = True # SSE z kolejnymi fragmentami odpowiedzi
 
 class DateRange(BaseModel):
     start_date: Optional[datetime] = None
@@ -38,34 +57,91 @@ async def analyze_mood(request: AnalysisRequest):
     api_key = os.getenv("OPENROUTER_API_KEY")
     # ... (rest of configuration)
 
-    # Prompt selection
-    if request.lang == 'en':
-        system_prompt = (
-            "You are an empathetic mental health assistant. "
-            "Your task is to briefly analyze the user's mood based on their entry. "
-            "Respond briefly, warmly, and in English. "
-            "Suggest one simple activity that might help."
-        )
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Brak klucza API do analizy.")
+
+    if not request.stream:
+        try:
+            analysis, cached = await analyze_text(request.text, request.lang)
+        except LLMError as e:
+            print(f"analyze_mood failed: {e}")
+            raise HTTPException(status_code=502, detail="Model AI jest chwilowo niedostępny.")
+        if request.entry_id is not None:
+            await run_in_threadpool(save_entry_analysis, request.entry_id, analysis)
+        return {"analysis": analysis, "cached": cached}
+
+    # Prawie identyczny wpis (ten sam język i prompt) był już analizowany - bez wywołania AI
+    cached_analysis = analysis_cache.get(request.lang, analysis_system_prompt(request.lang), request.text)
+    if cached_analysis is not None:
+        stream = stream_cached_analysis(cached_analysis, request.entry_id)
     else:
-        system_prompt = (
-            "Jesteś empatycznym asystentem zdrowia psychicznego. "
-            "Twoim zadaniem jest krótka analiza nastroju użytkownika na podstawie jego wpisu. "
-            "Odpowiadaj krótko, ciepło i po polsku. "
-            "Zaproponuj jedną prostą czynność, która może pomóc."
-        )
-
-    # ... (rest of payload construction and request)
-    # Be careful to use system_prompt variable
-
-# ... (inside analyze_mood function)
-    payload = {
-        "model": "mistralai/mistral-small-3.1-24b-instruct:free",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": request.text}
-        ]
-    }
-# ...
+        messages = build_analysis_messages(request.text, request.lang)
+        stream = stream_analysis(messages, request.entry_id, request.lang)
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_cached_analysis(analysis: str, entry_id: Optional[int]):
+    # Ten sam format zdarzeń co stream_analysis - klient nie musi rozróżniać źródła
+    yield sse_event({"delta": analysis})
+    if entry_id is not None:
+        await run_in_threadpool(save_entry_analysis, entry_id, analysis)
+    yield sse_event({"analysis": analysis, "cached": True}, event="done")
+
+async def stream_analysis(messages: List[Dict[str, Any]], entry_id: Optional[int], lang: str = "pl"):
+    """
+    Przesyła fragmenty odpowiedzi modelu jako SSE:
+      data: {"delta": "..."}            - kolejne tokeny
+      event: done / data: {"analysis"}  - pełny tekst (zapisany do MoodEntry.ai_analysis)
+      event: error                      - żaden model nie odpowiedział
+    Model zmieniamy tylko jeśli zawiódł przed pierwszym tokenem.
+    """
+    parts: List[str] = []
+    for model in model_registry.candidates(MODELS_TO_TRY):
+        if not model_registry.try_acquire(model):
+            continue
+        started = time.monotonic()
+        recorded = False
+        try:
+            async for delta in llm_client.stream_chat_completion(model, messages):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except LLMError as e:
+            model_registry.record_failure(model, e.status_code, str(e))
+            recorded = True
+            print(f"Model {model} failed: {e}")
+            if parts:
+                # Część odpowiedzi już poszła do klienta - nie mieszamy modeli
+                # i nie zapisujemy uciętej analizy
+                yield sse_event({"detail": "Analiza została przerwana."}, event="error")
+                return
+            continue
+        else:
+            model_registry.record_success(model, time.monotonic() - started)
+            recorded = True
+        finally:
+            # Klient zamknął połączenie (GeneratorExit / CancelledError) albo inny błąd -
+            # zwalniamy miejsce próby HALF_OPEN, inaczej model zostałby zablokowany na stałe
+            if not recorded:
+                model_registry.release(model)
+        break
+
+    if not parts:
+        yield sse_event({"detail": "Model AI jest chwilowo niedostępny."}, event="error")
+        return
+
+    analysis = "".join(parts)
+    analysis_cache.put(lang, messages[0]["content"], messages[1]["content"], analysis)
+    if entry_id is not None:
+        await run_in_threadpool(save_entry_analysis, entry_id, analysis)
+    yield sse_event({"analysis": analysis}, event="done")
 
 @router.post("/weekly_summary/{user_id}")
 async def analyze_weekly_summary(
@@ -86,158 +162,130 @@ async def analyze_weekly_summary(
         start_date = date_range.start_date
         end_date = date_range.end_date
 
-    # Pobieramy wpisy
-    entries = db.query(models.MoodEntry).filter(
-        and_(
-            models.MoodEntry.owner_id == user_id,
-            models.MoodEntry.date >= start_date,
-            models.MoodEntry.date <= end_date
-        )
-    ).all()
-
-    # --- NOWA LOGIKA: DZIENNY ROZKŁAD WPISÓW ---
-    # Inicjalizujemy mapę zerami dla każdego dnia w zakresie
-    daily_counts: Dict[str, int] = {}
-    delta = (end_date - start_date).days + 1
-    
-    # Tworzymy klucze dat (np. "2023-12-01") dla całego zakresu
-    for i in range(delta):
-        day = start_date + timedelta(days=i)
-        key = day.strftime('%Y-%m-%d')
-        daily_counts[key] = 0
-
-    # Statystyka Nastrojów
-    stats: Dict[str, int] = {}
-    mood_rating_sum = 0.0
-    
-    for entry in entries:
-        # 1. Zliczanie nastrojów
-        cat = entry.category
-        stats[cat] = stats.get(cat, 0) + 1
-        mood_rating_sum += entry.mood_rating
-        
-        # 2. Zliczanie dzienne (Wykres Czas - Ilość)
-        entry_day_key = entry.date.strftime('%Y-%m-%d')
-        if entry_day_key in daily_counts:
-            daily_counts[entry_day_key] += 1
-
-    average_mood = mood_rating_sum / len(entries) if entries else 0
+    summary = build_summary_stats(db, user_id, start_date, end_date)
+    entry_count = summary["entry_count"]
 
     # --- Zaczynamy Cache ---
-    # 1. Sprawdzamy czy mamy świeżą analizę w bazie (dla danego usera, zakresu i ostatniej doby)
-    range_label = "Custom"
-    delta_days = (end_date - start_date).days
-    if delta_days <= 1: range_label = "Dzień"
-    elif delta_days <= 7: range_label = "Tydzień"
-    elif delta_days <= 31: range_label = "Miesiąc"
-    elif delta_days >= 360: range_label = "Rok"
-
-    cached_analysis = db.query(models.AiAnalysisCache).filter(
-        models.AiAnalysisCache.user_id == user_id,
-        models.AiAnalysisCache.range_type == range_label,
-        models.AiAnalysisCache.created_at >= datetime.now() - timedelta(hours=24)
-    ).order_by(models.AiAnalysisCache.created_at.desc()).first()
-
-    if cached_analysis:
-        ai_advice = cached_analysis.ai_suggestion
+    # 1. Sprawdzamy czy mamy świeżą analizę (pamięć procesu -> tabela ai_analysis_cache)
+    range_label = range_label_for(start_date, end_date)
+    cache_key, fingerprint, key_summary = summary_key(db, user_id, start_date, end_date, lang, summary)
+    cached_advice = summary_cache.get(db, cache_key, user_id, start_date, end_date)
+
+    if cached_advice is not None:
+        ai_advice = cached_advice
         print(f"CACHE HIT: Using cached advice for {user_id} ({range_label})")
         # Jeśli cache jest trafiony, nie pytamy AI
+    elif not entry_count:
+        ai_advice = "No data for this period." if lang == 'en' else "Brak danych z tego okresu."
+    elif not os.getenv("OPENROUTER_API_KEY"):
+        ai_advice = "Błąd: Brak klucza API do analizy."
     else:
-        # ...
-        if not entries:
-            ai_advice = "No data for this period." if lang == 'en' else "Brak danych z tego okresu."
-        else:
-             # Construct the prompt
-            mood_summary = ", ".join([f"{mood}: {count}" for mood, count in stats.items()])
-            
-            if lang == 'en':
-                prompt_text = (
-                    f"Analyze user activity from {start_date.strftime('%d.%m')} to {end_date.strftime('%d.%m')}. "
-                    f"Entry count: {len(entries)}. "
-                    f"Average mood: {round(average_mood, 1)}/5.0. "
-                    f"Mood distribution: {mood_summary}. "
-                    "Based on this data, write a short, personalized opinion (max 2 sentences). "
-                    "Address the user directly. "
-                    "Suggest a concrete advice or observation."
-                )
-                system_prompt_weekly = "You are an empathetic psychologist and data analyst. Your goal is to draw conclusions from the user's mood. Write briefly and in English."
-            else:
-                prompt_text = (
-                    f"Przeanalizuj aktywność użytkownika z okresu {start_date.strftime('%d.%m')} - {end_date.strftime('%d.%m')}. "
-                    f"Liczba wpisów: {len(entries)}. "
-                    f"Średnia ocena nastroju: {round(average_mood, 1)}/5.0. "
-                    f"Rozkład nastrojów: {mood_summary}. "
-                    "Na podstawie tych danych napisz krótką, spersonalizowaną opinię (max 2 zdania). "
-                    "Zwróć się bezpośrednio do użytkownika. "
-                    "Zaproponuj konkretną radę lub obserwację (np. 'Zalecam więcej snu, ponieważ...')."
-                )
-                system_prompt_weekly = "Jesteś empatycznym psychologiem i analitykiem danych. Twoim celem jest wyciągnięcie wniosków z nastroju użytkownika. Pisz krótko i po polsku."
-
-            # Call AI with Fallback
-            api_key = os.getenv("OPENROUTER_API_KEY")
-            if not api_key:
-                ai_advice = "Błąd: Brak klucza API do analizy."
-            else:
-                models_to_try = [
-                    "mistralai/mistral-small-3.1-24b-instruct:free",
-                    "google/gemini-2.0-flash-exp:free",
-                    "meta-llama/llama-3.2-11b-vision-instruct:free",
-                    "microsoft/phi-3-mini-128k-instruct:free"
-                ]
-                
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://mindguide.app",
-                    "X-Title": "Mind Guide AI"
-                }
-                
-                ai_advice = "Nie udało się wygenerować analizy (wszystkie modele zajęte)."
-                
-                for model in models_to_try:
-                    try:
-                        payload = {
-                            "model": model,
-                            "messages": [
-                                {
-                                    "role": "system", 
-                                    "content": system_prompt_weekly
-                                },
-                                {"role": "user", "content": prompt_text}
-                            ]
-                        }
-                        
-                        print(f"Trying model: {model}")
-                        resp = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, data=json.dumps(payload), timeout=15)
-                        
-                        if resp.status_code == 200:
-                            data = resp.json()
-                            if 'choices' in data and len(data['choices']) > 0:
-                                ai_advice = data['choices'][0]['message']['content']
-                                # Zapisujemy do Cache
-                                new_cache = models.AiAnalysisCache(
-                                    user_id=user_id,
-                                    range_type=range_label,
-                                    ai_suggestion=ai_advice
-                                )
-                                db.add(new_cache)
-                                db.commit()
-                                break # Success!
-                        else:
-                            print(f"Model {model} failed: {resp.status_code} - {resp.text}")
-                            
-                    except Exception as e:
-                        print(f"Exception dealing with {model}: {e}")
-                        continue
+        ai_advice = "Nie udało się wygenerować analizy (wszystkie modele zajęte)."
+
+        # Kończymy transakcję odczytu, żeby połączenie wróciło do puli
+        # na czas czekania na model (inaczej kilkanaście wolnych odpowiedzi
+        # wyczerpuje pulę SQLAlchemy i kolejne zapytania blokują pętlę zdarzeń).
+        db.commit()
+
+        try:
+            # Prompt z tych samych statystyk (pełne dni), z których jest klucz
+            ai_advice = await generate_summary_advice(
+                cache_key, fingerprint, user_id, start_date, end_date, lang, key_summary
+            )
+        except LLMError as e:
+            print(f"All models failed: {e}")
+
+    return summary_response(start_date, end_date, summary, ai_advice)
+
+@router.get("/trends/{user_id}")
+def mood_trends_for_user(
+    user_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    window: int = 7,
+    db: Session = Depends(get_db)
+):
+    # Bez dat: cała historia usera (od pierwszego wpisu do dziś)
+    if window < 1 or window > 365:
+        raise HTTPException(status_code=400, detail="window must be between 1 and 365")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    return mood_trends(db, user_id, start_date, end_date, window)
+
+# --- Kolejka zadań AI: odpowiedź od razu z job_id, wynik przez GET /ai/jobs/{job_id} ---
+
+@router.post("/analyze_mood/jobs", status_code=202)
+def submit_analyze_mood_job(request: AnalysisRequest, db: Session = Depends(get_db)):
+    if not os.getenv("OPENROUTER_API_KEY"):
+        raise HTTPException(status_code=500, detail="Brak klucza API do analizy.")
 
+    user_id = None
+    if request.entry_id is not None:
+        db_entry = db.query(models.MoodEntry).filter(models.MoodEntry.id == request.entry_id).first()
+        if db_entry is None:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        user_id = db_entry.owner_id
+
+    job = enqueue(
+        db, "analyze_mood",
+        {"text": request.text, "lang": request.lang},
+        user_id=user_id, entry_id=request.entry_id
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@router.post("/weekly_summary/{user_id}/jobs", status_code=202)
+def submit_weekly_summary_job(
+    user_id: str,
+    date_range: DateRange = None,
+    db: Session = Depends(get_db)
+):
+    # Bez klucza zadanie mogłoby się tylko nie udać - odmawiamy od razu, jak /analyze_mood/jobs
+    if not os.getenv("OPENROUTER_API_KEY"):
+        raise HTTPException(status_code=500, detail="Brak klucza API do analizy.")
+
+    lang = date_range.lang if date_range else "pl"
+    # Domyślnie ostatnie 7 dni - jak w /weekly_summary
+    if date_range is None or not date_range.end_date:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=6)
+    else:
+        start_date = date_range.start_date
+        end_date = date_range.end_date
+
+    job = enqueue(
+        db, "weekly_summary",
+        {"user_id": user_id, "start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "lang": lang},
+        user_id=user_id
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/jobs/stats")
+def ai_jobs_stats(db: Session = Depends(get_db)):
+    return job_pool.stats(db)
+
+@router.get("/jobs/{job_id}")
+async def get_ai_job(job_id: str, wait: float = 0, db: Session = Depends(get_db)):
+    # wait > 0 = long-poll: odpowiedź, gdy zadanie się zakończy (max AI_JOB_MAX_WAIT sekund)
+    job = await job_pool.wait(db, job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+@router.get("/models/scoreboard")
+def models_scoreboard():
+    # Podgląd stanu modeli: dlaczego podsumowania są wolne / który model jest pomijany
     return {
-        "period": {
-            "start": start_date,
-            "end": end_date
-        },
-        "entry_count": len(entries),
-        "average_mood_rating": round(average_mood, 2),
-        "mood_stats": stats,
-        "daily_counts": daily_counts, # <--- TO JEST NOWE DLA WYKRESU
-        "ai_suggestion": ai_advice
-    }
\ No newline at end of file
+        "hedge_delay_s": round(latency_tracker.hedge_delay(), 3),
+        "models": model_registry.scoreboard()
+    }
+
+@router.get("/cache/stats")
+def summary_cache_stats(db: Session = Depends(get_db)):
+    return {
+        "summary_cache": summary_cache.stats(),
+        "summary_table": cache_compactor.stats(db),
+        "analysis_cache": analysis_cache.stats(),
+        "trends_cache": trends_cache.stats(),
+        "single_flight": summary_flight.stats(),
+        "pregeneration": summary_scheduler.stats()
+    }
@@ -1,8 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime # <--- WAŻNY NOWY IMPORT
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone # <--- WAŻNY NOWY IMPORT
 from .. import models, schemas, database
+from ..services.summary_cache import summary_cache
+from ..services import mood_rollup, delta_sync, entry_fields, entry_import, entry_search, image_store, user_version
+from ..services.pagination import encode_cursor, decode_cursor
+from ..services.search_text import search_text
+
+# Limit wpisów w jednej paczce POST /entries/{user_id}/bulk
+ENTRIES_BULK_MAX = int(os.getenv("ENTRIES_BULK_MAX", "500"))
 
 router = APIRouter(
     prefix="/entries",
@@ -23,44 +34,50 @@ class DeleteByContentRequest(schemas.BaseModel):
     text: str
     date: datetime
 
+# Tolerancja dopasowania daty w /delete_by_content
+DELETE_BY_CONTENT_TOLERANCE = timedelta(seconds=120)
+
+def _content_window(db: Session, value: datetime):
+    # Jak wcześniej w Pythonie: porównujemy czas "ścienny" bez strefy.
+    # SQLite trzyma go bez strefy; Postgres zwracał timestamptz w UTC, więc tam dokładamy UTC.
+    value = value.replace(tzinfo=None)
+    if db.get_bind().dialect.name == "postgresql":
+        value = value.replace(tzinfo=timezone.utc)
+    return value - DELETE_BY_CONTENT_TOLERANCE, value + DELETE_BY_CONTENT_TOLERANCE
+
 @router.post("/delete_by_content", status_code=200)
 def delete_entry_by_content(
     request: DeleteByContentRequest,
     db: Session = Depends(get_db)
 ):
     # Szukamy wpisu dla danego usera
-    # Tolerancja czasowa: 60 sekund
+    # Tolerancja czasowa: 2 minuty, liczona w SQL na indeksie (owner_id, content_hash, date)
     # Tekst musi pasować dokładnie (lub można dodać fuzzy matching w przyszłości)
-    
-    entries = db.query(models.MoodEntry).filter(
-        models.MoodEntry.owner_id == request.user_id,
-        models.MoodEntry.text == request.text
+    window_start, window_end = _content_window(db, request.date)
+    entry = models.MoodEntry
+    deleted = db.execute(
+        delete(entry)
+        .where(
+            entry.owner_id == request.user_id,
+            entry.content_hash == models.content_hash(request.text),
+            entry.date > window_start,
+            entry.date < window_end,
+            # Odcisk zawęża do kilku wierszy, porównanie tekstu wyklucza kolizje
+            entry.text == request.text
+        )
+        .returning(entry.id, entry.owner_id, entry.date, entry.category, entry.mood_rating, entry.search_text)
+        .execution_options(synchronize_session=False)
     ).all()
-    
-    deleted_count = 0
-    
-    for entry in entries:
-        # Oblicz różnicę czasu
-        # entry.date w bazie może być naive lub offset-aware. Przyjmujemy założenie, że są w tej samej strefie (lub UTC).
-        # Konwersja na timestamp dla bezpiecznego porównania
-        
-        # Jeśli entry.date nie ma strefy, a input ma, lub odwrotnie -> crash.
-        # Użyjmy bezpieczniejszego podejścia:
-        
-        db_date = entry.date
-        input_date = request.date
-        
-        # Make timestamps naive for simple diff
-        if db_date.tzinfo:
-            db_date = db_date.replace(tzinfo=None)
-        if input_date.tzinfo:
-            input_date = input_date.replace(tzinfo=None)
-            
-        diff = abs((db_date - input_date).total_seconds())
-        
-        if diff < 120: # 2 minuty tolerancji
-            db.delete(entry)
-            deleted_count += 1
+
+    entry_search.remove_entries(db, [(row.id, row.search_text) for row in deleted])
+    image_store.delete_entry_images(db, [row.id for row in deleted])
+    for entry_id, owner_id, entry_date, category, mood_rating, _ in deleted:
+        summary_cache.invalidate(db, owner_id, entry_date)
+        mood_rollup.remove_entry(db, owner_id, entry_date, category, mood_rating)
+        delta_sync.record_deletion(db, owner_id, delta_sync.ENTITY_ENTRY, entry_id)
+    deleted_count = len(deleted)
+    if deleted_count:
+        user_version.bump(db, request.user_id)
             
     if deleted_count > 0:
         db.commit()
@@ -87,8 +104,10 @@ def create_entry_for_user(
     final_date = entry.date if entry.date else datetime.now()
 
     # 2. Obsługa zdjęć:
-    # Konwersja listy zdjęć na string (np. "img1.jpg|img2.jpg") do zapisu w bazie
-    images_str = "|".join(entry.image_paths) if entry.image_paths else ""
+    # Id zdjęć z POST /images trafiają do entry_images; pozostałe (ścieżki z telefonu)
+    # jak dotąd jako string (np. "img1.jpg|img2.jpg")
+    image_ids, legacy_paths = image_store.split_refs(db, entry.image_paths)
+    images_str = "|".join(legacy_paths)
 
     # 3. Tworzenie obiektu bazy danych
     db_entry = models.MoodEntry(
@@ -104,6 +123,15 @@ def create_entry_for_user(
     )
     
     db.add(db_entry)
+    # id potrzebne do indeksu wyszukiwania
+    db.flush()
+    entry_search.index_entries(db, [db_entry.id])
+    image_store.set_entry_images(db, db_entry.id, image_ids)
+    # Podsumowania AI obejmujące dzień wpisu są już nieaktualne
+    summary_cache.invalidate(db, user_id, final_date)
+    mood_rollup.add_entry(db, user_id, final_date, entry.category, entry.mood_rating)
+    # Nowy ETag dla GET /entries, /users i /sobriety tego usera
+    user_version.bump(db, user_id)
     db.commit()
     db.refresh(db_entry)
     
@@ -118,50 +146,227 @@ def create_entry_for_user(
         category=db_entry.category,
         ai_analysis=db_entry.ai_analysis,
         conversation=db_entry.conversation,
-        # Konwersja stringa "a|b" na listę ["a", "b"]
-        image_paths=db_entry.image_paths.split("|") if db_entry.image_paths else [],
+        # Konwersja stringa "a|b" na listę ["a", "b"] + id zdjęć z serwera
+        image_paths=image_store.image_refs(db_entry.image_paths, image_ids),
         owner_id=db_entry.owner_id
     )
 
+@router.post("/{user_id}/bulk", response_model=schemas.MoodEntryBulkResult)
+def create_entries_bulk(
+    user_id: str,
+    batch: schemas.MoodEntryBulkCreate,
+    db: Session = Depends(get_db)
+):
+    # Synchronizacja offline: cała paczka w jednej transakcji i jednym wielowierszowym INSERT,
+    # zamiast commit + refresh na każdy wpis. client_id z aplikacji chroni przed duplikatami,
+    # gdy ta sama paczka zostanie wysłana ponownie (np. po zerwanym połączeniu).
+    if len(batch.entries) > ENTRIES_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"Too many entries (max {ENTRIES_BULK_MAX})")
+
+    for attempt in range(2):
+        try:
+            return _insert_entries_bulk(db, user_id, batch.entries)
+        except IntegrityError:
+            # Równoległa powtórka tej samej paczki zdążyła zapisać część client_id -
+            # w drugim podejściu zostaną potraktowane jako duplikaty
+            db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="Conflicting client_id")
+
+def _bulk_saved(db_entry: models.MoodEntry, image_ids: List[str]) -> schemas.MoodEntryBulkSaved:
+    return schemas.MoodEntryBulkSaved(
+        id=db_entry.id,
+        date=db_entry.date,
+        text=db_entry.text if db_entry.text is not None else "",
+        mood_rating=db_entry.mood_rating if db_entry.mood_rating is not None else 0.0,
+        category=db_entry.category if db_entry.category is not None else "Nieznane",
+        ai_analysis=db_entry.ai_analysis or "",
+        conversation=db_entry.conversation or "",
+        image_paths=image_store.image_refs(db_entry.image_paths, image_ids),
+        owner_id=db_entry.owner_id,
+        client_id=db_entry.client_id
+    )
+
+def _insert_entries_bulk(db: Session, user_id: str, items: List[schemas.MoodEntryBulkItem]) -> schemas.MoodEntryBulkResult:
+    # Wpisy z client_id zapisane wcześniej (poprzednia próba wysłania tej paczki)
+    client_ids = {item.client_id for item in items if item.client_id is not None}
+    existing = {}
+    if client_ids:
+        existing = {
+            db_entry.client_id: db_entry
+            for db_entry in db.query(models.MoodEntry).filter(
+                models.MoodEntry.owner_id == user_id,
+                models.MoodEntry.client_id.in_(client_ids)
+            )
+        }
+
+    now = datetime.now()
+    rows = []
+    row_images = []
+    pending = set()
+    for item in items:
+        if item.client_id is not None:
+            if item.client_id in existing or item.client_id in pending:
+                continue
+            pending.add(item.client_id)
+        image_ids, legacy_paths = image_store.split_refs(db, item.image_paths)
+        row_images.append(image_ids)
+        rows.append({
+            "owner_id": user_id,
+            "client_id": item.client_id,
+            "date": item.date if item.date else now,
+            "text": item.text,
+            "mood_rating": item.mood_rating,
+            "category": item.category,
+            "image_paths": "|".join(legacy_paths),
+            "ai_analysis": item.ai_analysis or "",
+            "conversation": item.conversation or ""
+        })
+
+    saved = {}
+    new_entries = []
+    if rows:
+        # Jeden INSERT ... VALUES (...), (...) RETURNING id - id wracają w kolejności wierszy
+        stmt = insert(models.MoodEntry).returning(models.MoodEntry.id, sort_by_parameter_order=True)
+        ids = [row.id for row in db.execute(stmt, rows)]
+        entry_search.index_entries(db, ids)
+        for entry_id, image_ids in zip(ids, row_images):
+            image_store.set_entry_images(db, entry_id, image_ids)
+        for row, entry_id in zip(rows, ids):
+            db_entry = models.MoodEntry(id=entry_id, **row)
+            new_entries.append(db_entry)
+            if row["client_id"] is not None:
+                saved[row["client_id"]] = db_entry
+
+        # Agregaty i cache - raz na paczkę, nie raz na wpis
+        for day in {row["date"].date() for row in rows}:
+            summary_cache.invalidate(db, user_id, datetime(day.year, day.month, day.day))
+        mood_rollup.add_entries(db, user_id, [(row["date"], row["category"], row["mood_rating"]) for row in rows])
+        user_version.bump(db, user_id)
+
+    db.commit()
+
+    # Odpowiedź w kolejności z zapytania
+    images = image_store.image_ids_for(
+        db, [entry.id for entry in new_entries] + [entry.id for entry in existing.values()]
+    )
+    result = []
+    unkeyed = iter(entry for entry in new_entries if entry.client_id is None)
+    for item in items:
+        if item.client_id is None:
+            db_entry = next(unkeyed)
+        else:
+            db_entry = existing.get(item.client_id) or saved[item.client_id]
+        result.append(_bulk_saved(db_entry, images.get(db_entry.id, [])))
+
+    return schemas.MoodEntryBulkResult(
+        created=len(rows),
+        duplicates=len(items) - len(rows),
+        entries=result
+    )
+
+@router.post("/{user_id}/import")
+def import_entries(
+    user_id: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    # Historia z innej aplikacji: CSV (nagłówki jak pola MoodEntryCreate, image_paths "a|b")
+    # albo NDJSON. Odpowiedź to linie NDJSON z postępem po każdej paczce; ostatnia ma done=true.
+    try:
+        file_format = entry_import.detect_format(format, file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file.size is not None and file.size > entry_import.IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {entry_import.IMPORT_MAX_BYTES} bytes)")
+    if not db.query(models.User.id).filter(models.User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return StreamingResponse(
+        entry_import.stream_import(user_id, file.file, file_format), media_type="application/x-ndjson"
+    )
+
+@router.get("/{user_id}/search")
+def search_entries(
+    user_id: str,
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    # Wyniki od najlepiej pasujących; kolejna strona: offset = next_offset z odpowiedzi.
+    # highlights = pozycje [od, do) trafień w snippet.
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    return entry_fields.json_response(entry_search.search(db, user_id, q, limit, offset))
+
 @router.get("/{user_id}", response_model=List[schemas.MoodEntry])
-def read_entries(user_id: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Filtrujemy po owner_id == user_id
-    entries = db.query(models.MoodEntry)\
+def read_entries(
+    user_id: str,
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    # Stronicowanie keyset: klient przekazuje kursor z nagłówka X-Next-Cursor poprzedniej strony.
+    # skip zostaje dla starszych klientów (przy kursorze jest ignorowany).
+    # Kolejność (date desc, id desc) = indeks ix_mood_entries_owner_date_id.
+    # fields=text,mood_rating,category - tylko wybrane kolumny (id i date są zawsze);
+    # bez fields odpowiedź jak dotąd, ze wszystkimi polami.
+    # If-None-Match z aktualnym ETagiem -> 304 bez zapytania o listę
+    etag = user_version.resource_etag(db, request, "entries", user_id)
+    if user_version.not_modified(request, etag):
+        return user_version.not_modified_response(etag)
+
+    try:
+        selected = entry_fields.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = db.query(*entry_fields.columns_for(selected))\
         .filter(models.MoodEntry.owner_id == user_id)\
-        .order_by(models.MoodEntry.date.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    # Konwersja stringa z bazy z powrotem na listę dla każdego wpisu
-    # (Pydantic oczekuje listy, baza zwraca string)
+        .order_by(models.MoodEntry.date.desc(), models.MoodEntry.id.desc())
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        cursor_date, cursor_id = position
+        query = query.filter(or_(
+            models.MoodEntry.date < cursor_date,
+            and_(models.MoodEntry.date == cursor_date, models.MoodEntry.id < cursor_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+
+    # Jeden wiersz więcej - wiemy, czy jest następna strona
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Zdjęcia z POST /images - jedno zapytanie na stronę, dopisane za ścieżkami z telefonu
+    images = image_store.image_ids_for(db, [row.id for row in rows]) \
+        if "image_paths" in selected else {}
+
     results = []
-    for entry in entries:
-        try:
-            # Tworzymy obiekt schematu ręcznie lub modyfikujemy obiekt SQLAlchemy
-            # Najbezpieczniej jest zmapować to na schema:
-            img_list = entry.image_paths.split("|") if entry.image_paths else []
-            
-            # Weryfikacja krytycznych pól (aby uniknąć błędu walidacji Pydantic)
-            # Jeśli np. mood_rating jest w bazie NULL, a schema wymaga float, to tu wybuchnie.
-            # Dzięki try-except pominiemy uszkodzone wpisy.
-            
-            results.append(schemas.MoodEntry(
-                id=entry.id,
-                date=entry.date,
-                text=entry.text if entry.text is not None else "", # Fallback for text
-                mood_rating=entry.mood_rating if entry.mood_rating is not None else 0.0, # Fallback
-                category=entry.category if entry.category is not None else "Nieznane", # Fallback
-                ai_analysis=entry.ai_analysis,
-                conversation=entry.conversation,
-                image_paths=img_list,
-                owner_id=entry.owner_id
-            ))
-        except Exception as e:
-            print(f"Skipping corrupt entry ID {entry.id}: {e}")
+    for row in rows:
+        # Wartości zastępcze dla NULL jak wcześniej; wiersz bez daty pomijamy jako uszkodzony
+        item = entry_fields.row_to_dict(selected, row)
+        if item is None:
+            print(f"Skipping corrupt entry ID {row.id}: missing date")
             continue
-    
-    return results
+        if row.id in images:
+            item["image_paths"] = item["image_paths"] + images[row.id]
+        results.append(item)
+
+    headers = user_version.cache_headers(etag)
+    if has_more and results:
+        headers["X-Next-Cursor"] = encode_cursor(results[-1]["date"], results[-1]["id"])
+    # Gotowa odpowiedź - response_model służy tu tylko dokumentacji (bez drugiej walidacji)
+    return entry_fields.json_response(results, headers)
 
 @router.delete("/{entry_id}", status_code=204)
 def delete_entry(entry_id: int, db: Session = Depends(get_db)):
@@ -169,6 +374,12 @@ def delete_entry(entry_id: int, db: Session = Depends(get_db)):
     if not db_entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
+    summary_cache.invalidate(db, db_entry.owner_id, db_entry.date)
+    mood_rollup.remove_entry(db, db_entry.owner_id, db_entry.date, db_entry.category, db_entry.mood_rating)
+    delta_sync.record_deletion(db, db_entry.owner_id, delta_sync.ENTITY_ENTRY, db_entry.id)
+    user_version.bump(db, db_entry.owner_id)
+    entry_search.remove_entries(db, [(db_entry.id, db_entry.search_text)])
+    image_store.delete_entry_images(db, [db_entry.id])
     db.delete(db_entry)
     db.commit()
     return
@@ -190,31 +401,47 @@ def update_entry(entry_id: int, entry_update: schemas.MoodEntryCreate, db: Sessi
     # We generally don't update date, mood_rating, category for existing entries (unless requested),
     # but let's allow updating everything passed in proper format.
     
-    if entry_update.text is not None:
+    if entry_update.text is not None and entry_update.text != db_entry.text:
+        # Indeks wyszukiwania: stare tokeny out, nowe in
+        entry_search.remove_entries(db, [(db_entry.id, db_entry.search_text)])
         db_entry.text = entry_update.text
+        db_entry.content_hash = models.content_hash(entry_update.text)
+        db_entry.search_text = search_text(entry_update.text)
+        db.flush()
+        entry_search.index_entries(db, [db_entry.id])
         
     # Images come as list in schema, joined string in DB
+    # (id zdjęć z POST /images osobno, w entry_images)
     if entry_update.image_paths is not None:
-        db_entry.image_paths = "|".join(entry_update.image_paths)
+        image_ids, legacy_paths = image_store.split_refs(db, entry_update.image_paths)
+        db_entry.image_paths = "|".join(legacy_paths)
+        image_store.set_entry_images(db, db_entry.id, image_ids)
+        # Sama zmiana entry_images nie rusza wiersza wpisu - /sync musi ją zobaczyć
+        db_entry.updated_at = models.utcnow()
         
     # For now, we assume other fields like mood_rating might stay same or update if user changed logic.
     # In EditScreen we usually only edit text/images.
     # But let's check what EditScreen allows.
-    
-    if entry_update.image_paths is not None:
-        db_entry.image_paths = "|".join(entry_update.image_paths)
         
-    if entry_update.conversation is not None:
+    # Rozmowa przychodzi w całości przy każdej wiadomości - bez zmian nie przepisujemy
+    # (i nie kompresujemy ponownie) całej kolumny
+    if entry_update.conversation is not None and entry_update.conversation != db_entry.conversation:
         db_entry.conversation = entry_update.conversation
         
-    if entry_update.ai_analysis is not None:
+    if entry_update.ai_analysis is not None and entry_update.ai_analysis != db_entry.ai_analysis:
         db_entry.ai_analysis = entry_update.ai_analysis
-    
+
+    # Cache podsumowań AI i daily_mood_rollup zostają bez zmian: edycja nie zmienia
+    # daty, oceny ani kategorii, a tylko z nich powstają agregaty i prompt podsumowania.
+    # Lista wpisów się zmienia - nowy ETag (przy okazji też nowy klucz cache trendów).
+    user_version.bump(db, db_entry.owner_id)
     db.commit()
     db.refresh(db_entry)
     
     # Return formatted matched to response_model
-    img_list = db_entry.image_paths.split("|") if db_entry.image_paths else []
+    img_list = image_store.image_refs(
+        db_entry.image_paths, image_store.image_ids_for(db, [db_entry.id]).get(db_entry.id, [])
+    )
     return schemas.MoodEntry(
         id=db_entry.id,
         date=db_entry.date,  
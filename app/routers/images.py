@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from .. import models, database
+from ..services import image_store
+from ..services.image_store import image_pipeline
+
+router = APIRouter(
+    prefix="/images",
+    tags=["images"]
+)
+
+# Treść pod id (SHA-256) się nie zmienia - klient i CDN mogą trzymać plik bez odpytywania
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.post("/{user_id}", status_code=201)
+async def upload_image(user_id: str, response: Response, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    # Zwrócone id wpisujemy do image_paths wpisu (albo profile_image_path)
+    if not db.query(models.User.id).filter(models.User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+    data = await file.read(image_store.IMAGE_MAX_BYTES + 1)
+    if len(data) > image_store.IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image too large (max {image_store.IMAGE_MAX_BYTES} bytes)")
+    try:
+        # Hash, walidacja i zapis na dysk poza pętlą zdarzeń
+        image, duplicate = await run_in_threadpool(image_store.save_upload, db, user_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if duplicate:
+        response.status_code = 200
+    else:
+        # Miniatury w tle - odpowiedź nie czeka na Pillow
+        image_pipeline.submit(image.id)
+    return {**image_store.image_view(image), "duplicate": duplicate}
+
+@router.get("/stats")
+def image_stats():
+    return image_pipeline.stats()
+
+@router.get("/{image_id}")
+def image_metadata(image_id: str, db: Session = Depends(get_db)):
+    image = db.query(models.Image).filter(models.Image.id == image_id).first()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image_store.image_view(image)
+
+@router.get("/{image_id}/{variant}")
+def image_file(image_id: str, variant: str, request: Request, db: Session = Depends(get_db)):
+    if variant != "original" and variant not in image_store.IMAGE_VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown variant")
+    image = db.query(models.Image).filter(models.Image.id == image_id).first()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    key = image_store.variant_key(image_id, variant)
+    media_type = image.content_type if variant == "original" else image_store.VARIANT_CONTENT_TYPE
+    if variant != "original" and (image.status != "ready" or not image_store.storage.exists(key)):
+        # Miniatura jeszcze się liczy (albo się nie udała) - oddajemy oryginał, ale bez
+        # długiego cache, żeby klient pobrał miniaturę przy następnym wyświetleniu
+        return FileResponse(
+            image_store.storage.path(image_id), media_type=image.content_type,
+            headers={"Cache-Control": "no-cache"}
+        )
+
+    etag = f'"{key}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image_store.storage.path(key), media_type=media_type, headers=headers)
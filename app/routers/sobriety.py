@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
@@ -6,6 +6,7 @@ from datetime import datetime
 from uuid import UUID
 from pydantic import BaseModel
 from .. import models, database
+from ..services import delta_sync, user_version
 
 router = APIRouter(
     prefix="/sobriety",
@@ -48,12 +49,18 @@ def create_clock(clock: SobrietyClockCreate, db: Session = Depends(get_db)):
         start_date=clock.start_date
     )
     db.add(db_clock)
+    user_version.bump(db, clock.user_id)
     db.commit()
     db.refresh(db_clock)
     return db_clock
 
 @router.get("/clocks/{user_id}", response_model=List[SobrietyClockResponse])
-def get_user_clocks(user_id: str, db: Session = Depends(get_db)):
+def get_user_clocks(user_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    etag = user_version.resource_etag(db, request, "clocks", user_id)
+    if user_version.not_modified(request, etag):
+        return user_version.not_modified_response(etag)
+    response.headers.update(user_version.cache_headers(etag))
+
     clocks = db.query(models.SobrietyClock)\
         .filter(models.SobrietyClock.user_id == user_id)\
         .order_by(desc(models.SobrietyClock.created_at))\
@@ -66,6 +73,9 @@ def delete_clock(clock_id: int, db: Session = Depends(get_db)):
     if not clock:
         raise HTTPException(status_code=404, detail="Clock not found")
     
+    # Ślad usunięcia dla GET /sync/{user_id}
+    delta_sync.record_deletion(db, clock.user_id, delta_sync.ENTITY_CLOCK, clock.id)
+    user_version.bump(db, clock.user_id)
     db.delete(clock)
     db.commit()
     return {"message": "Clock deleted"}
@@ -77,6 +87,7 @@ def reset_clock(clock_id: int, reset_data: SobrietyClockReset, db: Session = Dep
         raise HTTPException(status_code=404, detail="Clock not found")
     
     clock.start_date = reset_data.new_date
+    user_version.bump(db, clock.user_id)
     db.commit()
     db.refresh(clock)
     return {"message": "Clock reset successfully", "new_start_date": clock.start_date}
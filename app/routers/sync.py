@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timezone
+from .. import schemas, database
+from ..services import delta_sync, image_store
+from .sobriety import SobrietyClockResponse
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"]
+)
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/{user_id}")
+def sync_changes(user_id: str, since: Optional[str] = None, db: Session = Depends(get_db)):
+    # Pierwsza synchronizacja bez since = pełny stan. Kolejne: since = watermark z poprzedniej odpowiedzi.
+    # Klient najpierw usuwa rekordy z "deleted", potem nadpisuje po id te z "entries" / "clocks".
+    since_value = None
+    if since:
+        since_value = delta_sync.decode_watermark(since)
+        if since_value is None:
+            raise HTTPException(status_code=400, detail="Invalid watermark")
+
+    # Watermark bierzemy przed odczytem - zmiana zapisana w trakcie trafi do następnej synchronizacji
+    now = datetime.now(timezone.utc)
+    changes = delta_sync.changes_since(db, user_id, since_value, now)
+
+    images = image_store.image_ids_for(db, [entry.id for entry in changes["entries"]])
+    entries = []
+    for entry in changes["entries"]:
+        try:
+            item = schemas.MoodEntry.model_validate(entry)
+            # Zdjęcia z POST /images za ścieżkami z telefonu - jak w GET /entries
+            item.image_paths = item.image_paths + images.get(entry.id, [])
+            entries.append(item)
+        except Exception as e:
+            print(f"Skipping corrupt entry ID {entry.id}: {e}")
+    clocks = [SobrietyClockResponse.model_validate(clock, from_attributes=True) for clock in changes["clocks"]]
+
+    # SQLite może ponownie nadać id usuniętego wpisu - istniejący wiersz wygrywa ze śladem
+    entry_ids = {entry.id for entry in changes["entries"]}
+    clock_ids = {clock.id for clock in changes["clocks"]}
+    return {
+        "full": changes["full"],
+        "entries": entries,
+        "clocks": clocks,
+        "deleted": {
+            "entries": [i for i in changes["deleted"]["entries"] if i not in entry_ids],
+            "clocks": [i for i in changes["deleted"]["clocks"] if i not in clock_ids]
+        },
+        "watermark": delta_sync.encode_watermark(now)
+    }
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
 from passlib.context import CryptContext
 import uuid
 from ..services.email_service import EmailService
+from ..services import account_export, image_store, user_version
 from .. import models, schemas, database
 
 router = APIRouter(
@@ -19,12 +23,55 @@ def get_db():
     finally:
         db.close()
 
+def _user_view(db: Session, db_user: models.User) -> schemas.User:
+    # Wpisy w profilu z tymi samymi image_paths co w /entries: ścieżki z telefonu + id zdjęć
+    user = schemas.User.model_validate(db_user)
+    images = image_store.image_ids_for(db, [entry.id for entry in user.entries])
+    for entry in user.entries:
+        entry.image_paths = entry.image_paths + images.get(entry.id, [])
+    return user
+
 @router.get("/{user_id}", response_model=schemas.User)
-def read_user_profile(user_id: str, db: Session = Depends(get_db)):
+def read_user_profile(user_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    # Profil zawiera też wpisy - ETag z tej samej wersji danych usera
+    etag = user_version.resource_etag(db, request, "user", user_id)
+    if user_version.not_modified(request, etag):
+        return user_version.not_modified_response(etag)
+    response.headers.update(user_version.cache_headers(etag))
+
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return _user_view(db, db_user)
+
+@router.get("/{user_id}/export")
+def export_user_data(
+    user_id: str,
+    format: str = "ndjson",
+    after_id: int = 0,
+    until_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # ndjson: same wpisy, jeden JSON na linię. zip: + profil, liczniki trzeźwości, analizy AI.
+    # Wznowienie po zerwaniu: after_id = id ostatniego odebranego wpisu, until_id = X-Export-Until-Id.
+    if format not in ("ndjson", "zip"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'zip'")
+    if not db.query(models.User.id).filter(models.User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    last_id = account_export.until_id(db, user_id, until_id)
+    headers = {
+        "X-Export-Until-Id": str(last_id),
+        "Content-Disposition": f'attachment; filename="mindguide-export-{date.today().isoformat()}.{format}"',
+        "Cache-Control": "no-store"
+    }
+    if format == "zip":
+        return StreamingResponse(
+            account_export.stream_zip(user_id, after_id, last_id), media_type="application/zip", headers=headers
+        )
+    return StreamingResponse(
+        account_export.stream_ndjson(user_id, after_id, last_id), media_type="application/x-ndjson", headers=headers
+    )
 
 @router.put("/{user_id}", response_model=schemas.User)
 def update_user_profile(user_id: str, user_update: schemas.UserUpdate, db: Session = Depends(get_db)):
@@ -74,9 +121,10 @@ def update_user_profile(user_id: str, user_update: schemas.UserUpdate, db: Sessi
         
         db_user.hashed_password = pwd_context.hash(user_update.password)
 
+    user_version.bump(db, db_user.id)
     db.commit()
     db.refresh(db_user)
-    return db_user
+    return _user_view(db, db_user)
 
 @router.delete("/{user_id}", status_code=204)
 def delete_user_account(user_id: str, db: Session = Depends(get_db)):
@@ -84,6 +132,14 @@ def delete_user_account(user_id: str, db: Session = Depends(get_db)):
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Dane pochodne usera (agregaty, ślady synchronizacji, zadania AI) - w Postgres usuwa je też
+    # ON DELETE CASCADE (add_user_cascade.py), ale SQLite nie sprawdza kluczy obcych
+    for model in (models.DailyMoodRollup, models.SyncTombstone, models.AiJob):
+        db.query(model).filter(model.user_id == db_user.id).delete(synchronize_session=False)
+    # Zdjęcia są współdzielone (klucz = treść) - zostają, tylko bez właściciela
+    db.query(models.Image).filter(models.Image.owner_id == db_user.id)\
+        .update({"owner_id": None}, synchronize_session=False)
+
     # Usuwamy użytkownika (kaskada usunie powiązane wpisy, jeśli tak skonfigurowano bazę,
     # w przeciwnym razie trzeba ręcznie usunąć wpisy z moods/sobriety)
     db.delete(db_user)
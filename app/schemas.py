@@ -33,6 +33,22 @@ class MoodEntry(MoodEntryCreate):
             return v.split("|") if v else []
         return v
 
+class MoodEntryBulkItem(MoodEntryCreate):
+    # Klucz idempotencji z aplikacji (np. UUID wpisu zapisanego offline)
+    client_id: Optional[str] = None
+
+class MoodEntryBulkCreate(BaseModel):
+    entries: List[MoodEntryBulkItem]
+
+class MoodEntryBulkSaved(MoodEntry):
+    client_id: Optional[str] = None
+
+class MoodEntryBulkResult(BaseModel):
+    created: int
+    duplicates: int
+    # Wpisy w kolejności z zapytania - dla duplikatów wersja zapisana wcześniej
+    entries: List[MoodEntryBulkSaved]
+
 # --- USER SCHEMAS ---
 
 class UserCreate(BaseModel):
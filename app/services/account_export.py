@@ -0,0 +1,164 @@
+import io
+import os
+import zipfile
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import database, models
+from . import entry_fields, image_store
+
+# Eksport wszystkich danych usera (GET /users/{user_id}/export).
+# - Wpisy czytamy jednym zapytaniem z kursorem po stronie serwera (yield_per / stream_results)
+#   i od razu serializujemy orjson do NDJSON - pamięć nie rośnie z liczbą wpisów.
+# - Wpisy idą w kolejności id, każdy wiersz ma id: przerwany eksport wznawia się od
+#   after_id=<ostatnie odebrane id> z tym samym until_id (nagłówek X-Export-Until-Id),
+#   więc wznowienie nie dokłada wpisów dodanych w międzyczasie i niczego nie powtarza.
+# - format=zip: dodatkowo profil, liczniki trzeźwości i zapisane analizy AI, pakowane
+#   zipfile do strumienia bez seek (bez pliku tymczasowego).
+
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "500"))
+# Ile bajtów zbieramy przed wysłaniem fragmentu odpowiedzi
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+EXPORT_ZIP_LEVEL = int(os.getenv("EXPORT_ZIP_LEVEL", "4"))
+EXPORT_VERSION = 1
+
+ENTRY_FIELDS = list(entry_fields.ENTRY_COLUMNS)
+
+
+def _dumps(value) -> bytes:
+    # Te same opcje co w GET /entries - eksport wygląda jak odpowiedź API
+    return orjson.dumps(value, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def until_id(db: Session, user_id: str, requested: Optional[int]) -> int:
+    """Górna granica zakresu: podana przez klienta albo największe id wpisu w chwili startu."""
+    if requested is not None:
+        return requested
+    return db.query(func.max(models.MoodEntry.id)).filter(models.MoodEntry.owner_id == user_id).scalar() or 0
+
+
+def entry_lines(db: Session, user_id: str, after_id: int, last_id: int) -> Iterator[bytes]:
+    """Wpisy (after_id, last_id] jako linie NDJSON; z bazy po EXPORT_BATCH wierszy naraz."""
+    statement = select(*entry_fields.columns_for(ENTRY_FIELDS))\
+        .where(
+            models.MoodEntry.owner_id == user_id,
+            models.MoodEntry.id > after_id,
+            models.MoodEntry.id <= last_id
+        )\
+        .order_by(models.MoodEntry.id)\
+        .execution_options(yield_per=EXPORT_BATCH)
+    for rows in db.execute(statement).partitions():
+        # Zdjęcia z POST /images - jedno zapytanie na paczkę
+        images = image_store.image_ids_for(db, [row.id for row in rows])
+        for row in rows:
+            item = entry_fields.row_to_dict(ENTRY_FIELDS, row)
+            if item is None:
+                print(f"Export: skipping corrupt entry ID {row.id}: missing date")
+                continue
+            if row.id in images:
+                item["image_paths"] = item["image_paths"] + images[row.id]
+            yield _dumps(item) + b"\n"
+
+
+def _chunked(parts: Iterator[bytes]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for part in parts:
+        buffer += part
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def stream_ndjson(user_id: str, after_id: int, last_id: int) -> Iterator[bytes]:
+    # Własna sesja: generator działa dłużej niż zależność get_db żądania
+    db = database.SessionLocal()
+    try:
+        yield from _chunked(entry_lines(db, user_id, after_id, last_id))
+    finally:
+        db.close()
+
+
+class _ZipSink(io.RawIOBase):
+    """Strumień tylko do zapisu - zipfile bez seek pisze deskryptory danych za plikami."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _profile(user: models.User, last_id: int) -> dict:
+    return {
+        "export_version": EXPORT_VERSION,
+        "exported_at": datetime.now(timezone.utc),
+        "until_id": last_id,
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "name": user.name,
+            "surname": user.surname,
+            "username": user.username,
+            "birth_date": user.birth_date,
+            "profile_image_path": user.profile_image_path,
+            "is_dark_mode": user.is_dark_mode,
+            "custom_assistant_name": user.custom_assistant_name,
+        }
+    }
+
+
+def _clock_lines(db: Session, user_id: str) -> Iterator[bytes]:
+    clock = models.SobrietyClock
+    rows = db.query(clock.id, clock.addiction_type, clock.custom_name, clock.start_date, clock.created_at)\
+        .filter(clock.user_id == user_id).order_by(clock.id)
+    for row in rows:
+        yield _dumps(row._asdict()) + b"\n"
+
+
+def _analysis_lines(db: Session, user_id: str) -> Iterator[bytes]:
+    cache = models.AiAnalysisCache
+    rows = db.query(
+        cache.id, cache.range_type, cache.start_date, cache.end_date, cache.lang, cache.ai_suggestion, cache.created_at
+    ).filter(cache.user_id == user_id).order_by(cache.start_date, cache.id)\
+        .execution_options(yield_per=EXPORT_BATCH)
+    for row in rows:
+        yield _dumps(row._asdict()) + b"\n"
+
+
+def stream_zip(user_id: str, after_id: int, last_id: int) -> Iterator[bytes]:
+    db = database.SessionLocal()
+    sink = _ZipSink()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=EXPORT_ZIP_LEVEL) as archive:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+            archive.writestr("profile.json", _dumps(_profile(user, last_id)))
+            members = (
+                ("entries.ndjson", entry_lines(db, user_id, after_id, last_id)),
+                ("sobriety_clocks.ndjson", _clock_lines(db, user_id)),
+                ("analyses.ndjson", _analysis_lines(db, user_id)),
+            )
+            for name, parts in members:
+                # force_zip64: rozmiar nie jest znany z góry, a wpisy mogą przekroczyć 2 GiB
+                with archive.open(name, "w", force_zip64=True) as member:
+                    for part in _chunked(parts):
+                        member.write(part)
+                        if len(sink.buffer) >= EXPORT_CHUNK_BYTES:
+                            yield sink.drain()
+        yield sink.drain()
+    finally:
+        db.close()
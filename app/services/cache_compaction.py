@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, exists, func, or_, text
+from sqlalchemy.orm import Session, aliased
+
+from .. import database, models
+from .delta_sync import purge_tombstones
+from .image_store import purge_orphan_images
+from .summary_cache import summary_cache
+
+# Sprzątanie tabeli ai_analysis_cache, która inaczej tylko rośnie:
+# 1. wiersze po TTL (AI_CACHE_TTL_HOURS) - get() i tak ich nie zwraca,
+# 2. stare wiersze bez cache_key (sprzed add_ai_cache_key.py) - nie da się ich trafić,
+# 3. starsze wersje podsumowania tego samego zakresu (user + dni + język), nadpisane
+#    przez nowszy odcisk statystyk - zostaje tylko najnowszy wiersz.
+# Usuwamy paczkami po id, żeby nie trzymać długiej blokady (SQLite blokuje całą bazę).
+# Przy okazji: ślady usunięć synchronizacji starsze niż SYNC_TOMBSTONE_DAYS (delta_sync.py)
+# i zdjęcia, których nie używa żaden wpis ani profil (image_store.py).
+
+AI_CACHE_COMPACT_ENABLED = os.getenv("AI_CACHE_COMPACT_ENABLED", "1") == "1"
+AI_CACHE_COMPACT_INTERVAL = float(os.getenv("AI_CACHE_COMPACT_INTERVAL", "3600"))
+AI_CACHE_COMPACT_BATCH = int(os.getenv("AI_CACHE_COMPACT_BATCH", "500"))
+# Przerwa między paczkami - zapisy użytkowników nie czekają na całe sprzątanie
+AI_CACHE_COMPACT_PAUSE = float(os.getenv("AI_CACHE_COMPACT_PAUSE", "0.05"))
+
+
+def _delete_in_batches(db: Session, id_query, batch_size: int) -> int:
+    deleted = 0
+    while True:
+        ids = [row[0] for row in id_query.limit(batch_size).all()]
+        if not ids:
+            return deleted
+        db.query(models.AiAnalysisCache)\
+            .filter(models.AiAnalysisCache.id.in_(ids))\
+            .delete(synchronize_session=False)
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        if AI_CACHE_COMPACT_PAUSE:
+            time.sleep(AI_CACHE_COMPACT_PAUSE)
+
+
+def expired_rows(db: Session, now: datetime):
+    cache = models.AiAnalysisCache
+    return db.query(cache.id).filter(cache.created_at < now - summary_cache.ttl)
+
+
+def legacy_rows(db: Session):
+    cache = models.AiAnalysisCache
+    return db.query(cache.id).filter(cache.cache_key.is_(None))
+
+
+def superseded_rows(db: Session):
+    """Wiersze, dla których istnieje nowszy wiersz tego samego usera, zakresu dni i języka."""
+    cache = models.AiAnalysisCache
+    newer = aliased(models.AiAnalysisCache)
+    return db.query(cache.id).filter(
+        exists().where(and_(
+            newer.user_id == cache.user_id,
+            newer.lang == cache.lang,
+            # Klucz liczony z dokładnością do dnia (summary_cache_key)
+            func.date(newer.start_date) == func.date(cache.start_date),
+            func.date(newer.end_date) == func.date(cache.end_date),
+            or_(
+                newer.created_at > cache.created_at,
+                and_(newer.created_at == cache.created_at, newer.id > cache.id)
+            )
+        ))
+    )
+
+
+def table_size(db: Session) -> dict:
+    rows = db.query(func.count(models.AiAnalysisCache.id)).scalar()
+    size_bytes = None
+    if db.get_bind().dialect.name == "postgresql":
+        size_bytes = db.execute(text("SELECT pg_total_relation_size('ai_analysis_cache')")).scalar()
+    return {"rows": rows, "bytes": size_bytes}
+
+
+def compact(db: Session, now: Optional[datetime] = None, batch_size: int = AI_CACHE_COMPACT_BATCH) -> dict:
+    """Jedno przejście sprzątania. Commituje po każdej paczce."""
+    now = now or datetime.now()
+    return {
+        "expired": _delete_in_batches(db, expired_rows(db, now), batch_size),
+        "legacy": _delete_in_batches(db, legacy_rows(db), batch_size),
+        "superseded": _delete_in_batches(db, superseded_rows(db), batch_size),
+    }
+
+
+class CacheCompactor:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.deleted = {"expired": 0, "legacy": 0, "superseded": 0}
+        self.tombstones_purged = 0
+        self.images_purged = 0
+        self.last_run: Optional[datetime] = None
+        self.last_duration_s: Optional[float] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception as e:
+                print(f"AI cache compaction error: {e}")
+            await asyncio.sleep(AI_CACHE_COMPACT_INTERVAL)
+
+    def run_once(self) -> dict:
+        started = time.monotonic()
+        db = database.SessionLocal()
+        try:
+            result = compact(db)
+            tombstones = purge_tombstones(db, datetime.now(timezone.utc))
+            images = purge_orphan_images(db, datetime.now(timezone.utc))
+        finally:
+            db.close()
+        self.runs += 1
+        for reason, count in result.items():
+            self.deleted[reason] += count
+        self.tombstones_purged += tombstones
+        self.images_purged += images
+        if tombstones:
+            print(f"Sync: purged {tombstones} old tombstones")
+        if images:
+            print(f"Images: purged {images} unreferenced images")
+        self.last_run = datetime.now()
+        self.last_duration_s = round(time.monotonic() - started, 3)
+        if any(result.values()):
+            print(f"AI cache compaction: deleted {result}")
+        return result
+
+    def stats(self, db: Session) -> dict:
+        return {
+            "enabled": AI_CACHE_COMPACT_ENABLED,
+            "table": table_size(db),
+            "runs": self.runs,
+            "deleted": dict(self.deleted),
+            "tombstones_purged": self.tombstones_purged,
+            "images_purged": self.images_purged,
+            "last_run": self.last_run,
+            "last_duration_s": self.last_duration_s
+        }
+
+
+cache_compactor = CacheCompactor()
@@ -0,0 +1,84 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Synchronizacja przyrostowa (GET /sync/{user_id}?since=...): zmienione wiersze po updated_at
+# i ślady usunięć (sync_tombstones) zamiast pobierania całej listy wpisów.
+
+# Zapas przy porównaniu z watermarkiem: transakcja, która dostała updated_at przed
+# wydaniem watermarku, a commit po nim, nie zostanie pominięta. Klient nadpisuje po id,
+# więc powtórzony wiersz niczego nie psuje.
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+# Jak długo trzymamy ślady usunięć; starszy watermark = pełna synchronizacja
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+
+ENTITY_ENTRY = "entry"
+ENTITY_CLOCK = "clock"
+
+
+def record_deletion(db: Session, user_id, entity: str, entity_id: int):
+    """Nie commituje - wywołujący commituje razem z usunięciem wiersza."""
+    if user_id is None:
+        return
+    db.add(models.SyncTombstone(user_id=user_id, entity=entity, entity_id=entity_id))
+
+
+def encode_watermark(value: datetime) -> str:
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def decode_watermark(watermark: str) -> Optional[datetime]:
+    try:
+        value = datetime.fromisoformat(watermark)
+    except ValueError:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _bound(db: Session, value: datetime) -> datetime:
+    # SQLite trzyma czas bez strefy (zapisany w UTC przez models.utcnow)
+    if db.get_bind().dialect.name == "sqlite":
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def changes_since(db: Session, user_id: str, since: Optional[datetime], now: datetime) -> Dict[str, object]:
+    """
+    Zmiany od watermarku. since=None albo starszy niż retencja śladów => pełny stan (full=True),
+    bo klient mógł przegapić usunięcia.
+    """
+    full = since is None or since < now - timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+    entries_query = db.query(models.MoodEntry).filter(models.MoodEntry.owner_id == user_id)
+    clocks_query = db.query(models.SobrietyClock).filter(models.SobrietyClock.user_id == user_id)
+    deleted: Dict[str, List[int]] = {"entries": [], "clocks": []}
+
+    if not full:
+        threshold = _bound(db, since - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+        entries_query = entries_query.filter(models.MoodEntry.updated_at >= threshold)
+        clocks_query = clocks_query.filter(models.SobrietyClock.updated_at >= threshold)
+
+        tombstones = db.query(models.SyncTombstone.entity, models.SyncTombstone.entity_id)\
+            .filter(models.SyncTombstone.user_id == user_id, models.SyncTombstone.deleted_at >= threshold)\
+            .all()
+        for entity, entity_id in tombstones:
+            deleted["entries" if entity == ENTITY_ENTRY else "clocks"].append(entity_id)
+
+    return {
+        "full": full,
+        "entries": entries_query.order_by(models.MoodEntry.id).all(),
+        "clocks": clocks_query.order_by(models.SobrietyClock.id).all(),
+        "deleted": deleted
+    }
+
+
+def purge_tombstones(db: Session, now: datetime) -> int:
+    count = db.query(models.SyncTombstone)\
+        .filter(models.SyncTombstone.deleted_at < _bound(db, now - timedelta(days=SYNC_TOMBSTONE_DAYS)))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return count
@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import Response
+
+from .. import models
+
+# Lekka serializacja listy wpisów (GET /entries/{user_id}?fields=...).
+# Ekran listy pokazuje tylko text, ocenę, kategorię i datę - conversation i ai_analysis
+# to największe kolumny, więc przy projekcji nie są nawet czytane z bazy.
+# Wiersze idą prosto do słowników i orjson, bez budowania schemas.MoodEntry
+# i drugiej walidacji przez response_model.
+
+ENTRY_COLUMNS = {
+    "id": models.MoodEntry.id,
+    "date": models.MoodEntry.date,
+    "text": models.MoodEntry.text,
+    "mood_rating": models.MoodEntry.mood_rating,
+    "category": models.MoodEntry.category,
+    "ai_analysis": models.MoodEntry.ai_analysis,
+    "conversation": models.MoodEntry.conversation,
+    "image_paths": models.MoodEntry.image_paths,
+    "owner_id": models.MoodEntry.owner_id,
+}
+# Zawsze w odpowiedzi - z nich powstaje kursor następnej strony
+REQUIRED_FIELDS = ("id", "date")
+
+# Te same wartości zastępcze co wcześniej przy ręcznym budowaniu schemas.MoodEntry
+_FALLBACKS = {
+    "text": "",
+    "mood_rating": 0.0,
+    "category": "Nieznane",
+    "ai_analysis": "",
+    "conversation": "",
+}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    "text,mood_rating" -> lista kolumn w stałej kolejności (z id i date).
+    None = wszystkie pola. Rzuca ValueError dla nieznanego pola.
+    """
+    if fields is None or not fields.strip():
+        return list(ENTRY_COLUMNS)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(ENTRY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.update(REQUIRED_FIELDS)
+    return [name for name in ENTRY_COLUMNS if name in requested]
+
+
+def columns_for(fields: List[str]) -> list:
+    return [ENTRY_COLUMNS[name] for name in fields]
+
+
+def row_to_dict(fields: List[str], row) -> Optional[Dict[str, Any]]:
+    """Krotka (w kolejności fields) -> słownik do JSON. None = uszkodzony wiersz (brak daty)."""
+    item = dict(zip(fields, row))
+    if item["date"] is None:
+        return None
+    for name, fallback in _FALLBACKS.items():
+        if name in item and item[name] is None:
+            item[name] = fallback
+    if "image_paths" in item:
+        item["image_paths"] = item["image_paths"].split("|") if item["image_paths"] else []
+    return item
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    # OPT_UTC_Z: czas UTC jako "...Z", tak jak serializował go Pydantic
+    return Response(
+        content=orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS),
+        media_type="application/json",
+        headers=headers
+    )
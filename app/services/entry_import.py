@@ -0,0 +1,226 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .. import database, models, schemas
+from . import entry_search, image_store, mood_rollup, user_version
+from .summary_cache import summary_cache
+
+# Import historii wpisów z pliku (POST /entries/{user_id}/import), np. z innej aplikacji.
+# - Plik czytamy strumieniowo (CSV albo NDJSON - też ten z GET /users/{user_id}/export),
+#   wiersze walidujemy schemas.MoodEntryBulkItem i zapisujemy paczkami po IMPORT_BATCH:
+#   jeden wielowierszowy INSERT + commit na paczkę.
+# - Agregaty (daily_mood_rollup), cache podsumowań oraz wersja danych usera (ETag, klucz
+#   cache trendów) są aktualizowane raz, na końcu importu - także gdy import przerwie błąd
+#   albo klient.
+#   Tylko twarde zabicie procesu w trakcie zostawia agregaty do przeliczenia
+#   (rebuild_mood_rollup.py).
+# - client_id w wierszu = import można powtórzyć bez duplikatów.
+
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "1000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+# Szczegóły błędów w odpowiedzi dla tylu wierszy; dalsze są tylko liczone
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Rozmowy w CSV bywają dłuższe niż domyślne 128 KiB na pole
+csv.field_size_limit(max(csv.field_size_limit(), 16 * 1024 * 1024))
+
+
+def detect_format(requested: Optional[str], filename: Optional[str], content_type: Optional[str]) -> str:
+    """format z zapytania, a bez niego z rozszerzenia / typu pliku. ValueError, gdy nieznany."""
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+        return requested
+    name = (filename or "").lower()
+    if name.endswith(".csv") or (content_type or "").startswith("text/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").startswith("application/x-ndjson"):
+        return "ndjson"
+    raise ValueError("Unknown file format - pass format=csv or format=ndjson")
+
+
+def _ndjson_rows(stream: BinaryIO) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(value, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, value, None
+
+
+def _csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    # utf-8-sig: Excel zapisuje CSV z BOM
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Puste komórki = wartości domyślne schematu
+            values = {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+            if "image_paths" in values:
+                values["image_paths"] = values["image_paths"].split("|")
+            yield reader.line_num, values, None
+    except (UnicodeDecodeError, csv.Error) as e:
+        yield reader.line_num, None, f"Invalid CSV: {e}"
+    finally:
+        # Plik zamyka wywołujący (UploadFile), nie TextIOWrapper
+        text.detach()
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+
+class EntryImport:
+    def __init__(self, db: Session, user_id: str):
+        self.db = db
+        self.user_id = user_id
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict[str, object]] = []
+        self.error: Optional[str] = None
+        # Agregaty zbierane przez cały import, zapisywane raz w _finish
+        self._rollup_groups: Dict = {}
+        self._seen_client_ids = set()
+
+    def _reject(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _batches(self, rows) -> Iterator[List[schemas.MoodEntryBulkItem]]:
+        batch = []
+        for line, values, error in rows:
+            self.processed += 1
+            if error is None:
+                try:
+                    batch.append(schemas.MoodEntryBulkItem.model_validate(values))
+                except ValidationError as e:
+                    error = _validation_message(e)
+            if error is not None:
+                self._reject(line, error)
+            if len(batch) >= IMPORT_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _insert_batch(self, items: List[schemas.MoodEntryBulkItem], now: datetime):
+        db = self.db
+        client_ids = {item.client_id for item in items if item.client_id is not None} - self._seen_client_ids
+        existing = set()
+        if client_ids:
+            existing = {
+                row[0] for row in db.query(models.MoodEntry.client_id).filter(
+                    models.MoodEntry.owner_id == self.user_id,
+                    models.MoodEntry.client_id.in_(client_ids)
+                )
+            }
+
+        rows = []
+        row_images = []
+        for item in items:
+            if item.client_id is not None:
+                if item.client_id in existing or item.client_id in self._seen_client_ids:
+                    self.duplicates += 1
+                    continue
+                self._seen_client_ids.add(item.client_id)
+            image_ids, legacy_paths = image_store.split_refs(db, item.image_paths) if item.image_paths else ([], [])
+            row_images.append(image_ids)
+            rows.append({
+                "owner_id": self.user_id,
+                "client_id": item.client_id,
+                "date": item.date if item.date else now,
+                "text": item.text,
+                "mood_rating": item.mood_rating,
+                "category": item.category,
+                "image_paths": "|".join(legacy_paths),
+                "ai_analysis": item.ai_analysis or "",
+                "conversation": item.conversation or ""
+            })
+        if not rows:
+            return
+
+        stmt = insert(models.MoodEntry).returning(models.MoodEntry.id, sort_by_parameter_order=True)
+        ids = [row.id for row in db.execute(stmt, rows)]
+        # Indeks wyszukiwania i zdjęcia w tej samej transakcji co wpisy
+        entry_search.index_entries(db, ids)
+        for entry_id, image_ids in zip(ids, row_images):
+            if image_ids:
+                image_store.set_entry_images(db, entry_id, image_ids)
+        db.commit()
+        self.imported += len(rows)
+        mood_rollup.group_entries(
+            db, [(row["date"], row["category"], row["mood_rating"]) for row in rows], self._rollup_groups
+        )
+
+    def _finish(self):
+        if not self.imported:
+            return
+        db = self.db
+        try:
+            mood_rollup.add_groups(db, self.user_id, self._rollup_groups)
+            # Import dotyka zwykle wielu miesięcy - wszystkie podsumowania usera naraz
+            summary_cache.invalidate(db, self.user_id, None)
+            user_version.bump(db, self.user_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Import for user {self.user_id}: aggregates not updated, run rebuild_mood_rollup.py: {e}")
+            self.error = self.error or f"Entries saved, aggregates not updated: {e}"
+
+    def progress(self, done: bool = False) -> dict:
+        result = {
+            "processed": self.processed,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed
+        }
+        if done:
+            result.update(done=True, errors=self.errors, error=self.error)
+        return result
+
+    def run(self, rows) -> Iterator[dict]:
+        """Postęp po każdej paczce, na końcu podsumowanie z done=True."""
+        now = datetime.now()
+        try:
+            for batch in self._batches(rows):
+                self._insert_batch(batch, now)
+                yield self.progress()
+        except Exception as e:
+            # Zapisane paczki zostają; przerwana paczka wycofana w całości
+            self.db.rollback()
+            self.error = str(e)
+            print(f"Import for user {self.user_id} stopped after {self.imported} entries: {e}")
+        finally:
+            self._finish()
+        yield self.progress(done=True)
+
+
+def stream_import(user_id: str, stream: BinaryIO, file_format: str) -> Iterator[bytes]:
+    """Linie NDJSON z postępem - odpowiedź POST /entries/{user_id}/import."""
+    # Własna sesja: import trwa dłużej niż zależność get_db żądania
+    db = database.SessionLocal()
+    try:
+        rows = _csv_rows(stream) if file_format == "csv" else _ndjson_rows(stream)
+        for progress in EntryImport(db, user_id).run(rows):
+            yield orjson.dumps(progress) + b"\n"
+    finally:
+        db.close()
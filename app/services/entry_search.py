@@ -0,0 +1,173 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from .. import models
+from .search_text import query_terms, search_text, words
+
+# Wyszukiwanie pełnotekstowe we wpisach usera (GET /entries/{user_id}/search).
+# Indeksujemy MoodEntry.search_text (rdzenie słów, services/search_text.py):
+# - Postgres: indeks GIN na to_tsvector('simple', search_text) - utrzymuje go sama baza,
+# - SQLite: tabela FTS5 mood_entries_fts z treścią w mood_entries (content=), którą
+#   routers/entries.py aktualizuje przy każdym zapisie, w tej samej transakcji co wpis.
+# Wycinki z podświetleniem liczymy w Pythonie z oryginalnego tekstu (indeks ma tylko rdzenie).
+
+FTS_TABLE = "mood_entries_fts"
+SEARCH_MAX_LIMIT = 50
+SNIPPET_WORDS = 12
+BACKFILL_BATCH = 1000
+
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def index_entries(db: Session, entry_ids: Iterable[int]):
+    """Nowe wpisy do FTS5 (po flush, przed commitem). W Postgres nic - indeks GIN."""
+    entry_ids = list(entry_ids)
+    if not entry_ids or not _is_sqlite(db):
+        return
+    db.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, search_text) "
+        "SELECT id, search_text FROM mood_entries WHERE id IN :ids AND search_text IS NOT NULL"
+    ).bindparams(bindparam("ids", expanding=True)), {"ids": entry_ids})
+
+
+def remove_entries(db: Session, entries: Iterable[Tuple[int, Optional[str]]]):
+    """(id, search_text sprzed zmiany) - FTS5 z zewnętrzną treścią usuwa wpis po starych tokenach."""
+    rows = [{"id": entry_id, "search_text": value} for entry_id, value in entries if value is not None]
+    if not rows or not _is_sqlite(db):
+        return
+    db.execute(text(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', :id, :search_text)"
+    ), rows)
+
+
+def _backfill_search_text(db: Session) -> int:
+    # Wpisy sprzed kolumny search_text
+    total = 0
+    while True:
+        rows = db.query(models.MoodEntry.id, models.MoodEntry.text)\
+            .filter(models.MoodEntry.search_text.is_(None), models.MoodEntry.text.isnot(None))\
+            .limit(BACKFILL_BATCH).all()
+        if not rows:
+            return total
+        db.execute(
+            text("UPDATE mood_entries SET search_text = :search_text WHERE id = :id"),
+            [{"id": entry_id, "search_text": search_text(value)} for entry_id, value in rows]
+        )
+        db.commit()
+        total += len(rows)
+
+
+def ensure_index(db: Session):
+    """Przy starcie: uzupełnia search_text, a w SQLite tworzy i (przy pierwszym razie) buduje FTS5."""
+    filled = _backfill_search_text(db)
+    if filled:
+        print(f"Search: filled search_text for {filled} entries")
+    if not _is_sqlite(db):
+        return
+    exists = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    if exists is None:
+        db.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "search_text, content='mood_entries', content_rowid='id', tokenize='unicode61')"
+        ))
+    if exists is None or filled:
+        # Pełna przebudowa z mood_entries - pierwsze uruchomienie albo wpisy dopisane z pominięciem indeksu
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        print(f"Search: built {FTS_TABLE}")
+    db.commit()
+
+
+def _match_expression(terms: List[str]) -> str:
+    # Każdy rdzeń jako prefiks ("zmecz"* trafia też w "zmeczeni"), wszystkie wymagane
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _ts_query(terms: List[str]) -> str:
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _ranked_ids(db: Session, user_id: str, terms: List[str], limit: int, offset: int) -> List[Tuple[int, float]]:
+    # user_id przez typ kolumny - UUID w Postgres, hex w SQLite
+    owner = bindparam("user_id", type_=models.GUID())
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+    if _is_sqlite(db):
+        # bm25: mniejszy = lepszy
+        rows = db.execute(text(
+            f"SELECT e.id, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} "
+            f"JOIN mood_entries e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match AND e.owner_id = :user_id "
+            "ORDER BY score, e.id DESC LIMIT :limit OFFSET :offset"
+        ).bindparams(owner), {**params, "match": _match_expression(terms)}).all()
+        return [(entry_id, -score) for entry_id, score in rows]
+
+    rows = db.execute(text(
+        "SELECT id, ts_rank_cd(to_tsvector('simple', coalesce(search_text, '')), query) AS score "
+        "FROM mood_entries, to_tsquery('simple', :query) AS query "
+        "WHERE owner_id = :user_id AND to_tsvector('simple', coalesce(search_text, '')) @@ query "
+        "ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset"
+    ).bindparams(owner), {**params, "query": _ts_query(terms)}).all()
+    return [(entry_id, float(score)) for entry_id, score in rows]
+
+
+def snippet(value: str, terms: List[str], size: int = SNIPPET_WORDS) -> Dict[str, Any]:
+    """Fragment tekstu wokół trafień + pozycje [początek, koniec) trafień we fragmencie."""
+    tokens = words(value)
+    if not tokens:
+        return {"snippet": value or "", "highlights": []}
+    hits = [any(token.startswith(term) for term in terms) for _, _, token in tokens]
+    # Okno z największą liczbą trafień (suma krocząca po słowach)
+    best_start, best_count, count = 0, -1, 0
+    for i in range(len(tokens)):
+        count += hits[i]
+        if i >= size:
+            count -= hits[i - size]
+        if count > best_count:
+            best_count, best_start = count, max(0, i - size + 1)
+    window = tokens[best_start:best_start + size]
+    start = window[0][0] if best_start > 0 else 0
+    end = window[-1][1] if best_start + size < len(tokens) else len(value)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(value) else ""
+    highlights = [
+        [len(prefix) + token_start - start, len(prefix) + token_end - start]
+        for (token_start, token_end, _), hit in zip(window, hits[best_start:best_start + size])
+        if hit
+    ]
+    return {"snippet": prefix + value[start:end] + suffix, "highlights": highlights}
+
+
+def search(db: Session, user_id: str, query: str, limit: int, offset: int) -> Dict[str, Any]:
+    terms = query_terms(query)
+    if not terms:
+        return {"query": query, "results": [], "next_offset": None}
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    # Jeden wiersz więcej - wiemy, czy jest następna strona
+    ranked = _ranked_ids(db, user_id, terms, limit + 1, offset)
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+
+    entry = models.MoodEntry
+    rows = {
+        row.id: row for row in db.query(entry.id, entry.date, entry.text, entry.mood_rating, entry.category)
+        .filter(entry.id.in_([entry_id for entry_id, _ in ranked]))
+    } if ranked else {}
+    results = []
+    for entry_id, score in ranked:
+        row = rows.get(entry_id)
+        if row is None:
+            continue
+        results.append({
+            "id": row.id,
+            "date": row.date,
+            "mood_rating": row.mood_rating if row.mood_rating is not None else 0.0,
+            "category": row.category if row.category is not None else "Nieznane",
+            "score": round(score, 4),
+            **snippet(row.text or "", terms)
+        })
+    return {"query": query, "results": results, "next_offset": offset + limit if has_more else None}
@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image as PILImage, ImageOps
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from .. import database, models
+
+# Zdjęcia wpisów i profilu: zapis adresowany treścią (SHA-256) + miniatury.
+# - Oryginał zapisujemy raz na treść - kolejne wysłanie tego samego pliku to tylko odwołanie.
+# - Miniatury (thumb / preview) liczy pula procesów poza ścieżką żądania: upload kończy się
+#   po zapisie oryginału, a Pillow nie blokuje pętli zdarzeń ani GIL procesu API.
+# - Treść pod danym id nigdy się nie zmienia, więc pliki mogą być cache'owane "na zawsze".
+# - Zdjęcia bez wpisu i bez profilu usuwa okresowe sprzątanie (cache_compaction.py).
+
+IMAGE_STORAGE_DIR = os.getenv("IMAGE_STORAGE_DIR", "storage/images")
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Dłuższy bok w pikselach
+IMAGE_VARIANTS = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "256")),
+    "preview": int(os.getenv("IMAGE_PREVIEW_SIZE", "1280")),
+}
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+# Tyle godzin od wysłania zdjęcie może nie mieć wpisu - aplikacja wysyła zdjęcie przed
+# zapisem wpisu (offline nawet dużo wcześniej); potem sprzątanie usuwa wiersz i pliki
+IMAGE_ORPHAN_HOURS = float(os.getenv("IMAGE_ORPHAN_HOURS", "24"))
+IMAGE_PURGE_BATCH = int(os.getenv("IMAGE_PURGE_BATCH", "500"))
+VARIANT_CONTENT_TYPE = "image/webp"
+ALLOWED_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+IMAGE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ImageStorage(ABC):
+    """Gdzie leżą bajty. Klucz = id zdjęcia (+ wariant); lokalny dysk albo np. S3 w przyszłości."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def save(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Brak pliku nie jest błędem."""
+
+    @abstractmethod
+    def path(self, key: str) -> str:
+        """Ścieżka lokalna - do FileResponse i dla procesów liczących miniatury."""
+
+
+class LocalImageStorage(ImageStorage):
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        # Rozłożenie po katalogach ab/cd/ - bez dziesiątek tysięcy plików w jednym katalogu
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def save(self, key: str, data: bytes):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Zapis przez plik tymczasowy - równoległy odczyt nie zobaczy połowy pliku
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(data)
+        os.replace(temporary, target)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+storage: ImageStorage = LocalImageStorage(IMAGE_STORAGE_DIR)
+
+
+def variant_key(image_id: str, variant: str) -> str:
+    return image_id if variant == "original" else f"{image_id}-{variant}.webp"
+
+
+def inspect_image(data: bytes) -> Tuple[str, int, int]:
+    """(content_type, szerokość, wysokość). ValueError, gdy to nie jest obsługiwany obraz."""
+    try:
+        with PILImage.open(io.BytesIO(data)) as picture:
+            picture.verify()
+            image_format, (width, height) = picture.format, picture.size
+    except Exception as e:
+        raise ValueError(f"Not a valid image: {e}")
+    if image_format not in ALLOWED_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return ALLOWED_FORMATS[image_format], width, height
+
+
+def render_variants(source_path: str, targets: Dict[str, Tuple[str, int]], quality: int):
+    """Uruchamiane w procesie puli: {wariant: (ścieżka, rozmiar)} -> pliki WebP."""
+    with PILImage.open(source_path) as picture:
+        # Zdjęcia z telefonu często są obrócone tylko w EXIF
+        picture = ImageOps.exif_transpose(picture)
+        if picture.mode not in ("RGB", "RGBA"):
+            picture = picture.convert("RGBA" if "transparency" in picture.info else "RGB")
+        for target_path, size in targets.values():
+            variant = picture.copy()
+            variant.thumbnail((size, size), PILImage.LANCZOS)
+            temporary = f"{target_path}.{os.getpid()}.tmp"
+            variant.save(temporary, "WEBP", quality=quality, method=4)
+            os.replace(temporary, target_path)
+
+
+# --- Baza ---
+
+def save_upload(db: Session, user_id: str, data: bytes) -> Tuple[models.Image, bool]:
+    """Zapisuje oryginał (jeśli nowy). Zwraca (zdjęcie, czy_duplikat). Commituje."""
+    image_id = hashlib.sha256(data).hexdigest()
+    existing = db.query(models.Image).filter(models.Image.id == image_id).first()
+    if existing is not None:
+        return existing, True
+
+    content_type, width, height = inspect_image(data)
+    if not storage.exists(image_id):
+        storage.save(image_id, data)
+    image = models.Image(
+        id=image_id, owner_id=user_id, content_type=content_type,
+        size_bytes=len(data), width=width, height=height, status="pending"
+    )
+    db.add(image)
+    try:
+        db.commit()
+    except Exception:
+        # Ten sam plik wysłany równolegle - wygrał drugi zapis
+        db.rollback()
+        existing = db.query(models.Image).filter(models.Image.id == image_id).first()
+        if existing is None:
+            raise
+        return existing, True
+    db.refresh(image)
+    return image, False
+
+
+def image_view(image: models.Image) -> dict:
+    return {
+        "id": image.id,
+        "content_type": image.content_type,
+        "size_bytes": image.size_bytes,
+        "width": image.width,
+        "height": image.height,
+        "status": image.status,
+        "urls": {variant: f"/images/{image.id}/{variant}" for variant in ("original", *IMAGE_VARIANTS)}
+    }
+
+
+def split_refs(db: Session, refs: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """image_paths z aplikacji -> (id zapisanych zdjęć, pozostałe ścieżki lokalne)."""
+    refs = list(refs or [])
+    candidates = {ref for ref in refs if IMAGE_ID_RE.match(ref)}
+    known = set()
+    if candidates:
+        known = {row[0] for row in db.query(models.Image.id).filter(models.Image.id.in_(candidates))}
+    return [ref for ref in refs if ref in known], [ref for ref in refs if ref not in known]
+
+
+def set_entry_images(db: Session, entry_id: int, image_ids: List[str]):
+    """Zastępuje zdjęcia wpisu. Nie commituje."""
+    db.query(models.EntryImage).filter(models.EntryImage.entry_id == entry_id).delete(synchronize_session=False)
+    db.add_all([
+        models.EntryImage(entry_id=entry_id, position=position, image_id=image_id)
+        for position, image_id in enumerate(image_ids)
+    ])
+
+
+def delete_entry_images(db: Session, entry_ids: Iterable[int]):
+    """Przy usuwaniu wpisów. Pliki zostają - mogą należeć też do innych wpisów (purge_orphan_images)."""
+    entry_ids = list(entry_ids)
+    if entry_ids:
+        db.query(models.EntryImage).filter(models.EntryImage.entry_id.in_(entry_ids)).delete(synchronize_session=False)
+
+
+def image_ids_for(db: Session, entry_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Id zdjęć dla strony wpisów - jedno zapytanie zamiast jednego na wpis."""
+    entry_ids = list(entry_ids)
+    result: Dict[int, List[str]] = {}
+    if not entry_ids:
+        return result
+    rows = db.query(models.EntryImage.entry_id, models.EntryImage.image_id)\
+        .filter(models.EntryImage.entry_id.in_(entry_ids))\
+        .order_by(models.EntryImage.entry_id, models.EntryImage.position)
+    for entry_id, image_id in rows:
+        result.setdefault(entry_id, []).append(image_id)
+    return result
+
+
+def image_refs(legacy_paths: Optional[str], image_ids: List[str]) -> List[str]:
+    """image_paths w odpowiedzi: stare ścieżki z telefonu + id zdjęć z serwera."""
+    return (legacy_paths.split("|") if legacy_paths else []) + image_ids
+
+
+def _orphaned():
+    """Warunek: zdjęcie nie należy do żadnego wpisu ani nie jest zdjęciem profilowym."""
+    return (
+        ~exists().where(models.EntryImage.image_id == models.Image.id),
+        ~exists().where(models.User.profile_image_path == models.Image.id),
+    )
+
+
+def purge_orphan_images(db: Session, now: datetime, batch_size: int = IMAGE_PURGE_BATCH) -> int:
+    """Usuwa zdjęcia bez odwołań starsze niż IMAGE_ORPHAN_HOURS - wiersze, potem pliki. Commituje."""
+    threshold = now - timedelta(hours=IMAGE_ORPHAN_HOURS)
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite trzyma created_at (CURRENT_TIMESTAMP) bez strefy, w UTC
+        threshold = threshold.astimezone(timezone.utc).replace(tzinfo=None)
+    deleted = 0
+    while True:
+        ids = [
+            row[0] for row in db.query(models.Image.id)
+            .filter(models.Image.created_at < threshold, *_orphaned())
+            .limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        # Warunek powtórzony w DELETE - zdjęcie mogło właśnie trafić do wpisu
+        db.query(models.Image)\
+            .filter(models.Image.id.in_(ids), *_orphaned())\
+            .delete(synchronize_session=False)
+        db.commit()
+        kept = {row[0] for row in db.query(models.Image.id).filter(models.Image.id.in_(ids))}
+        for image_id in ids:
+            if image_id in kept:
+                continue
+            for variant in ("original", *IMAGE_VARIANTS):
+                storage.delete(variant_key(image_id, variant))
+            deleted += 1
+        if len(ids) < batch_size:
+            return deleted
+
+
+def _set_status(image_id: str, status: str):
+    db = database.SessionLocal()
+    try:
+        db.query(models.Image).filter(models.Image.id == image_id).update({"status": status}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pending_ids() -> List[str]:
+    db = database.SessionLocal()
+    try:
+        return [row[0] for row in db.query(models.Image.id).filter(models.Image.status == "pending")]
+    finally:
+        db.close()
+
+
+class ImagePipeline:
+    """Miniatury w ProcessPoolExecutor (IMAGE_WORKERS procesów)."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+        self.rendered = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._executor is not None or self.workers <= 0:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Zdjęcia, których miniatury nie powstały przed restartem
+        for image_id in await run_in_threadpool(_pending_ids):
+            self.submit(image_id)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, image_id: str):
+        if self._executor is None:
+            return
+        task = asyncio.create_task(self._render(image_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _render(self, image_id: str):
+        targets = {
+            variant: (storage.path(variant_key(image_id, variant)), size)
+            for variant, size in IMAGE_VARIANTS.items()
+        }
+        for target_path, _ in targets.values():
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._executor, render_variants, storage.path(image_id), targets, IMAGE_VARIANT_QUALITY
+            )
+            status = "ready"
+            self.rendered += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Image {image_id}: thumbnails failed: {e}")
+            status = "failed"
+            self.failed += 1
+        await run_in_threadpool(_set_status, image_id, status)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._executor is not None,
+            "in_progress": len(self._tasks),
+            "rendered": self.rendered,
+            "failed": self.failed
+        }
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,319 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import database, models
+from .llm_client import llm_client
+from .mood_analysis import analyze_text, save_entry_analysis
+from .summary_cache import summary_cache
+from .weekly_summary import build_summary_stats, summary_key, generate_summary_advice, summary_response
+
+# Trwała kolejka zadań AI (tabela ai_jobs) + pula workerów w procesie API.
+# Klient dostaje job_id od razu i odpytuje GET /ai/jobs/{id}?wait=..., zamiast trzymać
+# połączenie otwarte przez cały czas odpowiedzi modelu (i ponawiać je po timeoucie).
+# Zadania przeżywają restart: "running" z wygasłą dzierżawą wracają do kolejki.
+
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+AI_JOB_MAX_ATTEMPTS = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+# Pierwsza ponowna próba po tylu sekundach, kolejne 2x dłużej
+AI_JOB_RETRY_DELAY = float(os.getenv("AI_JOB_RETRY_DELAY", "5"))
+# Jak często worker zagląda do tabeli, gdy nikt go nie obudził (zadania z innych procesów, ponowienia)
+AI_JOB_POLL_INTERVAL = float(os.getenv("AI_JOB_POLL_INTERVAL", "2"))
+# Zadanie "running" dłużej niż tyle sekund = worker zginął (restart procesu)
+AI_JOB_LEASE = float(os.getenv("AI_JOB_LEASE", "120"))
+# Górny limit long-polla w GET /ai/jobs/{id}
+AI_JOB_MAX_WAIT = float(os.getenv("AI_JOB_MAX_WAIT", "30"))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+def enqueue(db: Session, kind: str, payload: Dict[str, Any], user_id=None, entry_id: Optional[int] = None) -> models.AiJob:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = models.AiJob(
+        kind=kind,
+        status="queued",
+        user_id=user_id,
+        entry_id=entry_id,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        attempts=0,
+        max_attempts=AI_JOB_MAX_ATTEMPTS,
+        run_after=datetime.now()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    job_pool.notify()
+    return job
+
+
+def job_view(job: models.AiJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error if job.status == "failed" else None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+
+
+def get_job(db: Session, job_id: str) -> Optional[models.AiJob]:
+    return db.query(models.AiJob).filter(models.AiJob.id == job_id).first()
+
+
+def claim_next(db: Session, now: datetime) -> Optional[models.AiJob]:
+    """Bierze najstarsze gotowe zadanie. Warunek status='queued' w UPDATE chroni przed
+    podwójnym pobraniem przez dwa workery/procesy (działa tak samo na SQLite i Postgres)."""
+    for _ in range(5):
+        job_id = db.query(models.AiJob.id)\
+            .filter(models.AiJob.status == "queued", models.AiJob.run_after <= now)\
+            .order_by(models.AiJob.run_after, models.AiJob.created_at)\
+            .limit(1)\
+            .scalar()
+        if job_id is None:
+            db.rollback()
+            return None
+        claimed = db.query(models.AiJob)\
+            .filter(models.AiJob.id == job_id, models.AiJob.status == "queued")\
+            .update({
+                "status": "running",
+                "locked_at": now,
+                "attempts": models.AiJob.attempts + 1
+            }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return get_job(db, job_id)
+    return None
+
+
+def requeue_stale(db: Session, now: datetime) -> Tuple[int, int]:
+    """Zadania z wygasłą dzierżawą: (wróciły do kolejki, oznaczone failed).
+    Zadanie, które zabija workera (OOM, zawieszony model), nie wraca w nieskończoność -
+    po max_attempts próbach kończy się błędem."""
+    stale = db.query(models.AiJob)\
+        .filter(models.AiJob.status == "running", models.AiJob.locked_at < now - timedelta(seconds=AI_JOB_LEASE))
+    failed = stale.filter(models.AiJob.attempts >= models.AiJob.max_attempts)\
+        .update({
+            "status": "failed",
+            "error": "Worker lease expired on the last attempt",
+            "locked_at": None,
+            "finished_at": now
+        }, synchronize_session=False)
+    requeued = stale.update({"status": "queued", "locked_at": None, "run_after": now}, synchronize_session=False)
+    db.commit()
+    return requeued, failed
+
+
+def finish_job(job_id: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+    db = database.SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            return
+        now = datetime.now()
+        if error is None:
+            job.status = "done"
+            job.result = json.dumps(result, ensure_ascii=False, default=str)
+            job.error = None
+            job.finished_at = now
+        elif job.attempts < job.max_attempts:
+            # Ponowienie z wykładniczym opóźnieniem
+            job.status = "queued"
+            job.error = error
+            job.run_after = now + timedelta(seconds=AI_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = "failed"
+            job.error = error
+            job.finished_at = now
+        job.locked_at = None
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_by_status(db: Session) -> Dict[str, int]:
+    rows = db.query(models.AiJob.status, func.count(models.AiJob.id)).group_by(models.AiJob.status).all()
+    return {status: count for status, count in rows}
+
+
+# --- Obsługa poszczególnych rodzajów zadań ---
+
+async def run_analyze_mood(job: models.AiJob, payload: Dict[str, Any]) -> Dict[str, Any]:
+    analysis, cached = await analyze_text(payload["text"], payload.get("lang", "pl"))
+    if job.entry_id is not None:
+        await run_in_threadpool(save_entry_analysis, job.entry_id, analysis)
+    return {"analysis": analysis, "cached": cached}
+
+
+def _prepare_summary(user_id: str, start_date: datetime, end_date: datetime, lang: str):
+    db = database.SessionLocal()
+    try:
+        summary = build_summary_stats(db, user_id, start_date, end_date)
+        cache_key, fingerprint, key_summary = summary_key(db, user_id, start_date, end_date, lang, summary)
+        cached_advice = summary_cache.get(db, cache_key, user_id, start_date, end_date)
+        return summary, key_summary, cache_key, fingerprint, cached_advice
+    finally:
+        db.close()
+
+
+async def run_weekly_summary(job: models.AiJob, payload: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = payload["user_id"]
+    lang = payload.get("lang", "pl")
+    start_date = datetime.fromisoformat(payload["start_date"])
+    end_date = datetime.fromisoformat(payload["end_date"])
+
+    summary, key_summary, cache_key, fingerprint, ai_advice = await run_in_threadpool(
+        _prepare_summary, user_id, start_date, end_date, lang
+    )
+    if ai_advice is None:
+        if not summary["entry_count"]:
+            ai_advice = "No data for this period." if lang == 'en' else "Brak danych z tego okresu."
+        else:
+            ai_advice = await generate_summary_advice(
+                cache_key, fingerprint, user_id, start_date, end_date, lang, key_summary
+            )
+    return summary_response(start_date, end_date, summary, ai_advice)
+
+
+HANDLERS: Dict[str, Callable[[models.AiJob, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "analyze_mood": run_analyze_mood,
+    "weekly_summary": run_weekly_summary,
+}
+
+
+class JobWorkerPool:
+    """N workerów asyncio = co najwyżej N równoległych zadań AI w procesie."""
+
+    def __init__(self, workers: int = AI_JOB_WORKERS):
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Optional[asyncio.Condition] = None
+        self._last_requeue = float("-inf")
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._finished = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def notify(self):
+        # Nowe zadanie w tym procesie - budzimy workera bez czekania na AI_JOB_POLL_INTERVAL
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim(self) -> Optional[models.AiJob]:
+        db = database.SessionLocal()
+        try:
+            now = datetime.now()
+            if time.monotonic() - self._last_requeue > AI_JOB_LEASE / 2:
+                self._last_requeue = time.monotonic()
+                requeued, failed = requeue_stale(db, now)
+                if requeued or failed:
+                    print(f"AI jobs: requeued {requeued} stale jobs, failed {failed} out of attempts")
+            job = claim_next(db, now)
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await run_in_threadpool(self._claim)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), AI_JOB_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"AI job worker {index} error: {e}")
+                await asyncio.sleep(AI_JOB_POLL_INTERVAL)
+
+    async def _run(self, job: models.AiJob):
+        # Wspólny budżet zapytań do OpenRouter (OPENROUTER_RPM) z zapytaniami synchronicznymi
+        await llm_client.budget.wait_for_slot()
+        result, error = None, None
+        try:
+            result = await HANDLERS[job.kind](job, json.loads(job.payload or "{}"))
+        except asyncio.CancelledError:
+            # Zamknięcie procesu - zadanie wróci do kolejki po wygaśnięciu dzierżawy
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            print(f"AI job {job.id} ({job.kind}) attempt {job.attempts} failed: {error}")
+
+        await run_in_threadpool(finish_job, job.id, result, error)
+        if error is None:
+            self.completed += 1
+        elif job.attempts < job.max_attempts:
+            self.retried += 1
+        else:
+            self.failed += 1
+        async with self._finished:
+            self._finished.notify_all()
+
+    async def wait(self, db: Session, job_id: str, timeout: float) -> Optional[models.AiJob]:
+        """Long-poll: zwraca zadanie, gdy się zakończy albo minie timeout."""
+        deadline = time.monotonic() + min(max(timeout, 0.0), AI_JOB_MAX_WAIT)
+        while True:
+            job = await run_in_threadpool(get_job, db, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            # Kończymy transakcję: połączenie wraca do puli na czas czekania,
+            # a kolejny odczyt widzi zmiany zapisane przez workera
+            db.commit()
+            if self._finished is None:
+                await asyncio.sleep(min(remaining, AI_JOB_POLL_INTERVAL))
+                continue
+            try:
+                async with self._finished:
+                    # Budzi nas zakończenie dowolnego zadania w tym procesie;
+                    # zadania kończone przez inne procesy łapiemy co AI_JOB_POLL_INTERVAL
+                    await asyncio.wait_for(self._finished.wait(), min(remaining, AI_JOB_POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": bool(self._tasks),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "jobs_by_status": count_by_status(db)
+        }
+
+
+job_pool = JobWorkerPool()
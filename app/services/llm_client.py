@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Jeden współdzielony klient HTTP dla wszystkich wywołań OpenRouter.
+# Otwierany i zamykany w lifespan aplikacji (main.py), dzięki czemu
+# połączenia keep-alive są używane ponownie zamiast nowego TLS przy każdym zapytaniu.
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "15"))
+# Limit zapytań na minutę dla darmowych modeli OpenRouter (dotyczy całego procesu)
+OPENROUTER_RPM = int(os.getenv("OPENROUTER_RPM", "20"))
+
+
+class LLMError(Exception):
+    """Model nie zwrócił poprawnej odpowiedzi (błąd HTTP, timeout, pusta odpowiedź)."""
+
+    def __init__(self, model: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{model}: {message}")
+        self.model = model
+        self.status_code = status_code
+
+
+class RequestBudget:
+    """
+    Przesuwane okno 60 s ze wszystkimi zapytaniami do OpenRouter (interaktywnymi i w tle).
+    Zapytania użytkowników nigdy nie czekają - budżet ogranicza tylko pracę w tle.
+    """
+
+    def __init__(self, per_minute: int = OPENROUTER_RPM):
+        self.per_minute = per_minute
+        self._calls = deque()
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+
+    def note(self):
+        now = time.monotonic()
+        self._trim(now)
+        self._calls.append(now)
+
+    def used(self) -> int:
+        self._trim(time.monotonic())
+        return len(self._calls)
+
+    async def wait_for_slot(self):
+        while True:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._calls) < self.per_minute:
+                return
+            # Czekamy aż najstarsze zapytanie wypadnie z okna
+            await asyncio.sleep(max(0.05, 60 - (now - self._calls[0])))
+
+
+class LLMClient:
+    def __init__(self, base_url: str = OPENROUTER_BASE_URL, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        # transport pozwala podpiąć fałszywy upstream w testach obciążeniowych
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.budget = RequestBudget()
+
+    async def start(self):
+        if self._client is not None:
+            return
+        # Pula jest per-host, a wszystkie wywołania idą do jednego hosta (OpenRouter),
+        # więc limity puli są jednocześnie limitami na host.
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        )
+        timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=limits,
+            timeout=timeout,
+            transport=self.transport,
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("LLMClient not started (missing app lifespan?)")
+        return self._client
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY', '')}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://mindguide.app",
+            "X-Title": "Mind Guide AI"
+        }
+
+    async def chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        timeout: Optional[float] = None
+    ) -> str:
+        """Zwraca treść pierwszej odpowiedzi modelu albo rzuca LLMError."""
+        if self._client is None:
+            # Skrypty uruchamiane poza aplikacją (bez lifespan) otwierają pulę leniwie
+            await self.start()
+
+        payload = {"model": model, "messages": messages}
+        self.budget.note()
+        request_timeout = httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT) if timeout else None
+
+        try:
+            resp = await self.client.post(
+                "/chat/completions",
+                headers=self._headers(),
+                json=payload,
+                **({"timeout": request_timeout} if request_timeout else {})
+            )
+        except httpx.TimeoutException:
+            raise LLMError(model, "timeout")
+        except httpx.HTTPError as e:
+            raise LLMError(model, f"transport error: {e}")
+
+        if resp.status_code != 200:
+            raise LLMError(model, f"{resp.status_code} - {resp.text}", status_code=resp.status_code)
+
+        # Uszkodzona odpowiedź 200 (nie-JSON, brak choices/message) to błąd modelu -
+        # fallback i rejestr modeli obsługują tylko LLMError
+        try:
+            data = resp.json()
+        except ValueError:
+            raise LLMError(model, f"invalid JSON response: {resp.text[:200]}", status_code=resp.status_code)
+        try:
+            content = data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(model, "empty response", status_code=resp.status_code)
+        if content is None:
+            raise LLMError(model, "empty response", status_code=resp.status_code)
+        return content
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        """Zwraca kolejne fragmenty odpowiedzi (stream=True, SSE z OpenRouter) albo rzuca LLMError."""
+        if self._client is None:
+            await self.start()
+
+        payload = {"model": model, "messages": messages, "stream": True}
+        self.budget.note()
+
+        try:
+            async with self.client.stream(
+                "POST",
+                "/chat/completions",
+                headers=self._headers(),
+                json=payload
+            ) as resp:
+                if resp.status_code != 200:
+                    body = await resp.aread()
+                    raise LLMError(model, f"{resp.status_code} - {body.decode(errors='replace')}", status_code=resp.status_code)
+
+                async for line in resp.aiter_lines():
+                    # Linie komentarzy (": OPENROUTER PROCESSING") i puste separatory pomijamy
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if 'error' in chunk:
+                        raise LLMError(model, f"stream error: {chunk['error']}")
+                    choices = chunk.get('choices') or []
+                    if choices:
+                        delta = (choices[0].get('delta') or {}).get('content')
+                        if delta:
+                            yield delta
+        except httpx.TimeoutException:
+            raise LLMError(model, "timeout")
+        except httpx.HTTPError as e:
+            raise LLMError(model, f"transport error: {e}")
+
+
+# Instancja współdzielona przez całą aplikację
+llm_client = LLMClient()
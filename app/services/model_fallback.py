@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_client import llm_client, LLMError
+from .model_registry import model_registry
+
+# Łączny limit czasu na odpowiedź AI (niezależnie od liczby modeli w kolejce)
+AI_DEADLINE = float(os.getenv("AI_DEADLINE", "20"))
+# Po przekroczeniu tego percentyla opóźnień wysyłamy zapasowe zapytanie do kolejnego modelu
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "0.9"))
+# Opóźnienie hedgingu zanim zbierzemy wystarczająco pomiarów
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv("AI_HEDGE_DEFAULT_DELAY", "4"))
+AI_HEDGE_MIN_DELAY = float(os.getenv("AI_HEDGE_MIN_DELAY", "0.5"))
+
+
+class LatencyTracker:
+    """Okno ostatnich czasów udanych odpowiedzi, z którego liczymy percentyl do hedgingu."""
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * q))
+        return ordered[index]
+
+    def hedge_delay(self) -> float:
+        observed = self.percentile(AI_HEDGE_PERCENTILE)
+        if observed is None:
+            return AI_HEDGE_DEFAULT_DELAY
+        return max(AI_HEDGE_MIN_DELAY, observed)
+
+
+latency_tracker = LatencyTracker()
+
+
+async def _timed_completion(model: str, messages: List[Dict[str, Any]], timeout: float) -> Tuple[str, str]:
+    started = time.monotonic()
+    try:
+        content = await llm_client.chat_completion(model, messages, timeout=timeout)
+    except LLMError as e:
+        model_registry.record_failure(model, e.status_code, str(e))
+        raise
+    except asyncio.CancelledError:
+        # Przegrał hedging - nie jest to błąd modelu
+        model_registry.release(model)
+        raise
+    latency = time.monotonic() - started
+    latency_tracker.record(latency)
+    model_registry.record_success(model, latency)
+    return model, content
+
+
+async def hedged_chat_completion(
+    models_to_try: List[str],
+    messages: List[Dict[str, Any]],
+    deadline: float = AI_DEADLINE
+) -> Tuple[str, str]:
+    """
+    Odpytuje modele z listy z hedgingiem:
+    - kolejność ustala rejestr modeli (oczekiwane opóźnienie), modele z otwartym
+      bezpiecznikiem są pomijane,
+    - startuje pierwszy model,
+    - jeśli nie odpowie w czasie percentyla opóźnień (albo zwróci błąd), startuje kolejny,
+    - pierwsza poprawna odpowiedź wygrywa, pozostałe zapytania są anulowane,
+    - całość nigdy nie trwa dłużej niż `deadline`.
+    Zwraca (model, treść) albo rzuca LLMError.
+    """
+    if not models_to_try:
+        raise LLMError("none", "no models configured")
+
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+    pending_models = model_registry.candidates(models_to_try)
+    in_flight = set()
+    errors = []
+
+    def launch_next():
+        while pending_models:
+            model = pending_models.pop(0)
+            if not model_registry.try_acquire(model):
+                print(f"Skipping model {model} (circuit open)")
+                continue
+            remaining = max(0.1, deadline_at - loop.time())
+            print(f"Trying model: {model}")
+            in_flight.add(asyncio.create_task(_timed_completion(model, messages, remaining)))
+            return
+
+    try:
+        launch_next()
+        if not in_flight:
+            raise LLMError("all", "all model circuits are open")
+        while in_flight:
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                break
+
+            wait_for = remaining
+            if pending_models:
+                wait_for = min(remaining, latency_tracker.hedge_delay())
+
+            done, _ = await asyncio.wait(in_flight, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Hedging: pierwszy model jest wolniejszy niż zwykle - wysyłamy zapas
+                if pending_models:
+                    launch_next()
+                continue
+
+            for task in done:
+                in_flight.discard(task)
+                try:
+                    return task.result()
+                except LLMError as e:
+                    print(f"Model {e.model} failed: {e}")
+                    errors.append(str(e))
+
+            # Błąd modelu nie czeka na hedging - od razu próbujemy kolejny
+            if pending_models:
+                launch_next()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    if loop.time() >= deadline_at:
+        raise LLMError("all", f"deadline of {deadline}s exceeded")
+    raise LLMError("all", "; ".join(errors) or "no model answered")
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Ile błędów z rzędu (5xx, 429, timeout) otwiera bezpiecznik modelu
+AI_BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", "3"))
+# Po ilu sekundach otwarty bezpiecznik przepuszcza jedno próbne zapytanie (half-open)
+AI_BREAKER_COOLDOWN = float(os.getenv("AI_BREAKER_COOLDOWN", "30"))
+# Zakładane opóźnienie modelu, o którym nic jeszcze nie wiemy
+AI_MODEL_DEFAULT_LATENCY = float(os.getenv("AI_MODEL_DEFAULT_LATENCY", "3"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ModelStats:
+    def __init__(self, name: str, window: int = 50):
+        self.name = name
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.last_error = ""
+
+    def median_latency(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def success_rate(self) -> Optional[float]:
+        total = self.successes + self.failures
+        if total == 0:
+            return None
+        return self.successes / total
+
+    def expected_latency(self) -> float:
+        # Oczekiwany czas do dobrej odpowiedzi: mediana opóźnienia / skuteczność
+        latency = self.median_latency()
+        if latency is None:
+            latency = AI_MODEL_DEFAULT_LATENCY
+        rate = self.success_rate()
+        if rate is None:
+            return latency
+        return latency / max(rate, 0.1)
+
+
+class ModelRegistry:
+    """
+    Stan modeli współdzielony przez cały proces: skuteczność, odpowiedzi 429,
+    kroczące opóźnienie i bezpiecznik (closed -> open -> half_open -> closed).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, ModelStats] = {}
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = ModelStats(model)
+            self._models[model] = stats
+        return stats
+
+    def candidates(self, models: List[str]) -> List[str]:
+        """Modele posortowane wg oczekiwanego opóźnienia; otwarte bezpieczniki na końcu."""
+        with self._lock:
+            def sort_key(model: str):
+                stats = self._get(model)
+                return (stats.state != CLOSED, stats.expected_latency())
+            # sorted jest stabilne - przy braku danych zostaje kolejność z konfiguracji
+            return sorted(models, key=sort_key)
+
+    def try_acquire(self, model: str) -> bool:
+        """Czy wolno teraz wysłać zapytanie do modelu (uwzględnia bezpiecznik)."""
+        with self._lock:
+            stats = self._get(model)
+            if stats.state == CLOSED:
+                return True
+            if stats.probe_in_flight:
+                return False
+            if stats.state == OPEN and time.monotonic() - stats.opened_at < AI_BREAKER_COOLDOWN:
+                return False
+            # Cooldown minął - przepuszczamy jedno próbne zapytanie
+            stats.state = HALF_OPEN
+            stats.probe_in_flight = True
+            return True
+
+    def release(self, model: str):
+        """Zapytanie anulowane (przegrało hedging) - nie liczymy go ani jako sukces, ani błąd."""
+        with self._lock:
+            self._get(model).probe_in_flight = False
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            stats = self._get(model)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.latencies.append(latency)
+            stats.probe_in_flight = False
+            if stats.state != CLOSED:
+                print(f"Circuit closed for model {model}")
+            stats.state = CLOSED
+            stats.opened_at = None
+
+    def record_failure(self, model: str, status_code: Optional[int] = None, error: str = ""):
+        with self._lock:
+            stats = self._get(model)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_error = error[:200]
+            if status_code == 429:
+                stats.rate_limited += 1
+            stats.probe_in_flight = False
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= AI_BREAKER_THRESHOLD:
+                if stats.state != OPEN:
+                    print(f"Circuit opened for model {model} after {stats.consecutive_failures} failures")
+                stats.state = OPEN
+                stats.opened_at = time.monotonic()
+
+    def scoreboard(self) -> List[dict]:
+        with self._lock:
+            now = time.monotonic()
+            board = []
+            for stats in self._models.values():
+                median = stats.median_latency()
+                rate = stats.success_rate()
+                board.append({
+                    "model": stats.name,
+                    "state": stats.state,
+                    "successes": stats.successes,
+                    "failures": stats.failures,
+                    "rate_limited": stats.rate_limited,
+                    "consecutive_failures": stats.consecutive_failures,
+                    "success_rate": round(rate, 3) if rate is not None else None,
+                    "median_latency_ms": round(median * 1000) if median is not None else None,
+                    "expected_latency_ms": round(stats.expected_latency() * 1000),
+                    "open_for_s": round(now - stats.opened_at, 1) if stats.opened_at else None,
+                    "last_error": stats.last_error
+                })
+            return sorted(board, key=lambda row: row["expected_latency_ms"])
+
+
+# Rejestr współdzielony przez cały proces
+model_registry = ModelRegistry()
@@ -0,0 +1,62 @@
+from typing import Dict, List, Tuple
+
+from .. import database, models
+from . import user_version
+from .model_fallback import hedged_chat_completion
+from .similarity_cache import analysis_cache
+from .weekly_summary import MODELS_TO_TRY
+
+# Analiza pojedynczego wpisu - współdzielona przez /ai/analyze_mood i kolejkę zadań AI (job_queue.py).
+
+
+def analysis_system_prompt(lang: str) -> str:
+    # Prompt selection
+    if lang == 'en':
+        return (
+            "You are an empathetic mental health assistant. "
+            "Your task is to briefly analyze the user's mood based on their entry. "
+            "Respond briefly, warmly, and in English. "
+            "Suggest one simple activity that might help."
+        )
+    return (
+        "Jesteś empatycznym asystentem zdrowia psychicznego. "
+        "Twoim zadaniem jest krótka analiza nastroju użytkownika na podstawie jego wpisu. "
+        "Odpowiadaj krótko, ciepło i po polsku. "
+        "Zaproponuj jedną prostą czynność, która może pomóc."
+    )
+
+
+def build_analysis_messages(text: str, lang: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": analysis_system_prompt(lang)},
+        {"role": "user", "content": text}
+    ]
+
+
+async def analyze_text(text: str, lang: str) -> Tuple[str, bool]:
+    """Zwraca (analiza, czy_z_cache). Rzuca LLMError, gdy żaden model nie odpowiedział."""
+    system_prompt = analysis_system_prompt(lang)
+    # Prawie identyczny wpis (ten sam język i prompt) był już analizowany - bez wywołania AI
+    cached_analysis = analysis_cache.get(lang, system_prompt, text)
+    if cached_analysis is not None:
+        return cached_analysis, True
+
+    _, analysis = await hedged_chat_completion(MODELS_TO_TRY, build_analysis_messages(text, lang))
+    analysis_cache.put(lang, system_prompt, text, analysis)
+    return analysis, False
+
+
+def save_entry_analysis(entry_id: int, analysis: str):
+    # Osobna sesja - wywoływane po zamknięciu sesji z Depends (strumień SSE, worker kolejki)
+    db = database.SessionLocal()
+    try:
+        db_entry = db.query(models.MoodEntry).filter(models.MoodEntry.id == entry_id).first()
+        if db_entry:
+            db_entry.ai_analysis = analysis
+            # Analiza jest częścią listy wpisów - nowy ETag
+            user_version.bump(db, db_entry.owner_id)
+            db.commit()
+        else:
+            print(f"analyze_mood: entry {entry_id} not found, analysis not saved")
+    finally:
+        db.close()
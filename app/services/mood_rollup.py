@@ -0,0 +1,156 @@
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import models
+
+# Utrzymanie tabeli daily_mood_rollup.
+# Funkcje nie commitują - wywołujący (router) commituje razem ze zmianą wpisu,
+# więc agregat i wpisy zmieniają się w jednej transakcji.
+
+
+def rollup_day(db: Session, value: datetime) -> date:
+    """Dzień kalendarzowy wpisu - tak samo jak liczy go func.date() w danej bazie."""
+    if db.get_bind().dialect.name == "postgresql" and value.tzinfo:
+        # Postgres trzyma timestamptz i liczy date() w strefie sesji (UTC)
+        return value.astimezone(timezone.utc).date()
+    # SQLite zapisuje czas "ścienny" bez strefy
+    return value.date()
+
+
+def _upsert(db: Session, user_id, day: date, category: str, count: int, rating_sum: float):
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = models.DailyMoodRollup.__table__
+    stmt = insert(table).values(
+        user_id=user_id,
+        day=day,
+        category=category,
+        entry_count=count,
+        rating_sum=rating_sum
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day, table.c.category],
+        set_={
+            "entry_count": table.c.entry_count + stmt.excluded.entry_count,
+            "rating_sum": table.c.rating_sum + stmt.excluded.rating_sum
+        }
+    )
+    db.execute(stmt)
+
+
+def add_entry(db: Session, user_id, entry_date: datetime, category: str, mood_rating: Optional[float]):
+    _upsert(db, user_id, rollup_day(db, entry_date), category or "", 1, mood_rating or 0.0)
+
+
+def group_entries(db: Session, entries: List[Tuple[datetime, Optional[str], Optional[float]]],
+                  groups: Optional[Dict[Tuple[date, str], List[float]]] = None) -> Dict[Tuple[date, str], List[float]]:
+    """(date, category, mood_rating) -> {(dzień, kategoria): [liczba, suma ocen]}; dopisuje do groups."""
+    groups = {} if groups is None else groups
+    for entry_date, category, mood_rating in entries:
+        group = groups.setdefault((rollup_day(db, entry_date), category or ""), [0, 0.0])
+        group[0] += 1
+        group[1] += mood_rating or 0.0
+    return groups
+
+
+def add_groups(db: Session, user_id, groups: Dict[Tuple[date, str], List[float]]):
+    if not groups:
+        return
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = models.DailyMoodRollup.__table__
+    # Jedno polecenie z parametrami (executemany) - skompilowane raz, nie raz na (dzień, kategoria);
+    # import historii to tysiące grup
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day, table.c.category],
+        set_={
+            "entry_count": table.c.entry_count + stmt.excluded.entry_count,
+            "rating_sum": table.c.rating_sum + stmt.excluded.rating_sum
+        }
+    )
+    db.execute(stmt, [
+        {"user_id": user_id, "day": day, "category": category, "entry_count": count, "rating_sum": rating_sum}
+        for (day, category), (count, rating_sum) in groups.items()
+    ])
+
+
+def add_entries(db: Session, user_id, entries: List[Tuple[datetime, Optional[str], Optional[float]]]):
+    """Wiele wpisów (date, category, mood_rating) naraz - jeden upsert na (dzień, kategoria)."""
+    add_groups(db, user_id, group_entries(db, entries))
+
+
+def remove_entry(db: Session, user_id, entry_date: datetime, category: str, mood_rating: Optional[float]):
+    day = rollup_day(db, entry_date)
+    # NULL nie koliduje w unikalnym indeksie, więc brak kategorii trzymamy jako ""
+    category = category or ""
+    _upsert(db, user_id, day, category, -1, -(mood_rating or 0.0))
+    # Puste wiersze nie są potrzebne
+    db.query(models.DailyMoodRollup).filter(
+        models.DailyMoodRollup.user_id == user_id,
+        models.DailyMoodRollup.day == day,
+        models.DailyMoodRollup.category == category,
+        models.DailyMoodRollup.entry_count <= 0
+    ).delete(synchronize_session=False)
+
+
+def query_range(db: Session, user_id, start_day: date, end_day: date) -> List[Tuple[date, str, int, float]]:
+    """(dzień, kategoria, liczba wpisów, suma ocen) dla dni z zakresu - O(dni), nie O(wpisów)."""
+    return db.query(
+        models.DailyMoodRollup.day,
+        models.DailyMoodRollup.category,
+        models.DailyMoodRollup.entry_count,
+        models.DailyMoodRollup.rating_sum
+    ).filter(
+        and_(
+            models.DailyMoodRollup.user_id == user_id,
+            models.DailyMoodRollup.day >= start_day,
+            models.DailyMoodRollup.day <= end_day
+        )
+    ).all()
+
+
+def rebuild(db: Session, user_id=None) -> int:
+    """Przelicza agregaty od zera z mood_entries (dla jednego usera albo wszystkich). Commituje."""
+    delete_query = db.query(models.DailyMoodRollup)
+    if user_id is not None:
+        delete_query = delete_query.filter(models.DailyMoodRollup.user_id == user_id)
+    delete_query.delete(synchronize_session=False)
+
+    entry_day = func.date(models.MoodEntry.date)
+    category = func.coalesce(models.MoodEntry.category, "")
+    source = db.query(
+        models.MoodEntry.owner_id,
+        entry_day,
+        category,
+        func.count(models.MoodEntry.id),
+        func.coalesce(func.sum(models.MoodEntry.mood_rating), 0.0)
+    ).filter(models.MoodEntry.owner_id.isnot(None))
+    if user_id is not None:
+        source = source.filter(models.MoodEntry.owner_id == user_id)
+    rows = source.group_by(models.MoodEntry.owner_id, entry_day, category).all()
+
+    db.bulk_insert_mappings(models.DailyMoodRollup, [
+        {
+            "user_id": owner_id,
+            # SQLite zwraca 'YYYY-MM-DD', Postgres obiekt date
+            "day": date.fromisoformat(day) if isinstance(day, str) else day,
+            "category": cat,
+            "entry_count": count,
+            "rating_sum": rating_sum
+        }
+        for owner_id, day, cat, count, rating_sum in rows
+    ])
+    db.commit()
+    return len(rows)
+
+
+def ensure_populated(db: Session):
+    """Przy pierwszym starcie po dodaniu tabeli wypełniamy ją z istniejących wpisów."""
+    if db.query(models.DailyMoodRollup.id).first() is None and db.query(models.MoodEntry.id).first() is not None:
+        count = rebuild(db)
+        print(f"daily_mood_rollup was empty - rebuilt {count} rows")
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import user_version
+
+# Trendy nastroju dla /ai/trends/{user_id}: średnie kroczące, zmienność, dni tygodnia,
+# serie dni z wpisami i związek kategorii z oceną - na wielu miesiącach/latach wpisów.
+# Zamiast pętli po obiektach ORM: projekcja mood_entries (dzień, ocena, kategoria) zwinięta
+# w SQL do kolumn dziennych i per kategoria, dalej NumPy (bincount / cumsum), bez pętli po wpisach.
+# Pobieranie 10k pojedynczych krotek kosztowało więcej (alokacje + pauzy GC) niż cały pipeline.
+
+# Wynik trzymamy w pamięci (LRU) pod kluczem z users.data_version (services/user_version.py),
+# podbijaną w transakcji każdego zapisu - zmiana z dowolnego procesu API daje nowy klucz,
+# a wyniki starych wersji wypadają z LRU.
+AI_TRENDS_CACHE_SIZE = int(os.getenv("AI_TRENDS_CACHE_SIZE", "512"))
+AI_TRENDS_CACHE_TTL = float(os.getenv("AI_TRENDS_CACHE_TTL", "300"))
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _fetch(db: Session, stmt) -> list:
+    # Krotki prosto z kursora DBAPI, bez obiektów Row - kolumny nie potrzebują konwersji typów
+    result = db.connection().execute(stmt)
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+
+def load_columns(db: Session, user_id: str, start_day: Optional[date], end_day: Optional[date]) -> Dict[str, Any]:
+    """
+    Kolumny dzienne (posortowane po dniu): dni (datetime64[D]), liczba wpisów, liczba ocen,
+    suma ocen, suma kwadratów ocen; oraz per kategoria: nazwy, liczba ocen, suma ocen.
+    """
+    entry = models.MoodEntry
+    entry_day = func.date(entry.date)
+    rating = entry.mood_rating
+    conditions = [entry.owner_id == user_id]
+    # Filtr po dniu kalendarzowym - tak samo jak daily_mood_rollup
+    if start_day is not None:
+        conditions.append(entry_day >= start_day.isoformat())
+    if end_day is not None:
+        conditions.append(entry_day <= end_day.isoformat())
+
+    daily_rows = _fetch(db, select(
+        entry_day, func.count(entry.id), func.count(rating),
+        func.coalesce(func.sum(rating), 0.0), func.coalesce(func.sum(rating * rating), 0.0)
+    ).where(*conditions).group_by(entry_day).order_by(entry_day))
+
+    category = func.coalesce(entry.category, "")
+    category_rows = _fetch(db, select(
+        category, func.count(rating), func.coalesce(func.sum(rating), 0.0)
+    ).where(*conditions).group_by(category))
+
+    if daily_rows:
+        days, entry_count, rated_count, rating_sum, rating_sq_sum = zip(*daily_rows)
+    else:
+        days = entry_count = rated_count = rating_sum = rating_sq_sum = ()
+    labels, category_count, category_sum = zip(*category_rows) if category_rows else ((), (), ())
+    return {
+        # SQLite zwraca 'YYYY-MM-DD', Postgres obiekt date - numpy przyjmuje oba
+        "days": np.array(days, dtype="datetime64[D]"),
+        "entry_count": np.array(entry_count, dtype=np.int64),
+        "rated_count": np.array(rated_count, dtype=float),
+        "rating_sum": np.array(rating_sum, dtype=float),
+        "rating_sq_sum": np.array(rating_sq_sum, dtype=float),
+        "category_labels": list(labels),
+        "category_count": np.array(category_count, dtype=float),
+        "category_sum": np.array(category_sum, dtype=float),
+    }
+
+
+def _round(value, digits: int = 3):
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _round_column(values: np.ndarray, digits: int) -> list:
+    # NaN (dzień bez wpisów) -> None w JSON
+    return [None if value != value else value for value in np.round(values, digits).tolist()]
+
+
+def _streaks(active: np.ndarray) -> Dict[str, int]:
+    """Najdłuższa i bieżąca (kończąca się ostatnim dniem zakresu) seria dni z wpisami."""
+    if not active.any():
+        return {"longest": 0, "current": 0}
+    # Granice serii: zmiany 0->1 i 1->0 na obramowanym wektorze
+    padded = np.concatenate(([0], active.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    starts, ends = edges[0::2], edges[1::2]
+    lengths = ends - starts
+    current = int(lengths[-1]) if ends[-1] == len(active) else 0
+    return {"longest": int(lengths.max()), "current": current}
+
+
+def compute_trends(columns: Dict[str, Any], start_day: date, end_day: date, window: int) -> Dict[str, Any]:
+    span = (end_day - start_day).days + 1
+    calendar = np.datetime64(start_day, "D") + np.arange(span)
+    result: Dict[str, Any] = {
+        "period": {"start": start_day, "end": end_day, "days": span},
+        "window": window,
+        "entry_count": int(columns["entry_count"].sum()),
+    }
+
+    # --- kolumny dzienne rozłożone na pełny kalendarz zakresu (dni bez wpisów = 0) ---
+    day_index = (columns["days"] - np.datetime64(start_day, "D")).astype(np.int64)
+    day_count = np.zeros(span, dtype=np.int64)
+    rated_count = np.zeros(span)
+    rated_sum = np.zeros(span)
+    day_count[day_index] = columns["entry_count"]
+    rated_count[day_index] = columns["rated_count"]
+    rated_sum[day_index] = columns["rating_sum"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily_mean = rated_sum / rated_count
+
+    # --- średnia krocząca (ważona liczbą wpisów) przez sumy prefiksowe ---
+    def window_sum(values: np.ndarray) -> np.ndarray:
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        lower = np.maximum(np.arange(1, span + 1) - window, 0)
+        return cumulative[1:] - cumulative[lower]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rolling_mean = window_sum(rated_sum) / window_sum(rated_count)
+
+    # Serializacja całymi kolumnami (tolist) - przy latach danych to tysiące punktów
+    result["daily"] = [
+        {"date": day, "count": count, "average": mean, "rolling_average": rolling}
+        for day, count, mean, rolling in zip(
+            calendar.astype(str).tolist(),
+            day_count.tolist(),
+            _round_column(daily_mean, 2),
+            _round_column(rolling_mean, 2)
+        )
+    ]
+
+    rated_total = rated_count.sum()
+    if not rated_total:
+        result.update({"average_mood": None, "volatility": None, "weekdays": None,
+                       "streaks": _streaks(day_count > 0), "categories": []})
+        return result
+
+    overall_mean = rated_sum.sum() / rated_total
+    # Odchylenie standardowe ocen z sum kwadratów (jak np.std po wszystkich wpisach)
+    overall_std = np.sqrt(max(columns["rating_sq_sum"].sum() / rated_total - overall_mean ** 2, 0.0))
+    result["average_mood"] = _round(overall_mean, 2)
+
+    # --- zmienność ---
+    logged_means = daily_mean[rated_count > 0]
+    result["volatility"] = {
+        "std": _round(overall_std),
+        "daily_std": _round(logged_means.std()),
+        # Średnia zmiana między kolejnymi dniami z wpisami
+        "mean_abs_change": _round(np.abs(np.diff(logged_means)).mean()) if len(logged_means) > 1 else None
+    }
+
+    # --- dni tygodnia (0 = poniedziałek; 1970-01-01 był czwartkiem) ---
+    weekday = (calendar.astype(np.int64) + 3) % 7
+    weekday_count = np.bincount(weekday, weights=rated_count, minlength=7)
+    weekday_sum = np.bincount(weekday, weights=rated_sum, minlength=7)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weekday_mean = weekday_sum / weekday_count
+    ranked = [i for i in np.argsort(weekday_mean) if weekday_count[i] > 0]
+    result["weekdays"] = {
+        "averages": {WEEKDAYS[i]: _round(weekday_mean[i], 2) for i in range(7)},
+        "counts": {WEEKDAYS[i]: int(weekday_count[i]) for i in range(7)},
+        "best": WEEKDAYS[ranked[-1]],
+        "worst": WEEKDAYS[ranked[0]]
+    }
+
+    result["streaks"] = _streaks(day_count > 0)
+
+    # --- kategorie: średnia i korelacja punktowo-dwuseryjna z oceną ---
+    cat_count = columns["category_count"]
+    share = cat_count / rated_total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Kategoria bez ocenionych wpisów -> NaN -> pomijamy niżej
+        cat_mean = columns["category_sum"] / cat_count
+        # corr(1[kategoria], ocena) = (śr_kat - śr) * sqrt(p / (1 - p)) / std
+        correlation = (cat_mean - overall_mean) * np.sqrt(share / (1 - share)) / overall_std
+    result["categories"] = sorted(
+        (
+            {
+                "category": label,
+                "count": int(count),
+                "average": _round(mean, 2),
+                "correlation": _round(corr)
+            }
+            for label, count, mean, corr in zip(columns["category_labels"], cat_count, cat_mean, correlation)
+            if count
+        ),
+        key=lambda item: -item["count"]
+    )
+    return result
+
+
+class TrendsCache:
+    def __init__(self, max_size: int = AI_TRENDS_CACHE_SIZE, ttl: float = AI_TRENDS_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (user_id, wersja danych usera, start, end, window) -> (wynik, wygasa_o)
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: tuple, value: Dict[str, Any]):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+trends_cache = TrendsCache()
+
+
+def mood_trends(db: Session, user_id: str, start_day: Optional[date], end_day: Optional[date],
+                window: int = 7) -> Dict[str, Any]:
+    # Wersję czytamy przed wpisami - zapis w trakcie liczenia da przy następnym zapytaniu nowy klucz.
+    # None = brak profilu usera: bez cache, bo nie ma czego podbić przy zmianie
+    version = user_version.current(db, user_id)
+    key = (str(user_id), version, start_day, end_day, window)
+    if version is not None:
+        cached = trends_cache.get(key)
+        if cached is not None:
+            return cached
+
+    columns = load_columns(db, user_id, start_day, end_day)
+    days = columns["days"]
+    # Bez podanych granic: od pierwszego wpisu do dziś
+    first_day = start_day or (days[0].astype(date) if len(days) else date.today())
+    last_day = end_day or date.today()
+    if len(days):
+        last_day = max(last_day, days[-1].astype(date))
+    # Pusty zakres (end_date przed pierwszym wpisem, start_date w przyszłości, brak wpisów):
+    # jeden dzień bez danych zamiast ujemnej długości kalendarza
+    first_day = min(first_day, last_day)
+    result = compute_trends(columns, first_day, last_day, window)
+    if version is not None:
+        trends_cache.put(key, result)
+    return result
@@ -0,0 +1,23 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Nieprzezroczyste kursory stronicowania keyset dla listy wpisów (GET /entries/{user_id}).
+# Kursor = (date, id) ostatniego wpisu na stronie; następna strona zaczyna się "za" nim,
+# więc koszt nie rośnie z głębokością, a nowe wpisy nie przesuwają kolejnych stron.
+
+
+def encode_cursor(date: datetime, entry_id: int) -> str:
+    raw = f"{date.isoformat()}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """(date, id) albo None, gdy kursor jest uszkodzony."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        date_part, id_part = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeError):
+        return None
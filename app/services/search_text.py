@@ -0,0 +1,75 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+# Normalizacja tekstu wpisów do wyszukiwania (GET /entries/{user_id}/search).
+# Ani FTS5 w SQLite, ani Postgres nie mają stemmera dla polskiego, więc rdzenie liczymy tutaj,
+# tak samo dla indeksu (MoodEntry.search_text) i dla zapytania - baza indeksuje gotowe rdzenie.
+# Lekkie ucinanie końcówek (polskie i angielskie) + zdjęcie znaków diakrytycznych:
+# "zmęczona", "zmęczony", "zmeczeniem" -> "zmecz"; "walking", "walked" -> "walk".
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Najdłuższe najpierw; rdzeń musi zachować co najmniej MIN_STEM znaków
+POLISH_SUFFIXES = sorted([
+    "owałem", "owałam", "owałeś", "owała", "owało", "owali", "ował", "ałem", "ałam", "iłem", "iłam",
+    "ościami", "ościach", "owaniem", "owania", "owanie", "eniem", "aniem", "ością", "ości",
+    "owego", "owemu", "owych", "owymi", "owej", "owie", "owy", "owa", "owe",
+    "ego", "emu", "ymi", "imi", "ych", "ich", "ami", "ach", "iem", "ień", "enie", "anie",
+    "ona", "ony", "one", "eni", "ani",
+    "em", "ej", "om", "ów", "ie", "ia", "ią", "ię", "ym", "im", "ał", "ła", "ło", "li", "ły",
+    "ę", "ą", "y", "i", "a", "e", "u", "o",
+], key=len, reverse=True)
+ENGLISH_SUFFIXES = ("ingly", "edly", "ness", "ing", "ies", "ed", "ly", "es", "s")
+MIN_STEM = 3
+# Słowa krótsze niż tyle nie są indeksowane ("i", "w", "a", "to")
+MIN_WORD = 2
+
+# Końcówki pogrupowane po długości (najdłuższe najpierw): jedno wyszukanie w zbiorze
+# na długość zamiast endswith dla każdej końcówki
+_POLISH_BY_LENGTH = [
+    (length, frozenset(suffix for suffix in POLISH_SUFFIXES if len(suffix) == length))
+    for length in sorted({len(suffix) for suffix in POLISH_SUFFIXES}, reverse=True)
+]
+
+
+def fold(word: str) -> str:
+    # "ł" nie rozkłada się w NFKD - zamieniamy ręcznie
+    word = word.replace("ł", "l")
+    return "".join(ch for ch in unicodedata.normalize("NFKD", word) if not unicodedata.combining(ch))
+
+
+# Słowa w dzienniku często się powtarzają - przy imporcie historii cache oszczędza większość pracy
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    word = word.lower()
+    for suffix in ENGLISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM and word.isascii():
+            word = word[:-len(suffix)]
+            break
+    else:
+        for length, suffixes in _POLISH_BY_LENGTH:
+            if len(word) - length >= MIN_STEM and word[-length:] in suffixes:
+                word = word[:-length]
+                break
+    return fold(word)
+
+
+def words(text: str) -> List[Tuple[int, int, str]]:
+    """(początek, koniec, rdzeń) dla każdego słowa - do wycinków z podświetleniem."""
+    return [
+        (match.start(), match.end(), stem(match.group()))
+        for match in WORD_RE.finditer(text or "")
+        if len(match.group()) >= MIN_WORD
+    ]
+
+
+def search_text(text: str) -> str:
+    """Tekst do indeksu: rdzenie oddzielone spacjami."""
+    return " ".join(token for _, _, token in words(text))
+
+
+def query_terms(query: str) -> List[str]:
+    # Bez powtórzeń, w kolejności z zapytania
+    return list(dict.fromkeys(token for _, _, token in words(query)))
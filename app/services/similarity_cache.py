@@ -0,0 +1,171 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Lokalny cache analiz dla prawie identycznych wpisów ("zmęczony po pracy" / "Zmęczona po pracy!").
+# Bez sieci: tekst -> znormalizowane 3-gramy znakowe -> MinHash -> LSH (pasma) -> weryfikacja Jaccardem.
+
+ANALYSIS_SIMILARITY_THRESHOLD = float(os.getenv("ANALYSIS_SIMILARITY_THRESHOLD", "0.7"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "5000"))
+# Dłuższe wpisy są zbyt osobiste, żeby podawać cudzą (nawet podobną) analizę
+ANALYSIS_CACHE_MAX_CHARS = int(os.getenv("ANALYSIS_CACHE_MAX_CHARS", "280"))
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(count: int) -> List[Tuple[int, int]]:
+    # Deterministyczne (a, b) dla h(x) = (a*x + b) mod p - bez random, żeby wynik był powtarzalny
+    perms = []
+    for i in range(count):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % _MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMS = _permutations(NUM_PERM)
+
+
+def normalize_text(text: str) -> str:
+    # Małe litery, bez polskich znaków diakrytycznych i interpunkcji, pojedyncze spacje
+    text = unicodedata.normalize("NFKD", text.lower().replace("ł", "l"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def shingles(normalized: str) -> FrozenSet[str]:
+    padded = f" {normalized} "
+    if len(padded) <= SHINGLE_SIZE:
+        return frozenset([padded])
+    return frozenset(padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1))
+
+
+def minhash(shingle_set: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "big") for s in shingle_set]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMS
+    )
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+class SimilarityCache:
+    """Cache analiz z wyszukiwaniem prawie-duplikatów (MinHash + LSH), ograniczony rozmiarem (LRU)."""
+
+    def __init__(self, max_size: int = ANALYSIS_CACHE_SIZE, threshold: float = ANALYSIS_SIMILARITY_THRESHOLD):
+        self.max_size = max_size
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id -> (namespace, shingles, band_keys, analysis)
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()
+        # (namespace, nr pasma, hash pasma) -> id wpisów
+        self._buckets: Dict[tuple, Set[int]] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def namespace(lang: str, system_prompt: str) -> str:
+        # Inny język albo prompt systemowy => osobna przestrzeń kluczy
+        return f"{lang}:{hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:12]}"
+
+    @staticmethod
+    def _band_keys(namespace: str, signature: Tuple[int, ...]) -> List[tuple]:
+        return [(namespace, band, hash(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+    def _prepare(self, text: str):
+        normalized = normalize_text(text)
+        if not normalized or len(normalized) > ANALYSIS_CACHE_MAX_CHARS:
+            return None
+        shingle_set = shingles(normalized)
+        return shingle_set, minhash(shingle_set)
+
+    def get(self, lang: str, system_prompt: str, text: str) -> Optional[str]:
+        prepared = self._prepare(text)
+        with self._lock:
+            self.lookups += 1
+        if prepared is None:
+            return None
+        shingle_set, signature = prepared
+        ns = self.namespace(lang, system_prompt)
+
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._band_keys(ns, signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            best_id, best_score = None, 0.0
+            for item_id in candidates:
+                item = self._items.get(item_id)
+                if item is None or item[0] != ns:
+                    continue
+                score = jaccard(shingle_set, item[1])
+                if score > best_score:
+                    best_id, best_score = item_id, score
+
+            if best_id is None or best_score < self.threshold:
+                return None
+            self._items.move_to_end(best_id)
+            self.hits += 1
+            return self._items[best_id][3]
+
+    def put(self, lang: str, system_prompt: str, text: str, analysis: str):
+        prepared = self._prepare(text)
+        if prepared is None or not analysis:
+            return
+        shingle_set, signature = prepared
+        ns = self.namespace(lang, system_prompt)
+        band_keys = self._band_keys(ns, signature)
+
+        with self._lock:
+            item_id = self._next_id
+            self._next_id += 1
+            self._items[item_id] = (ns, shingle_set, band_keys, analysis)
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(item_id)
+            while len(self._items) > self.max_size:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        item_id, (_, _, band_keys, _) = self._items.popitem(last=False)
+        for key in band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._buckets[key]
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "buckets": len(self._buckets),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "threshold": self.threshold
+            }
+
+
+# Instancja współdzielona przez proces
+analysis_cache = SimilarityCache()
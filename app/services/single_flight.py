@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Łączy współbieżne wywołania z tym samym kluczem w jedno:
+    pierwszy wywołujący uruchamia funkcję, kolejni czekają na ten sam wynik.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.calls = 0      # wszystkie wywołania do()
+        self.executed = 0   # faktycznie uruchomione funkcje (zapytania do upstream)
+        self.shared = 0     # wywołania obsłużone cudzym wynikiem (zaoszczędzone zapytania)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            # Osobny task: rozłączenie pierwszego klienta nie anuluje pracy pozostałych
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._forget(k, _t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Oznaczamy wyjątek jako odebrany, nawet jeśli wszyscy czekający się rozłączyli
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.executed,
+            "upstream_calls_saved": self.shared,
+            "in_flight": len(self._in_flight)
+        }
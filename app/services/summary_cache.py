@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import models
+
+# Jak długo podsumowanie AI jest ważne (tak jak wcześniej: 24h)
+AI_CACHE_TTL_HOURS = float(os.getenv("AI_CACHE_TTL_HOURS", "24"))
+# Rozmiar cache w pamięci procesu (przed tabelą ai_analysis_cache)
+AI_CACHE_LRU_SIZE = int(os.getenv("AI_CACHE_LRU_SIZE", "1024"))
+
+
+def stats_fingerprint(entry_count: int, average_mood: float, stats: Dict[str, int]) -> str:
+    """Odcisk danych, z których powstaje prompt - inne dane => inny klucz."""
+    raw = json.dumps(
+        {"count": entry_count, "avg": round(average_mood, 4), "stats": stats},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def summary_cache_key(user_id: str, start_date: datetime, end_date: datetime, lang: str, fingerprint: str) -> str:
+    # Zakres liczymy z dokładnością do dnia - domyślny zakres "ostatnie 7 dni" kończy się na
+    # datetime.now(), więc z dokładnymi sekundami klucz nigdy by się nie powtórzył.
+    # Różnice w danych wewnątrz dnia i tak wyłapuje odcisk statystyk.
+    raw = f"{user_id}|{start_date.date().isoformat()}|{end_date.date().isoformat()}|{lang}|{fingerprint}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+class SummaryCache:
+    """
+    Dwupoziomowy cache podsumowań AI:
+    1. LRU w pamięci procesu z TTL,
+    2. tabela ai_analysis_cache z unikalnym cache_key (upsert zamiast dopisywania wierszy).
+    """
+
+    def __init__(self, max_size: int = AI_CACHE_LRU_SIZE, ttl_hours: float = AI_CACHE_TTL_HOURS):
+        self.max_size = max_size
+        self.ttl = timedelta(hours=ttl_hours)
+        self._lock = threading.Lock()
+        # cache_key -> (ai_suggestion, wygasa_o (monotonic), user_id, start, end)
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits_memory = 0
+        self.hits_db = 0
+        self.misses = 0
+
+    # --- poziom 1: pamięć ---
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._lru.get(key)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return item[0]
+
+    def _memory_put(self, key: str, value: str, user_id: str, start_date: datetime, end_date: datetime,
+                    expires_in: Optional[float] = None):
+        if expires_in is None:
+            expires_in = self.ttl.total_seconds()
+        with self._lock:
+            self._lru[key] = (value, time.monotonic() + expires_in, str(user_id), _naive(start_date), _naive(end_date))
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    # --- API ---
+
+    def get(self, db: Session, key: str, user_id: str, start_date: datetime, end_date: datetime) -> Optional[str]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.hits_memory += 1
+            return value
+
+        row = db.query(models.AiAnalysisCache.ai_suggestion, models.AiAnalysisCache.created_at).filter(
+            models.AiAnalysisCache.cache_key == key,
+            models.AiAnalysisCache.created_at >= datetime.now() - self.ttl
+        ).first()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits_db += 1
+        # Do pamięci tylko na tyle, ile wierszowi zostało ważności
+        remaining = (_naive(row.created_at) + self.ttl - datetime.now()).total_seconds()
+        self._memory_put(key, row.ai_suggestion, user_id, start_date, end_date, expires_in=max(remaining, 0))
+        return row.ai_suggestion
+
+    def put(self, db: Session, key: str, user_id: str, start_date: datetime, end_date: datetime,
+            lang: str, fingerprint: str, range_label: str, ai_suggestion: str):
+        values = {
+            "cache_key": key,
+            "user_id": user_id,
+            "range_type": range_label,
+            "start_date": start_date,
+            "end_date": end_date,
+            "lang": lang,
+            "stats_fingerprint": fingerprint,
+            "ai_suggestion": ai_suggestion,
+            "created_at": datetime.now()
+        }
+        dialect = db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        table = models.AiAnalysisCache.__table__
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.cache_key],
+            set_={
+                "ai_suggestion": stmt.excluded.ai_suggestion,
+                "range_type": stmt.excluded.range_type,
+                "created_at": stmt.excluded.created_at
+            }
+        )
+        db.execute(stmt)
+        db.commit()
+        self._memory_put(key, ai_suggestion, user_id, start_date, end_date)
+
+    def invalidate(self, db: Session, user_id, entry_date: Optional[datetime]):
+        """
+        Wpis usera się zmienił - usuwamy podsumowania, których zakres obejmuje jego datę.
+        Nie commituje: wywołujący commituje razem ze zmianą wpisu.
+        """
+        user_key = str(user_id)
+        day = _naive(entry_date) if entry_date else None
+        with self._lock:
+            stale = [
+                key for key, item in self._lru.items()
+                if item[2] == user_key and (day is None or item[3].date() <= day.date() <= item[4].date())
+            ]
+            for key in stale:
+                del self._lru[key]
+
+        query = db.query(models.AiAnalysisCache).filter(models.AiAnalysisCache.user_id == user_id)
+        if day is not None:
+            # Zakresy są liczone z dokładnością do dnia (patrz summary_cache_key)
+            day_start = datetime(day.year, day.month, day.day)
+            query = query.filter(
+                models.AiAnalysisCache.start_date < day_start + timedelta(days=1),
+                models.AiAnalysisCache.end_date >= day_start
+            )
+        query.delete(synchronize_session=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._lru)
+        return {
+            "memory_entries": size,
+            "memory_hits": self.hits_memory,
+            "db_hits": self.hits_db,
+            "misses": self.misses
+        }
+
+
+# Instancja współdzielona przez proces
+summary_cache = SummaryCache()
@@ -0,0 +1,161 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+
+from .. import database, models
+from .llm_client import llm_client, LLMError
+from .summary_cache import summary_cache
+from .weekly_summary import MODELS_TO_TRY, build_summary_stats, summary_key, generate_summary_advice
+
+# Generowanie podsumowań AI z wyprzedzeniem (poza godzinami szczytu), żeby pierwsze
+# otwarcie widoku tygodnia/miesiąca trafiało w cache zamiast czekać na model.
+
+SUMMARY_PREGEN_ENABLED = os.getenv("SUMMARY_PREGEN_ENABLED", "0") == "1"
+# Godziny poza szczytem (czas serwera), np. "2-6" = od 2:00 do 5:59
+SUMMARY_PREGEN_HOURS = os.getenv("SUMMARY_PREGEN_HOURS", "2-6")
+# Co ile sekund planista sprawdza, czy jest coś do zrobienia
+SUMMARY_PREGEN_INTERVAL = float(os.getenv("SUMMARY_PREGEN_INTERVAL", "900"))
+# Zakresy (liczba dni wstecz od dziś, jak domyślne "ostatnie 7 dni" = 6) i języki
+SUMMARY_PREGEN_RANGES = [int(x) for x in os.getenv("SUMMARY_PREGEN_RANGES", "6,29").split(",") if x.strip()]
+SUMMARY_PREGEN_LANGS = [x.strip() for x in os.getenv("SUMMARY_PREGEN_LANGS", "pl").split(",") if x.strip()]
+# Aktywny user = ma wpisy z ostatnich N dni
+SUMMARY_PREGEN_ACTIVE_DAYS = int(os.getenv("SUMMARY_PREGEN_ACTIVE_DAYS", "14"))
+SUMMARY_PREGEN_MAX_USERS = int(os.getenv("SUMMARY_PREGEN_MAX_USERS", "500"))
+# Jaką część budżetu OPENROUTER_RPM może zużyć praca w tle
+SUMMARY_PREGEN_BUDGET_SHARE = float(os.getenv("SUMMARY_PREGEN_BUDGET_SHARE", "0.5"))
+
+
+def parse_hours(spec: str) -> Tuple[int, int]:
+    start, end = spec.split("-")
+    return int(start), int(end)
+
+
+def in_off_peak(now: datetime, spec: str = SUMMARY_PREGEN_HOURS) -> bool:
+    start, end = parse_hours(spec)
+    if start <= end:
+        return start <= now.hour < end
+    # Zakres przez północ, np. "23-5"
+    return now.hour >= start or now.hour < end
+
+
+def active_users(db, since: datetime, limit: int) -> List[str]:
+    """Aktywni userzy, najpierw ci z największą liczbą świeżych wpisów, potem najnowszym wpisem."""
+    recent_count = func.count(models.MoodEntry.id)
+    last_entry = func.max(models.MoodEntry.date)
+    rows = db.query(models.MoodEntry.owner_id, recent_count, last_entry)\
+        .filter(models.MoodEntry.date >= since, models.MoodEntry.owner_id.isnot(None))\
+        .group_by(models.MoodEntry.owner_id)\
+        .order_by(recent_count.desc(), last_entry.desc())\
+        .limit(limit)\
+        .all()
+    return [str(owner_id) for owner_id, _, _ in rows]
+
+
+class SummaryScheduler:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.generated = 0
+        self.skipped_cached = 0
+        self.failed = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                if in_off_peak(datetime.now()):
+                    await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Summary scheduler error: {e}")
+            await asyncio.sleep(SUMMARY_PREGEN_INTERVAL)
+
+    def _prepare(self, user_id: str, start_date: datetime, end_date: datetime, lang: str):
+        db = database.SessionLocal()
+        try:
+            summary = build_summary_stats(db, user_id, start_date, end_date)
+            if not summary["entry_count"]:
+                return None
+            # Klucz z pełnych dni - trafi go też zapytanie z innej godziny tego samego dnia
+            cache_key, fingerprint, key_summary = summary_key(db, user_id, start_date, end_date, lang, summary)
+            if summary_cache.get(db, cache_key, user_id, start_date, end_date) is not None:
+                return "cached"
+            return key_summary, cache_key, fingerprint
+        finally:
+            db.close()
+
+    async def _wait_for_budget(self):
+        # Praca w tle zużywa tylko część budżetu - reszta zostaje dla użytkowników.
+        # Jedno podsumowanie to w najgorszym razie zapytanie do każdego modelu z listy
+        # (hedging i fallback), więc czekamy na miejsce dla wszystkich. Gdy udział budżetu
+        # jest mniejszy niż liczba modeli, tło może go przekroczyć o jedno podsumowanie.
+        worst_case = len(MODELS_TO_TRY)
+        limit = max(worst_case, int(llm_client.budget.per_minute * SUMMARY_PREGEN_BUDGET_SHARE))
+        while llm_client.budget.used() + worst_case > limit:
+            await asyncio.sleep(1)
+        await llm_client.budget.wait_for_slot()
+
+    async def run_once(self, now: Optional[datetime] = None):
+        now = now or datetime.now()
+        self.last_run = now
+        db = database.SessionLocal()
+        try:
+            user_ids = active_users(db, now - timedelta(days=SUMMARY_PREGEN_ACTIVE_DAYS), SUMMARY_PREGEN_MAX_USERS)
+        finally:
+            db.close()
+
+        print(f"Summary scheduler: {len(user_ids)} active users")
+        for user_id in user_ids:
+            for days_back in SUMMARY_PREGEN_RANGES:
+                end_date = now
+                start_date = end_date - timedelta(days=days_back)
+                for lang in SUMMARY_PREGEN_LANGS:
+                    prepared = await run_in_threadpool(self._prepare, user_id, start_date, end_date, lang)
+                    if prepared is None:
+                        continue
+                    if prepared == "cached":
+                        self.skipped_cached += 1
+                        continue
+                    summary, cache_key, fingerprint = prepared
+                    await self._wait_for_budget()
+                    try:
+                        await generate_summary_advice(
+                            cache_key, fingerprint, user_id, start_date, end_date, lang, summary
+                        )
+                        self.generated += 1
+                    except LLMError as e:
+                        self.failed += 1
+                        print(f"Summary scheduler: {user_id} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SUMMARY_PREGEN_ENABLED,
+            "running": self._task is not None,
+            "off_peak_hours": SUMMARY_PREGEN_HOURS,
+            "generated": self.generated,
+            "skipped_cached": self.skipped_cached,
+            "failed": self.failed,
+            "last_run": self.last_run,
+            "budget_used_last_minute": llm_client.budget.used(),
+            "budget_per_minute": llm_client.budget.per_minute
+        }
+
+
+summary_scheduler = SummaryScheduler()
@@ -0,0 +1,63 @@
+import zlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Warunkowe GET dla danych usera (lista wpisów, profil, liczniki trzeźwości).
+# users.data_version rośnie przy każdym zapisie danych usera - w tej samej transakcji co zmiana,
+# więc działa także przy kilku procesach API. ETag = zasób + wersja + parametry zapytania;
+# If-None-Match z aktualnym ETagiem -> 304 po jednym odczycie po kluczu głównym,
+# bez zapytania o listę i bez serializacji.
+
+
+def bump(db: Session, user_id):
+    """Nie commituje - wywołujący commituje razem ze zmianą danych."""
+    if user_id is None:
+        return
+    db.query(models.User)\
+        .filter(models.User.id == user_id)\
+        .update({models.User.data_version: models.User.data_version + 1}, synchronize_session=False)
+
+
+def current(db: Session, user_id) -> Optional[int]:
+    """None = brak profilu usera (wtedy bez ETagu)."""
+    return db.query(models.User.data_version).filter(models.User.id == user_id).scalar()
+
+
+def resource_etag(db: Session, request: Request, resource: str, user_id) -> Optional[str]:
+    # Wersję czytamy przed danymi: zapis w trakcie odczytu da przy następnym GET nowy ETag, nie 304
+    version = current(db, user_id)
+    if version is None:
+        return None
+    # Inny limit / kursor / fields = inna odpowiedź
+    variant = zlib.crc32(request.url.query.encode("utf-8"))
+    # Słaby ETag - treść może być różnie kompresowana
+    return f'W/"{resource}-{version}-{variant:08x}"'
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: Optional[str]) -> bool:
+    header = request.headers.get("if-none-match")
+    if etag is None or not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Porównanie słabe (RFC 9110): W/"x" == "x"
+    return _opaque(etag) in {_opaque(tag.strip()) for tag in header.split(",")}
+
+
+def cache_headers(etag: Optional[str]) -> Dict[str, str]:
+    if etag is None:
+        return {}
+    # no-cache: klient może trzymać odpowiedź, ale przed użyciem pyta serwer (If-None-Match)
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,231 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from .. import database, models
+from . import mood_rollup
+from .model_fallback import hedged_chat_completion
+from .single_flight import SingleFlight
+from .summary_cache import summary_cache, summary_cache_key, stats_fingerprint
+
+# Logika podsumowania nastroju współdzielona przez /ai/weekly_summary
+# i planistę, który generuje podsumowania z wyprzedzeniem (summary_scheduler.py).
+
+# Kolejność bazowa - rejestr modeli przestawia ją wg zmierzonych opóźnień
+MODELS_TO_TRY = [
+    "mistralai/mistral-small-3.1-24b-instruct:free",
+    "google/gemini-2.0-flash-exp:free",
+    "meta-llama/llama-3.2-11b-vision-instruct:free",
+    "microsoft/phi-3-mini-128k-instruct:free"
+]
+
+# Łączenie współbieżnych identycznych zapytań o podsumowanie (klucz = cache_key)
+summary_flight = SingleFlight()
+
+
+def range_label_for(start_date: datetime, end_date: datetime) -> str:
+    range_label = "Custom"
+    delta_days = (end_date - start_date).days
+    if delta_days <= 1: range_label = "Dzień"
+    elif delta_days <= 7: range_label = "Tydzień"
+    elif delta_days <= 31: range_label = "Miesiąc"
+    elif delta_days >= 360: range_label = "Rok"
+    return range_label
+
+
+def _day_start(db: Session, day: date) -> datetime:
+    # Początek dnia tak, jak dzieli dni daily_mood_rollup (mood_rollup.rollup_day):
+    # SQLite - czas ścienny bez strefy, Postgres - UTC
+    value = datetime(day.year, day.month, day.day)
+    return value.replace(tzinfo=timezone.utc) if db.get_bind().dialect.name == "postgresql" else value
+
+
+def _edge_day_rows(db: Session, user_id: str, start_date: datetime, end_date: datetime,
+                   inner_start: date, inner_end: date) -> List[tuple]:
+    """(dzień, kategoria, liczba, suma ocen) z mood_entries dla niepełnych dni na brzegach zakresu."""
+    entry_day = func.date(models.MoodEntry.date)
+    category = func.coalesce(models.MoodEntry.category, "")
+    rows = db.query(
+        entry_day, category, func.count(models.MoodEntry.id), func.coalesce(func.sum(models.MoodEntry.mood_rating), 0.0)
+    ).filter(
+        models.MoodEntry.owner_id == user_id,
+        models.MoodEntry.date >= start_date,
+        models.MoodEntry.date <= end_date,
+        or_(models.MoodEntry.date < _day_start(db, inner_start), models.MoodEntry.date >= _day_start(db, inner_end))
+    ).group_by(entry_day, category).all()
+    # SQLite zwraca 'YYYY-MM-DD', Postgres obiekt date
+    return [
+        (date.fromisoformat(day) if isinstance(day, str) else day, cat, count, rating_sum)
+        for day, cat, count, rating_sum in rows
+    ]
+
+
+def build_summary_stats(db: Session, user_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+    # Zakres jest dokładny (start_date <= date <= end_date), tak jak przy liczeniu z wpisów:
+    # pełne dni w środku zakresu czytamy z daily_mood_rollup - O(dni) zamiast O(wpisów),
+    # a niepełny pierwszy i ostatni dzień liczymy z mood_entries z dokładnymi granicami.
+
+    # --- NOWA LOGIKA: DZIENNY ROZKŁAD WPISÓW ---
+    # Inicjalizujemy mapę zerami dla każdego dnia w zakresie
+    daily_counts: Dict[str, int] = {}
+    delta = (end_date - start_date).days + 1
+
+    # Tworzymy klucze dat (np. "2023-12-01") dla całego zakresu
+    for i in range(delta):
+        day = start_date + timedelta(days=i)
+        key = day.strftime('%Y-%m-%d')
+        daily_counts[key] = 0
+
+    # Statystyka Nastrojów
+    stats: Dict[str, int] = {}
+    mood_rating_sum = 0.0
+    entry_count = 0
+
+    # Pełne dni: [inner_start, inner_end)
+    inner_start = mood_rollup.rollup_day(db, start_date) + timedelta(days=1)
+    inner_end = max(mood_rollup.rollup_day(db, end_date), inner_start)
+    rollup_rows = _edge_day_rows(db, user_id, start_date, end_date, inner_start, inner_end)
+    if inner_start < inner_end:
+        rollup_rows += mood_rollup.query_range(db, user_id, inner_start, inner_end - timedelta(days=1))
+
+    for day_value, cat, count, rating_sum in sorted(rollup_rows, key=lambda row: row[1]):
+        # 1. Zliczanie nastrojów
+        stats[cat] = stats.get(cat, 0) + count
+        mood_rating_sum += rating_sum or 0.0
+        entry_count += count
+
+        # 2. Zliczanie dzienne (Wykres Czas - Ilość)
+        entry_day_key = day_value.strftime('%Y-%m-%d')
+        if entry_day_key in daily_counts:
+            daily_counts[entry_day_key] += count
+
+    average_mood = mood_rating_sum / entry_count if entry_count else 0
+
+    return {
+        "entry_count": entry_count,
+        "average_mood": average_mood,
+        "stats": stats,
+        "daily_counts": daily_counts
+    }
+
+
+def whole_days(db: Session, start_date: datetime, end_date: datetime) -> Tuple[datetime, datetime]:
+    """Zakres rozszerzony do pełnych dni - od początku pierwszego do końca ostatniego."""
+    first_day = mood_rollup.rollup_day(db, start_date)
+    last_day = mood_rollup.rollup_day(db, end_date)
+    return _day_start(db, first_day), _day_start(db, last_day + timedelta(days=1)) - timedelta(microseconds=1)
+
+
+def summary_key(db: Session, user_id: str, start_date: datetime, end_date: datetime, lang: str,
+                summary: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    (cache_key, odcisk, statystyki do promptu). Klucz: user + dni zakresu + język + odcisk
+    statystyk z pełnych dni - zapytanie kończące się na now() i podsumowanie wygenerowane
+    z wyprzedzeniem o innej godzinie (summary_scheduler.py) trafiają ten sam klucz, dopóki
+    wpisy w tych dniach się nie zmienią. Odpowiedź dalej pokazuje statystyki z dokładnego zakresu.
+    """
+    day_start, day_end = whole_days(db, start_date, end_date)
+    if (day_start, day_end) != (start_date, end_date):
+        summary = build_summary_stats(db, user_id, day_start, day_end)
+    fingerprint = stats_fingerprint(summary["entry_count"], summary["average_mood"], summary["stats"])
+    return summary_cache_key(user_id, start_date, end_date, lang, fingerprint), fingerprint, summary
+
+
+def summary_response(start_date: datetime, end_date: datetime, summary: Dict[str, Any], ai_advice: str) -> Dict[str, Any]:
+    # Format odpowiedzi /ai/weekly_summary (również wynik zadania z kolejki)
+    return {
+        "period": {
+            "start": start_date,
+            "end": end_date
+        },
+        "entry_count": summary["entry_count"],
+        "average_mood_rating": round(summary["average_mood"], 2),
+        "mood_stats": summary["stats"],
+        "daily_counts": summary["daily_counts"], # <--- TO JEST NOWE DLA WYKRESU
+        "ai_suggestion": ai_advice
+    }
+
+
+def build_summary_messages(
+    lang: str,
+    start_date: datetime,
+    end_date: datetime,
+    summary: Dict[str, Any]
+) -> List[Dict[str, str]]:
+    entry_count = summary["entry_count"]
+    average_mood = summary["average_mood"]
+
+    # Construct the prompt
+    mood_summary = ", ".join([f"{mood}: {count}" for mood, count in summary["stats"].items()])
+
+    if lang == 'en':
+        prompt_text = (
+            f"Analyze user activity from {start_date.strftime('%d.%m')} to {end_date.strftime('%d.%m')}. "
+            f"Entry count: {entry_count}. "
+            f"Average mood: {round(average_mood, 1)}/5.0. "
+            f"Mood distribution: {mood_summary}. "
+            "Based on this data, write a short, personalized opinion (max 2 sentences). "
+            "Address the user directly. "
+            "Suggest a concrete advice or observation."
+        )
+        system_prompt_weekly = "You are an empathetic psychologist and data analyst. Your goal is to draw conclusions from the user's mood. Write briefly and in English."
+    else:
+        prompt_text = (
+            f"Przeanalizuj aktywność użytkownika z okresu {start_date.strftime('%d.%m')} - {end_date.strftime('%d.%m')}. "
+            f"Liczba wpisów: {entry_count}. "
+            f"Średnia ocena nastroju: {round(average_mood, 1)}/5.0. "
+            f"Rozkład nastrojów: {mood_summary}. "
+            "Na podstawie tych danych napisz krótką, spersonalizowaną opinię (max 2 zdania). "
+            "Zwróć się bezpośrednio do użytkownika. "
+            "Zaproponuj konkretną radę lub obserwację (np. 'Zalecam więcej snu, ponieważ...')."
+        )
+        system_prompt_weekly = "Jesteś empatycznym psychologiem i analitykiem danych. Twoim celem jest wyciągnięcie wniosków z nastroju użytkownika. Pisz krótko i po polsku."
+
+    return [
+        {
+            "role": "system",
+            "content": system_prompt_weekly
+        },
+        {"role": "user", "content": prompt_text}
+    ]
+
+
+def save_summary_cache(*args):
+    # Osobna sesja - zapis wykonuje wspólne zadanie single-flight, nie konkretne zapytanie HTTP
+    db = database.SessionLocal()
+    try:
+        summary_cache.put(db, *args)
+    finally:
+        db.close()
+
+
+async def generate_summary_advice(
+    cache_key: str,
+    fingerprint: str,
+    user_id: str,
+    start_date: datetime,
+    end_date: datetime,
+    lang: str,
+    summary: Dict[str, Any]
+) -> str:
+    """Pyta model (hedging + single-flight) i zapisuje odpowiedź do cache. Rzuca LLMError."""
+    messages = build_summary_messages(lang, start_date, end_date, summary)
+    range_label = range_label_for(start_date, end_date)
+
+    async def generate_summary():
+        # Hedging między modelami z łącznym limitem czasu (AI_DEADLINE)
+        model, advice = await hedged_chat_completion(MODELS_TO_TRY, messages)
+        print(f"Model {model} answered")
+
+        # Zapisujemy do Cache (upsert po cache_key)
+        await run_in_threadpool(
+            save_summary_cache, cache_key, user_id, start_date, end_date,
+            lang, fingerprint, range_label, advice
+        )
+        return advice
+
+    # Równoległe identyczne zapytania (ten sam cache_key) czekają na jedno wywołanie AI
+    return await summary_flight.do(cache_key, generate_summary)
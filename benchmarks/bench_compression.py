@@ -0,0 +1,161 @@
+"""
+Kompresja conversation / ai_analysis w bazie (models.CompressedText) i kompresja odpowiedzi
+(services/response_compression.py): rozmiar bazy, bajty na stronę listy wpisów, koszt CPU.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_compression --entries 2000 --runs 100
+
+Rozmowy są składane z losowych zdań po polsku - słownik jest mały, więc realne transkrypty
+skompresują się trochę gorzej niż tutaj.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.bench_routers import CATEGORIES, random_text
+
+SENTENCES = [
+    "Czuję się dziś bardziej zmęczony niż zwykle.",
+    "Rozumiem, to brzmi jak naprawdę trudny dzień.",
+    "Co twoim zdaniem najbardziej wpłynęło na twój nastrój?",
+    "Chyba praca i za mało snu w tym tygodniu.",
+    "Spróbuj dziś wieczorem krótkiego spaceru bez telefonu.",
+    "Rano pokłóciłem się z bratem i cały dzień o tym myślałem.",
+    "Zapisz trzy rzeczy, które dziś poszły dobrze.",
+    "Dziękuję, trochę mi lżej po tej rozmowie.",
+]
+
+
+def conversation(rng: random.Random) -> str:
+    turns = []
+    for i in range(rng.randint(6, 30)):
+        speaker = "Użytkownik" if i % 2 == 0 else "Asystent"
+        turns.append(f"{speaker}: {rng.choice(SENTENCES)} {random_text(rng, rng.randint(3, 25))}")
+    return "\n".join(turns)
+
+
+def seed_rows(user_id, entries: int, rng: random.Random):
+    now = datetime.now()
+    return [
+        {
+            "owner_id": user_id,
+            "text": random_text(rng, rng.randint(5, 60)),
+            "mood_rating": float(rng.randint(1, 5)),
+            "category": rng.choice(CATEGORIES),
+            "ai_analysis": random_text(rng, rng.randint(30, 80)),
+            "conversation": conversation(rng),
+            "image_paths": "",
+            "date": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        }
+        for _ in range(entries)
+    ]
+
+
+def database_size(url: str, rows, compressed: bool) -> int:
+    """Rozmiar pliku SQLite po VACUUM przy zapisie jawnym albo skompresowanym."""
+    from sqlalchemy import create_engine, insert, text
+    from app import models
+
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    saved_min_chars = models.COMPRESSED_TEXT_MIN_CHARS
+    if not compressed:
+        # Próg ponad długość każdej wartości = zapis jawny, jak przed CompressedText
+        models.COMPRESSED_TEXT_MIN_CHARS = 10 ** 9
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(models.MoodEntry), rows)
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    finally:
+        models.COMPRESSED_TEXT_MIN_CHARS = saved_min_chars
+        engine.dispose()
+    return os.path.getsize(url.replace("sqlite:///", ""))
+
+
+def cpu_per_call(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.process_time()
+        fn()
+        samples.append(time.process_time() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_compression_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+
+    from app import database
+    if database.SQLALCHEMY_DATABASE_URL != db_url:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+    from sqlalchemy import insert
+    from app import models
+    from app.services import response_compression
+
+    rng = random.Random(args.seed)
+    user_id = uuid.uuid4()
+    rows = seed_rows(user_id, args.entries, rng)
+    avg_conversation = statistics.mean(len(row["conversation"]) for row in rows)
+    print(f"{args.entries} entries, average conversation {avg_conversation:.0f} chars")
+
+    # --- rozmiar bazy ---
+    plain_size = database_size(f"sqlite:///{os.path.join(tmp_dir, 'plain.db')}", rows, compressed=False)
+    packed_size = database_size(f"sqlite:///{os.path.join(tmp_dir, 'packed.db')}", rows, compressed=True)
+    print(f"DB size: plain {plain_size / 1024:8.0f} KiB   compressed {packed_size / 1024:8.0f} KiB"
+          f"   ({packed_size / plain_size:.0%})")
+
+    # --- CPU kompresji w kolumnie (na wartość) ---
+    column = models.CompressedText()
+    sample = max(rows, key=lambda row: len(row["conversation"]))["conversation"]
+    packed = column.process_bind_param(sample, None)
+    print(f"Column codec, longest conversation ({len(sample)} chars -> {len(packed)}): "
+          f"write {cpu_per_call(lambda: column.process_bind_param(sample, None), args.runs * 10) * 1e6:6.1f} us   "
+          f"read {cpu_per_call(lambda: column.process_result_value(packed, None), args.runs * 10) * 1e6:6.1f} us")
+
+    # --- bajty na stronę i CPU kompresji odpowiedzi ---
+    models.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": user_id, "email": "compression@example.com", "is_active": True}])
+        conn.execute(insert(models.MoodEntry), rows)
+
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    encodings = ["identity", "gzip"] + (["br"] if response_compression.brotli is not None else [])
+    with TestClient(app_main.app) as client:
+        url = f"/entries/{user_id}"
+        for fields in (None, "text,mood_rating,category"):
+            params = {"limit": args.limit, **({"fields": fields} if fields else {})}
+            label = f"fields={fields}" if fields else "all fields"
+            identity_cpu = None
+            for encoding in encodings:
+                # Bez dekodowania po stronie klienta - liczymy bajty z sieci
+                def fetch():
+                    with client.stream("GET", url, params=params, headers={"Accept-Encoding": encoding}) as response:
+                        return b"".join(response.iter_raw())
+                wire = len(fetch())
+                cpu = cpu_per_call(fetch, args.runs)
+                identity_cpu = identity_cpu or cpu
+                print(f"{label:<34} {encoding:<9} {wire / 1024:8.1f} KiB/page   cpu p50 {cpu * 1000:6.2f} ms"
+                      f"   (+{(cpu - identity_cpu) * 1000:5.2f} ms)")
+
+    print(f"Response compression threshold: {response_compression.RESPONSE_COMPRESS_MIN_SIZE} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Bajty i CPU na stronę listy wpisów: dawna ścieżka (obiekty ORM -> ręczny schemas.MoodEntry
+-> walidacja response_model -> JSON) kontra projekcja kolumn + orjson (GET /entries/{user_id}?fields=...).
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_entry_fields --entries 2000 --limit 100 --runs 200
+
+Wpisy mają realistyczne rozmiary: conversation ~300 słów, ai_analysis ~40 słów.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.bench_routers import CATEGORIES, random_text
+
+LIST_FIELDS = "text,mood_rating,category"
+
+
+def seed(entries: int, rng: random.Random) -> str:
+    from sqlalchemy import insert
+    from app import database, models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    user_id = uuid.uuid4()
+    now = datetime.now()
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": user_id, "email": "fields@example.com", "is_active": True}])
+        conn.execute(insert(models.MoodEntry), [
+            {
+                "owner_id": user_id,
+                "text": random_text(rng, rng.randint(5, 60)),
+                "mood_rating": float(rng.randint(1, 5)),
+                "category": rng.choice(CATEGORIES),
+                "ai_analysis": random_text(rng, 40),
+                "conversation": random_text(rng, 300),
+                "image_paths": "",
+                "date": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            }
+            for _ in range(entries)
+        ])
+    return str(user_id)
+
+
+def legacy_page(db, user_id: str, limit: int) -> bytes:
+    """Odtworzenie read_entries sprzed projekcji."""
+    from pydantic import TypeAdapter
+    from app import models, schemas
+
+    entries = db.query(models.MoodEntry)\
+        .filter(models.MoodEntry.owner_id == user_id)\
+        .order_by(models.MoodEntry.date.desc(), models.MoodEntry.id.desc())\
+        .limit(limit + 1).all()[:limit]
+    results = [
+        schemas.MoodEntry(
+            id=entry.id,
+            date=entry.date,
+            text=entry.text if entry.text is not None else "",
+            mood_rating=entry.mood_rating if entry.mood_rating is not None else 0.0,
+            category=entry.category if entry.category is not None else "Nieznane",
+            ai_analysis=entry.ai_analysis,
+            conversation=entry.conversation,
+            image_paths=entry.image_paths.split("|") if entry.image_paths else [],
+            owner_id=entry.owner_id
+        )
+        for entry in entries
+    ]
+    # response_model: FastAPI waliduje wynik jeszcze raz i serializuje
+    adapter = TypeAdapter(List[schemas.MoodEntry])
+    return adapter.dump_json(adapter.validate_python([r.model_dump() for r in results]))
+
+
+def measure(db, page, runs: int):
+    cpu, sizes = [], []
+    for _ in range(runs):
+        db.expire_all()
+        started = time.process_time()
+        body = page()
+        cpu.append(time.process_time() - started)
+        sizes.append(len(body))
+    return cpu, sizes[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_fields_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+
+    from app import database
+    if database.SQLALCHEMY_DATABASE_URL != db_url:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+    from app.routers.entries import read_entries
+
+    user_id = seed(args.entries, random.Random(args.seed))
+    print(f"Seeded {args.entries} entries ({db_url}), page size {args.limit}")
+
+    db = database.SessionLocal()
+    results = {}
+    try:
+        results["legacy (ORM + 2x pydantic)"] = measure(db, lambda: legacy_page(db, user_id, args.limit), args.runs)
+        # Nowa ścieżka: ta sama funkcja co endpoint, bez narzutu klienta HTTP
+        for name, fields in (("all fields + orjson", None), (f"fields={LIST_FIELDS}", LIST_FIELDS)):
+            results[name] = measure(
+                db, lambda: read_entries(user_id, limit=args.limit, cursor=None, fields=fields, db=db).body, args.runs
+            )
+    finally:
+        db.close()
+
+    baseline_cpu = statistics.median(results["legacy (ORM + 2x pydantic)"][0])
+    for name, (cpu, size) in results.items():
+        median_ms = statistics.median(cpu) * 1000
+        print(f"{name:<40} {size / 1024:8.1f} KiB/page   cpu p50 {median_ms:7.2f} ms"
+              f"   ({baseline_cpu * 1000 / median_ms:4.1f}x vs legacy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Eksport konta (GET /users/{user_id}/export): wpisy na sekundę i szczytowa pamięć
+dla NDJSON i zip, przy różnej liczbie wpisów - pamięć nie powinna rosnąć z liczbą wpisów.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_export --entries 50000
+
+Wpisy jak w bench_compression: rozmowy składane z polskich zdań, zapisane skompresowane
+(dekompresja to większość kosztu). --short: wpisy bez rozmowy i analizy AI.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--short", action="store_true", help="wpisy bez rozmowy i analizy AI")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_export_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+
+    from app import database
+    if database.SQLALCHEMY_DATABASE_URL != db_url:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+    from sqlalchemy import insert
+    from app import models
+    from app.services import account_export
+    from benchmarks.bench_compression import seed_rows
+
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(args.seed)
+    user_id = uuid.uuid4()
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": user_id, "email": "export@example.com", "is_active": True}])
+        for start in range(0, args.entries, 5000):
+            rows = seed_rows(user_id, min(5000, args.entries - start), rng)
+            if args.short:
+                for row in rows:
+                    row["conversation"] = row["ai_analysis"] = ""
+            conn.execute(insert(models.MoodEntry), rows)
+    print(f"{args.entries} entries seeded")
+
+    db = database.SessionLocal()
+    last_id = account_export.until_id(db, str(user_id), None)
+    db.close()
+
+    for label, stream in (("ndjson", account_export.stream_ndjson), ("zip", account_export.stream_zip)):
+        for count in sorted({args.entries // 10, args.entries}):
+            # Zakres id = pierwsze count wpisów
+            bound = last_id - args.entries + count
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in stream(str(user_id), 0, bound))
+            elapsed = time.perf_counter() - started
+            # Pamięć w osobnym przebiegu - tracemalloc spowalnia każdą alokację
+            tracemalloc.start()
+            for _ in stream(str(user_id), 0, bound):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:<7} {count:>8} entries   {count / elapsed:>9.0f} entries/s   "
+                  f"{size / 1024 / 1024:8.1f} MiB out   peak {peak / 1024 / 1024:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
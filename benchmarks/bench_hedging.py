@@ -0,0 +1,82 @@
+"""
+Opóźnienia hedged fallbacku przy zdegradowanych modelach.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_hedging --degraded 3 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+import httpx
+
+from app.services import llm_client as llm_module
+from app.services.model_fallback import hedged_chat_completion
+from app.services.llm_client import LLMError
+from app.services.model_registry import model_registry
+
+MODELS = [
+    "mistralai/mistral-small-3.1-24b-instruct:free",
+    "google/gemini-2.0-flash-exp:free",
+    "meta-llama/llama-3.2-11b-vision-instruct:free",
+    "microsoft/phi-3-mini-128k-instruct:free"
+]
+
+
+def make_upstream(degraded: int):
+    slow_models = set(MODELS[:degraded])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        if model in slow_models:
+            # Zdegradowany model: połowa zapytań wisi, połowa kończy się 429
+            if random.random() < 0.5:
+                await asyncio.sleep(60)
+            return httpx.Response(429, json={"error": "rate limited"})
+        await asyncio.sleep(random.uniform(0.2, 0.8))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    return handler
+
+
+async def run(degraded: int, total: int, deadline: float):
+    llm_module.llm_client.transport = httpx.MockTransport(make_upstream(degraded))
+    await llm_module.llm_client.start()
+
+    async def one():
+        started = time.perf_counter()
+        try:
+            await hedged_chat_completion(MODELS, [{"role": "user", "content": "hi"}], deadline=deadline)
+            ok = True
+        except LLMError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    results = await asyncio.gather(*[one() for _ in range(total)])
+    await llm_module.llm_client.close()
+
+    latencies = sorted(r[0] for r in results)
+    ok = sum(1 for r in results if r[1])
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    print(f"Degraded models: {degraded}/{len(MODELS)}, deadline {deadline}s")
+    print(f"Answered:        {ok}/{total}")
+    print(f"p50: {pct(0.5):.2f}s  p95: {pct(0.95):.2f}s  p99: {pct(0.99):.2f}s  max: {latencies[-1]:.2f}s")
+    for row in model_registry.scoreboard():
+        print(f"  {row['model']:<48} {row['state']:<9} ok={row['successes']} fail={row['failures']} 429={row['rate_limited']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--degraded", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--deadline", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.degraded, args.requests, args.deadline))
@@ -0,0 +1,98 @@
+"""
+Import historii wpisów (POST /entries/{user_id}/import) kontra dawna droga: jeden
+POST /entries/{user_id} (commit + agregaty) na wpis. Wpisy na sekundę dla CSV i NDJSON.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_import --entries 20000 --single 500
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+
+from benchmarks.bench_routers import CATEGORIES, random_text
+
+
+def history(entries: int, rng: random.Random):
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            "client_id": uuid.uuid4().hex,
+            "date": (start + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 4))).isoformat(),
+            "text": random_text(rng, rng.randint(5, 60)),
+            "mood_rating": float(rng.randint(1, 5)),
+            "category": rng.choice(CATEGORIES)
+        }
+        for _ in range(entries)
+    ]
+
+
+def as_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def as_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def new_user(database, models) -> str:
+    user_id = uuid.uuid4()
+    db = database.SessionLocal()
+    db.add(models.User(id=user_id, email=f"{user_id.hex}@example.com", is_active=True))
+    db.commit()
+    db.close()
+    return str(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--single", type=int, default=500, help="ile wpisów przez POST /entries pojedynczo")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_import_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+
+    from app import database
+    if database.SQLALCHEMY_DATABASE_URL != db_url:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+    from fastapi.testclient import TestClient
+    from app import models
+    import main as app_main
+
+    rows = history(args.entries, random.Random(args.seed))
+    with TestClient(app_main.app) as client:
+        user_id = new_user(database, models)
+        started = time.perf_counter()
+        for row in rows[:args.single]:
+            client.post(f"/entries/{user_id}", json=row).raise_for_status()
+        elapsed = time.perf_counter() - started
+        print(f"{'POST /entries (one per row)':<30} {args.single:>7} entries   {args.single / elapsed:>8.0f} entries/s")
+
+        for label, payload, filename in (("csv", as_csv(rows), "history.csv"), ("ndjson", as_ndjson(rows), "history.ndjson")):
+            user_id = new_user(database, models)
+            started = time.perf_counter()
+            response = client.post(f"/entries/{user_id}/import", files={"file": (filename, payload)})
+            elapsed = time.perf_counter() - started
+            summary = orjson.loads(response.text.splitlines()[-1])
+            assert summary["imported"] == args.entries, summary
+            print(f"{'import ' + label:<30} {args.entries:>7} entries   {args.entries / elapsed:>8.0f} entries/s"
+                  f"   ({len(payload) / 1024 / 1024:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
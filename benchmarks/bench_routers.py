@@ -0,0 +1,317 @@
+"""
+Benchmark wszystkich routerów na zasianej bazie SQLite, z atrapami OpenRouter i Supabase.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_routers --users 200 --entries 200 --requests 300 --concurrency 20
+    python -m benchmarks.bench_routers --json after.json --compare before.json
+    python -m benchmarks.bench_routers --only entries.list,ai.weekly_summary.hit
+
+Atrapy (benchmarks/fake_upstreams.py) startują jako osobne procesy uvicorn na wolnych portach,
+a aplikacja jest kierowana na nie przez OPENROUTER_BASE_URL / SUPABASE_URL.
+Wynik: przepustowość i p50/p95/p99 dla każdego scenariusza.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Radość", "Spokój", "Smutek", "Złość", "Lęk", "Zmęczenie"]
+WORDS = ("dzisiaj praca spacer zmęczony spokojnie rodzina sen trening kawa deszcz "
+         "stres rozmowa przyjaciele książka muzyka wieczór tired work happy calm").split()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake(service: str, port: int, latency_ms: float, error_rate: float, rate_limit_rate: float):
+    proc = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_upstreams", service,
+        "--port", str(port),
+        "--latency-ms", str(latency_ms),
+        "--error-rate", str(error_rate),
+        "--rate-limit-rate", str(rate_limit_rate)
+    ])
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"Fake {service} did not start on port {port}")
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(users: int, entries_per_user: int, rng: random.Random):
+    from sqlalchemy import insert
+    from app import database, models
+    from app.services import mood_rollup
+    from benchmarks.fake_upstreams import fake_user_id
+
+    models.Base.metadata.create_all(bind=database.engine)
+    now = datetime.now()
+    user_ids = []
+    with database.engine.begin() as conn:
+        user_rows = []
+        for i in range(users):
+            email = f"bench{i}@example.com"
+            user_id = uuid.UUID(fake_user_id(email))
+            user_ids.append(str(user_id))
+            user_rows.append({"id": user_id, "email": email, "username": f"bench{i}", "is_active": True})
+        conn.execute(insert(models.User), user_rows)
+
+        batch = []
+        for user_id in user_ids:
+            owner = uuid.UUID(user_id)
+            for _ in range(entries_per_user):
+                batch.append({
+                    "owner_id": owner,
+                    "text": random_text(rng, rng.randint(5, 60)),
+                    "mood_rating": float(rng.randint(1, 5)),
+                    "category": rng.choice(CATEGORIES),
+                    "ai_analysis": random_text(rng, 40),
+                    "conversation": random_text(rng, 300),
+                    "image_paths": "",
+                    "date": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+                })
+                if len(batch) >= 5000:
+                    conn.execute(insert(models.MoodEntry), batch)
+                    batch = []
+        if batch:
+            conn.execute(insert(models.MoodEntry), batch)
+
+        conn.execute(insert(models.SobrietyClock), [
+            {"user_id": uuid.UUID(user_id), "addiction_type": "alcohol", "custom_name": "",
+             "start_date": now - timedelta(days=rng.randint(1, 400))}
+            for user_id in user_ids
+        ])
+
+    db = database.SessionLocal()
+    try:
+        mood_rollup.rebuild(db)
+    finally:
+        db.close()
+    return user_ids
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_scenario(client, name, make_request, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        method, url, body = make_request(i)
+        async with semaphore:
+            started = time.perf_counter()
+            resp = await client.request(method, url, json=body)
+            if resp.headers.get("content-type", "").startswith("text/event-stream"):
+                await resp.aread()
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def deep_cursors(user_ids, depth: int):
+    """Kursor keyset wskazujący na wpis nr `depth` każdego usera (jak skip=depth)."""
+    from app import database, models
+    from app.services.pagination import encode_cursor
+
+    cursors = {}
+    db = database.SessionLocal()
+    try:
+        for user_id in user_ids:
+            row = db.query(models.MoodEntry.date, models.MoodEntry.id)\
+                .filter(models.MoodEntry.owner_id == user_id)\
+                .order_by(models.MoodEntry.date.desc(), models.MoodEntry.id.desc())\
+                .offset(depth - 1)\
+                .first()
+            cursors[user_id] = encode_cursor(row.date, row.id) if row else None
+    finally:
+        db.close()
+    return cursors
+
+
+def build_scenarios(user_ids, entries_per_user: int, rng: random.Random):
+    created = []  # wpisy utworzone specjalnie dla entries.delete
+    summary_langs = ["pl", "en"]
+    # Głęboka strona: offset vs kursor na tej samej głębokości
+    depth = max(1, min(1000, entries_per_user - 100))
+    cursors = deep_cursors(user_ids, depth)
+
+    def pick_user():
+        return rng.choice(user_ids)
+
+    scenarios = [
+        ("entries.list", lambda i: ("GET", f"/entries/{pick_user()}?limit=100", None)),
+        ("entries.list.deep", lambda i: ("GET", f"/entries/{pick_user()}?skip={depth}&limit=100", None)),
+        ("entries.list.deep_cursor", lambda i: (lambda user_id: (
+            "GET", f"/entries/{user_id}?cursor={cursors[user_id]}&limit=100", None
+        ))(pick_user())),
+        ("entries.create", lambda i: ("POST", f"/entries/{pick_user()}", {
+            "text": random_text(rng, 20), "mood_rating": rng.randint(1, 5),
+            "category": rng.choice(CATEGORIES), "image_paths": []
+        })),
+        # Synchronizacja offline: paczka 50 wpisów z kluczami idempotencji
+        ("entries.bulk", lambda i: ("POST", f"/entries/{pick_user()}/bulk", {"entries": [
+            {"text": random_text(rng, 20), "mood_rating": rng.randint(1, 5), "category": rng.choice(CATEGORIES),
+             "client_id": uuid.uuid4().hex}
+            for _ in range(50)
+        ]})),
+        ("entries.update", lambda i: ("PUT", f"/entries/{rng.randint(1, len(user_ids) * entries_per_user)}", {
+            "text": random_text(rng, 20), "mood_rating": 3, "category": CATEGORIES[0],
+            "image_paths": [], "conversation": random_text(rng, 300)
+        })),
+        ("entries.delete", lambda i: ("DELETE", f"/entries/{created.pop() if created else 0}", None)),
+        # Pierwsze wywołanie dla (user, język) to miss, kolejne trafiają w cache
+        ("ai.weekly_summary.miss", lambda i: ("POST", f"/ai/weekly_summary/{user_ids[i % len(user_ids)]}",
+                                              {"lang": summary_langs[(i // len(user_ids)) % 2]})),
+        ("ai.weekly_summary.hit", lambda i: ("POST", f"/ai/weekly_summary/{user_ids[i % len(user_ids)]}",
+                                             {"lang": summary_langs[(i // len(user_ids)) % 2]})),
+        ("ai.analyze_mood", lambda i: ("POST", "/ai/analyze_mood", {"text": random_text(rng, 15), "stream": False})),
+        ("ai.analyze_mood.stream", lambda i: ("POST", "/ai/analyze_mood", {"text": random_text(rng, 15)})),
+        ("users.get", lambda i: ("GET", f"/users/{pick_user()}", None)),
+        ("users.update", lambda i: ("PUT", f"/users/{pick_user()}", {"is_dark_mode": bool(i % 2)})),
+        ("sobriety.list", lambda i: ("GET", f"/sobriety/clocks/{pick_user()}", None)),
+        ("sobriety.create", lambda i: ("POST", "/sobriety/clocks", {
+            "user_id": pick_user(), "addiction_type": "nicotine", "start_date": datetime.now().isoformat()
+        })),
+        ("auth.login", lambda i: ("POST", "/auth/login", {
+            "email": f"bench{rng.randrange(len(user_ids))}@example.com", "username": "", "password": "bench-pass"
+        })),
+        ("auth.register", lambda i: ("POST", "/auth/register", {
+            "email": f"new-{uuid.uuid4().hex[:10]}@example.com", "username": "new", "password": "bench-pass"
+        })),
+    ]
+    return scenarios, created
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+
+    print(f"Seeding {args.users} users x {args.entries} entries...")
+    started = time.perf_counter()
+    user_ids = seed(args.users, args.entries, rng)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    import httpx
+    import main
+
+    scenarios, created = build_scenarios(user_ids, args.entries, rng)
+    only = set(args.only.split(",")) if args.only else None
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, make_request in scenarios:
+                if only and name not in only:
+                    continue
+                if name == "entries.delete":
+                    # Usuwamy wpisy utworzone poza pomiarem, żeby nie zubożyć zasianych danych
+                    for _ in range(args.requests):
+                        resp = await client.post(f"/entries/{user_ids[0]}", json={
+                            "text": "do usunięcia", "mood_rating": 3, "category": CATEGORIES[0]
+                        })
+                        created.append(resp.json()["id"])
+                results[name] = await run_scenario(client, name, make_request, args.requests, args.concurrency)
+                row = results[name]
+                print(f"{name:<26} {row['throughput_rps']:>9.1f} rps  p50 {row['p50_ms']:>8.2f} ms  "
+                      f"p95 {row['p95_ms']:>8.2f} ms  p99 {row['p99_ms']:>8.2f} ms  errors {row['errors']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            before = json.load(f)["results"]
+        print("\nComparison (before -> after):")
+        for name, row in results.items():
+            if name not in before:
+                continue
+            old = before[name]
+            print(f"{name:<26} rps {old['throughput_rps']:>8.1f} -> {row['throughput_rps']:>8.1f}   "
+                  f"p99 {old['p99_ms']:>8.2f} -> {row['p99_ms']:>8.2f} ms")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--entries", type=int, default=200, help="entries per user")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--auth-latency-ms", type=float, default=30)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous --json output to compare against")
+    args = parser.parse_args()
+
+    # Baza tymczasowa i atrapy muszą być ustawione przed importem aplikacji
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_bench_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    openrouter_port, supabase_port = free_port(), free_port()
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+    os.environ["OPENROUTER_API_KEY"] = "bench"
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{openrouter_port}/api/v1"
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{supabase_port}"
+    os.environ["SUPABASE_KEY"] = "fake.fake.fake"
+
+    from app import database
+    # database.py wczytuje .env z override=True - nie pozwalamy zasiać prawdziwej bazy
+    if database.SQLALCHEMY_DATABASE_URL != db_url or database.SUPABASE_URL != os.environ["SUPABASE_URL"]:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL/SUPABASE_URL. Run without a .env file.")
+
+    fakes = [
+        start_fake("openrouter", openrouter_port, args.llm_latency_ms, args.llm_error_rate, args.llm_rate_limit_rate),
+        start_fake("supabase", supabase_port, args.auth_latency_ms, 0.0, 0.0),
+    ]
+    try:
+        asyncio.run(run(args))
+    finally:
+        for proc in fakes:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+"""
+Czas liczenia /ai/trends/{user_id} dla usera z dużą historią (domyślnie 10k wpisów, ~3 lata).
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.bench_trends --entries 10000 --runs 50
+
+Mierzymy osobno: zimny wynik (zapytania + NumPy), sam pipeline NumPy
+i trafienie w cache. Cel: zimny p95 < 50 ms przy 10k wpisów.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Radość", "Spokój", "Smutek", "Złość", "Lęk", "Zmęczenie"]
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def report(name: str, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<28} p50 {statistics.median(ms):7.2f} ms   p95 {percentile(ms, 0.95):7.2f} ms   max {max(ms):7.2f} ms")
+
+
+def seed(entries: int, days: int, rng: random.Random) -> str:
+    from sqlalchemy import insert
+    from app import database, models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    user_id = uuid.uuid4()
+    now = datetime.now()
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{"id": user_id, "email": "trends@example.com", "is_active": True}])
+        conn.execute(insert(models.MoodEntry), [
+            {
+                "owner_id": user_id,
+                "text": "bench",
+                "mood_rating": float(rng.randint(1, 5)),
+                "category": rng.choice(CATEGORIES),
+                "ai_analysis": "",
+                "conversation": "",
+                "image_paths": "",
+                "date": now - timedelta(minutes=rng.randint(0, 60 * 24 * days))
+            }
+            for _ in range(entries)
+        ])
+    return str(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="mindguide_trends_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db_url
+
+    from app import database
+    if database.SQLALCHEMY_DATABASE_URL != db_url:
+        sys.exit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+    from app.services import user_version
+    from app.services.mood_trends import load_columns, compute_trends, mood_trends
+
+    user_id = seed(args.entries, args.days, random.Random(args.seed))
+    print(f"Seeded {args.entries} entries over {args.days} days ({db_url})")
+
+    cold, pipeline, warm = [], [], []
+    db = database.SessionLocal()
+    try:
+        result = mood_trends(db, user_id, None, None)
+        print(f"Period: {result['period']['days']} days, streaks {result['streaks']}, "
+              f"best weekday {result['weekdays']['best']}")
+
+        for _ in range(args.runs):
+            # Nowa wersja danych usera = chybienie w cache, jak po zapisie wpisu
+            user_version.bump(db, user_id)
+            db.commit()
+            started = time.perf_counter()
+            mood_trends(db, user_id, None, None)
+            cold.append(time.perf_counter() - started)
+
+        columns = load_columns(db, user_id, None, None)
+        first_day, last_day = columns["days"][0].astype(object), datetime.now().date()
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            compute_trends(columns, first_day, last_day, 7)
+            pipeline.append(time.perf_counter() - started)
+
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            mood_trends(db, user_id, None, None)
+            warm.append(time.perf_counter() - started)
+    finally:
+        db.close()
+
+    report("cold (queries + numpy)", cold)
+    report("numpy pipeline only", pipeline)
+    report("cache hit", warm)
+    print(f"Cold p95 {'OK' if percentile(cold, 0.95) < 0.05 else 'ABOVE'} 50 ms target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Lokalne atrapy OpenRouter i Supabase Auth do testów obciążeniowych (bez sieci).
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.fake_upstreams openrouter --port 8101 --latency-ms 800 --error-rate 0.05 --rate-limit-rate 0.1
+    python -m benchmarks.fake_upstreams supabase --port 8102 --latency-ms 50
+
+Aplikację kierujemy na atrapy zmiennymi środowiskowymi:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8101/api/v1
+    SUPABASE_URL=http://127.0.0.1:8102
+    SUPABASE_KEY=fake.fake.fake
+
+Parametry można też podać przez env: FAKE_LATENCY_MS, FAKE_JITTER_MS, FAKE_ERROR_RATE, FAKE_RATE_LIMIT_RATE.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class FaultConfig:
+    def __init__(self):
+        self.latency_ms = float(os.getenv("FAKE_LATENCY_MS", "500"))
+        self.jitter_ms = float(os.getenv("FAKE_JITTER_MS", "200"))
+        self.error_rate = float(os.getenv("FAKE_ERROR_RATE", "0"))
+        self.rate_limit_rate = float(os.getenv("FAKE_RATE_LIMIT_RATE", "0"))
+
+    def delay(self) -> float:
+        return max(0.0, (self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def fault(self):
+        """None albo odpowiedź z błędem (429 / 503) wg skonfigurowanych częstości."""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return JSONResponse(status_code=429, content={"error": {"message": "Rate limit exceeded", "code": 429}})
+        if roll < self.rate_limit_rate + self.error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "Upstream unavailable", "code": 503}})
+        return None
+
+
+# --- OpenRouter ---
+
+openrouter_config = FaultConfig()
+openrouter_app = FastAPI()
+
+FAKE_ANSWER = "Widzę, że ostatnio masz sporo na głowie. Spróbuj dziś krótkiego spaceru i wcześniejszego snu."
+
+
+@openrouter_app.post("/api/v1/chat/completions")
+async def fake_chat_completions(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "fake")
+
+    fault = openrouter_config.fault()
+    if fault is not None:
+        await asyncio.sleep(openrouter_config.delay() / 4)
+        return fault
+
+    if payload.get("stream"):
+        async def token_stream():
+            yield ": OPENROUTER PROCESSING\n\n"
+            words = FAKE_ANSWER.split(" ")
+            # Pierwszy token po ~1/4 opóźnienia, reszta równomiernie
+            total = openrouter_config.delay()
+            await asyncio.sleep(total / 4)
+            for i, word in enumerate(words):
+                chunk = {"model": model, "choices": [{"delta": {"content": word + (" " if i < len(words) - 1 else "")}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(total * 3 / 4 / len(words))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(token_stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(openrouter_config.delay())
+    return {
+        "id": f"gen-{uuid.uuid4().hex[:12]}",
+        "model": model,
+        "choices": [{"message": {"role": "assistant", "content": FAKE_ANSWER}}]
+    }
+
+
+# --- Supabase Auth (GoTrue) ---
+
+supabase_config = FaultConfig()
+supabase_config.latency_ms = float(os.getenv("FAKE_LATENCY_MS", "50"))
+supabase_config.jitter_ms = float(os.getenv("FAKE_JITTER_MS", "20"))
+supabase_app = FastAPI()
+
+
+def fake_user_id(email: str) -> str:
+    # Deterministyczne ID - benchmark może zasiać lokalne profile z tymi samymi UUID
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"mindguide-fake:{email}"))
+
+
+def fake_user(email: str, metadata: dict = None) -> dict:
+    return {
+        "id": fake_user_id(email),
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": email,
+        "app_metadata": {"provider": "email"},
+        "user_metadata": metadata or {},
+        "created_at": "2024-01-01T00:00:00Z"
+    }
+
+
+def fake_session(email: str) -> dict:
+    return {
+        "access_token": f"fake-access-{uuid.uuid4().hex}",
+        "refresh_token": f"fake-refresh-{uuid.uuid4().hex}",
+        "token_type": "bearer",
+        "expires_in": 3600,
+        "expires_at": int(time.time()) + 3600,
+        "user": fake_user(email)
+    }
+
+
+async def supabase_fault():
+    await asyncio.sleep(supabase_config.delay())
+    return supabase_config.fault()
+
+
+@supabase_app.post("/auth/v1/signup")
+async def fake_signup(request: Request):
+    payload = await request.json()
+    fault = await supabase_fault()
+    if fault is not None:
+        return fault
+    # Jak przy włączonym potwierdzaniu e-maila: sam user, bez sesji
+    return fake_user(payload["email"], payload.get("data"))
+
+
+@supabase_app.post("/auth/v1/token")
+async def fake_token(request: Request):
+    payload = await request.json()
+    fault = await supabase_fault()
+    if fault is not None:
+        return fault
+    if not payload.get("password"):
+        return JSONResponse(status_code=400, content={"error": "invalid_grant", "error_description": "Invalid login credentials"})
+    return fake_session(payload["email"])
+
+
+@supabase_app.post("/auth/v1/recover")
+async def fake_recover():
+    fault = await supabase_fault()
+    if fault is not None:
+        return fault
+    return {}
+
+
+@supabase_app.post("/auth/v1/logout")
+async def fake_logout():
+    return Response(status_code=204)
+
+
+APPS = {
+    "openrouter": (openrouter_app, openrouter_config),
+    "supabase": (supabase_app, supabase_config),
+}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("service", choices=sorted(APPS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    args = parser.parse_args()
+
+    app, config = APPS[args.service]
+    if args.latency_ms is not None:
+        config.latency_ms = args.latency_ms
+    if args.jitter_ms is not None:
+        config.jitter_ms = args.jitter_ms
+    if args.error_rate is not None:
+        config.error_rate = args.error_rate
+    if args.rate_limit_rate is not None:
+        config.rate_limit_rate = args.rate_limit_rate
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,115 @@
+"""
+Test obciążeniowy: czy pętla zdarzeń zostaje responsywna,
+gdy wiele /ai/weekly_summary czeka na (wolny) model.
+
+Uruchomienie (z katalogu głównego repo):
+    python -m benchmarks.load_test_ai --requests 200 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Baza tymczasowa i klucz muszą być ustawione przed importem aplikacji
+_tmp_dir = tempfile.mkdtemp(prefix="mindguide_load_")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'load.db')}"
+os.environ.setdefault("OPENROUTER_API_KEY", "load-test")
+
+import httpx
+
+from app import database, models
+from app.services import llm_client as llm_module
+
+# database.py wczytuje .env z override=True - nie pozwalamy zasiać prawdziwej bazy
+if database.SQLALCHEMY_DATABASE_URL != os.environ["SQLALCHEMY_DATABASE_URL"]:
+    raise SystemExit("Refusing to run: .env overrides SQLALCHEMY_DATABASE_URL. Run without a .env file.")
+
+UPSTREAM_LATENCY = 1.0
+
+
+async def fake_openrouter(request: httpx.Request) -> httpx.Response:
+    # Symulacja wolnego modelu - czekamy asynchronicznie jak prawdziwy upstream
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "Odpoczywaj więcej."}}]
+    })
+
+
+def seed_users(count: int):
+    db = database.SessionLocal()
+    user_ids = []
+    now = datetime.now()
+    for i in range(count):
+        user_id = uuid.uuid4()
+        db.add(models.User(id=user_id, email=f"load{i}@example.com", username=f"load{i}"))
+        for d in range(5):
+            db.add(models.MoodEntry(
+                owner_id=user_id,
+                text="wpis testowy",
+                mood_rating=3.0 + (d % 3),
+                category="Spokój",
+                date=now - timedelta(days=d)
+            ))
+        user_ids.append(str(user_id))
+    db.commit()
+    db.close()
+    return user_ids
+
+
+async def monitor_loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.01):
+    # Mierzymy o ile spóźnia się sleep(interval) - to jest opóźnienie pętli zdarzeń
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run(total: int, latency: float):
+    global UPSTREAM_LATENCY
+    UPSTREAM_LATENCY = latency
+
+    import main  # tworzy tabele w bazie tymczasowej
+
+    user_ids = seed_users(total)
+
+    llm_module.llm_client.transport = httpx.MockTransport(fake_openrouter)
+    await llm_module.llm_client.start()
+
+    lag_samples = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post(f"/ai/weekly_summary/{user_id}") for user_id in user_ids
+        ])
+        elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    await llm_module.llm_client.close()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    lag_sorted = sorted(lag_samples) or [0.0]
+    p99 = lag_sorted[min(len(lag_sorted) - 1, int(len(lag_sorted) * 0.99))]
+
+    print(f"Requests:           {total} (ok: {ok})")
+    print(f"Upstream latency:   {latency:.2f}s")
+    print(f"Wall time:          {elapsed:.2f}s (serial would be ~{total * latency:.0f}s)")
+    print(f"Event loop lag p50: {statistics.median(lag_sorted) * 1000:.1f} ms")
+    print(f"Event loop lag p99: {p99 * 1000:.1f} ms")
+    print(f"Event loop lag max: {lag_sorted[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.latency))
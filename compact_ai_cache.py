@@ -0,0 +1,19 @@
+from app import database
+from app.services import cache_compaction
+
+# Jednorazowe sprzątanie ai_analysis_cache (to samo robi co godzinę CacheCompactor w API).
+# Użycie: python compact_ai_cache.py
+
+def compact():
+    db = database.SessionLocal()
+    try:
+        before = cache_compaction.table_size(db)
+        deleted = cache_compaction.compact(db)
+        after = cache_compaction.table_size(db)
+        print(f"Deleted: {deleted}")
+        print(f"ai_analysis_cache rows: {before['rows']} -> {after['rows']}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    compact()
@@ -0,0 +1,45 @@
+from app import database, models
+from sqlalchemy import bindparam, text
+
+# Kompresja istniejących wpisów (conversation, ai_analysis) - patrz models.CompressedText.
+# Nie jest wymagana: stare, jawne wiersze czytają się normalnie, a nowe zapisy są już kompresowane.
+# Można uruchomić ponownie - pomija wartości już skompresowane i krótkie.
+
+BATCH_SIZE = 500
+
+def migrate():
+    print("Compressing mood_entries.conversation / ai_analysis...")
+    marker = models.COMPRESSED_TEXT_MARKER
+    min_chars = models.COMPRESSED_TEXT_MIN_CHARS
+    table = models.MoodEntry.__table__
+    # UPDATE przez typ kolumny (CompressedText) - kompresja przy bindowaniu
+    update = table.update()\
+        .where(table.c.id == bindparam("entry_id"))\
+        .values(conversation=bindparam("conversation"), ai_analysis=bindparam("ai_analysis"))
+    last_id, total = 0, 0
+    with database.engine.connect() as conn:
+        while True:
+            # Surowe wartości z bazy, bez rozpakowywania
+            rows = conn.execute(text(
+                "SELECT id, conversation, ai_analysis FROM mood_entries WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            pending = [
+                {"entry_id": entry_id, "conversation": conversation, "ai_analysis": ai_analysis}
+                for entry_id, conversation, ai_analysis in rows
+                if any(value and len(value) >= min_chars and not value.startswith(marker)
+                       for value in (conversation, ai_analysis))
+            ]
+            if pending:
+                conn.execute(update, pending)
+                conn.commit()
+                total += len(pending)
+                print(f"Compressed {total} entries...")
+    print(f"Done: {total} entries compressed")
+    if database.engine.dialect.name == "sqlite":
+        print("Run VACUUM to return freed pages to the filesystem.")
+
+if __name__ == "__main__":
+    migrate()
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -6,7 +7,14 @@ import os
 load_dotenv()
 
 from app import models, database
-from app.routers import auth, entries, ai, users, sobriety
+from app.routers import auth, entries, ai, users, sobriety, sync, images
+from app.services.llm_client import llm_client
+from app.services import mood_rollup, entry_search
+from app.services.summary_scheduler import summary_scheduler, SUMMARY_PREGEN_ENABLED
+from app.services.job_queue import job_pool
+from app.services.cache_compaction import cache_compactor, AI_CACHE_COMPACT_ENABLED
+from app.services.response_compression import CompressionMiddleware
+from app.services.image_store import image_pipeline
 
 # import add_email_columns # Auto-run migration
 # add_email_columns.migrate()
@@ -16,7 +24,37 @@ from app.routers import auth, entries, ai, users, sobriety
 
 models.Base.metadata.create_all(bind=database.engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Wspólna pula połączeń HTTP do OpenRouter na cały czas życia procesu
+    await llm_client.start()
+    # Pierwszy start po dodaniu daily_mood_rollup: wypełniamy agregaty z istniejących wpisów
+    db = database.SessionLocal()
+    try:
+        mood_rollup.ensure_populated(db)
+        # Indeks wyszukiwania wpisów (FTS5 w SQLite; w Postgres search_text + GIN)
+        entry_search.ensure_index(db)
+    finally:
+        db.close()
+    # Podsumowania AI generowane z wyprzedzeniem poza godzinami szczytu (SUMMARY_PREGEN_*)
+    if SUMMARY_PREGEN_ENABLED:
+        summary_scheduler.start()
+    # Workery kolejki zadań AI (AI_JOB_WORKERS); zadania z poprzedniego procesu zostały w ai_jobs
+    if job_pool.workers > 0:
+        job_pool.start()
+    # Sprzątanie ai_analysis_cache (TTL + nadpisane wersje) co AI_CACHE_COMPACT_INTERVAL
+    if AI_CACHE_COMPACT_ENABLED:
+        cache_compactor.start()
+    # Miniatury zdjęć w puli procesów (IMAGE_WORKERS); zaległe "pending" wracają do kolejki
+    await image_pipeline.start()
+    yield
+    await image_pipeline.stop()
+    await cache_compactor.stop()
+    await job_pool.stop()
+    await summary_scheduler.stop()
+    await llm_client.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 
@@ -26,14 +64,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Kursor następnej strony listy wpisów (GET /entries/{user_id}) i ETag dla warunkowych GET
+    expose_headers=["X-Next-Cursor", "ETag", "X-Export-Until-Id", "Content-Disposition"],
 )
 
+# br / gzip według Accept-Encoding, od RESPONSE_COMPRESS_MIN_SIZE bajtów
+app.add_middleware(CompressionMiddleware)
+
 app.include_router(auth.router)
 app.include_router(entries.router)
 app.include_router(ai.router)
 # Rejestracja nowego routera
 app.include_router(users.router)
 app.include_router(sobriety.router)
+app.include_router(sync.router)
+app.include_router(images.router)
 
 @app.get("/")
 def read_root():
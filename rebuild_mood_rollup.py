@@ -0,0 +1,19 @@
+import sys
+from app import database, models
+from app.services import mood_rollup
+
+# Przelicza tabelę daily_mood_rollup z mood_entries.
+# Użycie: python rebuild_mood_rollup.py [user_id]
+
+def rebuild(user_id=None):
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        count = mood_rollup.rebuild(db, user_id)
+        target = f"user {user_id}" if user_id else "all users"
+        print(f"Rebuilt daily_mood_rollup for {target}: {count} rows.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)